@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+# How many items of one batch payload run at the same time. The per-model and
+# global in-flight limits in tools/concurrency.py still apply to every item.
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "8"))
+
+async def run_batch(payload, invoke):
+    """Fan out the items of a batch payload and return their results in order
+
+    Item fields override the top-level payload fields, so shared settings such
+    as model_id or temperature can be given once. Every item gets its own
+    status, and one failing item does not fail the batch.
+    """
+    items = payload.get("batch") or []
+    shared = {key: value for key, value in payload.items() if key not in ("batch", "max_parallel", "stream")}
+    slots = asyncio.Semaphore(max(1, int(payload.get("max_parallel", BATCH_MAX_PARALLEL))))
+
+    async def run_item(item):
+        async with slots:
+            try:
+                result = await invoke({**shared, **item, "text_only": False, "stream": False})
+                return dict(result, status="ok")
+            except Exception as e:
+                return {"status": "error", "error": str(e), "error_type": type(e).__name__}
+
+    return {"results": await asyncio.gather(*(run_item(item) for item in items))}
@@ -1,25 +1,144 @@
-from strands.models import BedrockModel
-from strands import Agent
-from strands_tools import calculator
+from collections import OrderedDict
 import os
+import threading
 
-agent = None
-
-def get_agent(system_prompt, model_id=None):
-    global agent
-    if agent is None:
-        if model_id is None:
-            model_id = os.getenv("MODEL_ID", "eu.anthropic.claude-3-7-sonnet-20250219-v1:0")
-        model = BedrockModel(
-            model_id=model_id,
-            region_name=os.getenv("AWS_REGION", "eu-central-1"),
-            max_tokens=int(os.getenv("MAX_TOKENS", "4096")),
-            temperature=float(os.getenv("TEMPERATURE", "0.3")),
-            top_p=float(os.getenv("TOP_P", "0.8")),
-        )
-        agent = Agent(
-            model=model,
-            system_prompt=system_prompt,
-            tools=[calculator]
+DEFAULT_MODEL_ID = "eu.anthropic.claude-3-7-sonnet-20250219-v1:0"
+
+# "bedrock" for real models, "fake" for the offline stand-in in tools/fake_model.py
+MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "bedrock").lower()
+
+# Model ID fragments of Bedrock models that accept prompt cache points, each with
+# the fewest tokens a prefix needs before a cache point (Bedrock does not cache
+# shorter prefixes: 1024 tokens for Claude Sonnet and Opus, 2048 for Claude 3.5
+# Haiku, 1000 for Nova). Set as comma-separated fragment=tokens pairs.
+PROMPT_CACHE_MODELS = dict(
+    (fragment, int(tokens))
+    for fragment, tokens in (entry.split("=") for entry in os.getenv(
+        "PROMPT_CACHE_MODELS",
+        "anthropic.claude-3-7-sonnet=1024,anthropic.claude-3-5-haiku=2048,anthropic.claude-sonnet-4=1024,"
+        "anthropic.claude-opus-4=1024,amazon.nova=1000",
+    ).split(",") if entry)
+)
+
+# Ready Bedrock models keyed by (model_id, max_tokens, temperature, top_p, cache_prompt), kept in
+# least-recently-used order so the pool never grows past AGENT_POOL_SIZE. Agents are
+# cheap to build around a pooled model, so every invocation gets its own conversation.
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "8"))
+
+_model_pool = OrderedDict()
+_model_pool_lock = threading.Lock()
+_pool_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+def prompt_cache_min_tokens(model_id):
+    """Fewest prefix tokens a model caches, or None if it does not accept prompt cache points"""
+    for fragment, min_tokens in PROMPT_CACHE_MODELS.items():
+        if fragment and fragment in model_id:
+            return min_tokens
+    return None
+
+def supports_prompt_caching(model_id):
+    """Check whether a model accepts prompt cache points"""
+    return prompt_cache_min_tokens(model_id) is not None
+
+def estimate_tokens(text):
+    """Rough token count: about four characters per token"""
+    return len(text) // 4
+
+def resolve_prompt_caching(model_id=None, requested=None, prefix=""):
+    """Decide whether to put a cache point after prefix, defaulting to the PROMPT_CACHING setting
+
+    A prefix shorter than the model's minimum would not be cached, so it
+    gets no cache point.
+    """
+    if model_id is None:
+        model_id = os.getenv("MODEL_ID", DEFAULT_MODEL_ID)
+    if requested is None:
+        requested = os.getenv("PROMPT_CACHING", "false").lower() in ("1", "true", "yes")
+    min_tokens = prompt_cache_min_tokens(model_id)
+    return bool(requested) and min_tokens is not None and estimate_tokens(prefix) >= min_tokens
+
+def _pool_key(model_id, max_tokens, temperature, top_p, cache_prompt):
+    """Build the pool key for a model and its inference parameters"""
+    return (model_id, max_tokens, temperature, top_p, cache_prompt)
+
+def _build_model(model_id, max_tokens, temperature, top_p, cache_prompt):
+    """Create a new Bedrock model client"""
+    if MODEL_PROVIDER == "fake":
+        from .fake_model import FakeBedrockModel
+        return FakeBedrockModel(
+            model_id=model_id, max_tokens=max_tokens, temperature=temperature, top_p=top_p, response_style="judge"
         )
-    return agent
\ No newline at end of file
+
+    # Imported on first use so the runtime can start serving before strands and boto3 load
+    from strands.models import BedrockModel
+
+    options = {}
+    if cache_prompt:
+        # Adds a cache point right after the system prompt
+        options["cache_prompt"] = "default"
+    return BedrockModel(
+        model_id=model_id,
+        region_name=os.getenv("AWS_REGION", "eu-central-1"),
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        **options,
+    )
+
+def _get_model(model_id, max_tokens, temperature, top_p, cache_prompt):
+    """Return a pooled Bedrock model, building it on a miss"""
+    key = _pool_key(model_id, max_tokens, temperature, top_p, cache_prompt)
+    with _model_pool_lock:
+        model = _model_pool.get(key)
+        if model is not None:
+            _model_pool.move_to_end(key)
+            _pool_stats["hits"] += 1
+            return model
+        _pool_stats["misses"] += 1
+
+    # Build outside the lock so a slow client setup does not block other models
+    model = _build_model(model_id, max_tokens, temperature, top_p, cache_prompt)
+
+    with _model_pool_lock:
+        if key in _model_pool:
+            # Another request built the same model first, keep that one
+            _model_pool.move_to_end(key)
+            return _model_pool[key]
+        _model_pool[key] = model
+        while len(_model_pool) > AGENT_POOL_SIZE:
+            _model_pool.popitem(last=False)
+            _pool_stats["evictions"] += 1
+    return model
+
+def get_agent(system_prompt, model_id=None, max_tokens=None, temperature=None, top_p=None, messages=None, cache_prompt=None):
+    """Return a fresh agent on a pooled model, seeded with optional conversation history"""
+    if model_id is None:
+        model_id = os.getenv("MODEL_ID", DEFAULT_MODEL_ID)
+    if max_tokens is None:
+        max_tokens = int(os.getenv("MAX_TOKENS", "4096"))
+    if temperature is None:
+        temperature = float(os.getenv("TEMPERATURE", "0.3"))
+    if top_p is None:
+        top_p = float(os.getenv("TOP_P", "0.8"))
+
+    cache_prompt = resolve_prompt_caching(model_id, cache_prompt, system_prompt)
+
+    from strands import Agent
+    from strands_tools import calculator
+
+    model = _get_model(model_id, max_tokens, temperature, top_p, cache_prompt)
+    return Agent(
+        model=model,
+        system_prompt=system_prompt,
+        tools=[calculator],
+        messages=list(messages) if messages else [],
+    )
+
+def warm_model(model_id):
+    """Build and pool a model with the default parameters, ready for the first request"""
+    get_agent("", model_id)
+
+def get_pool_stats():
+    """Return model pool size and hit/miss/eviction counters"""
+    with _model_pool_lock:
+        return dict(_pool_stats, size=len(_model_pool), capacity=AGENT_POOL_SIZE)
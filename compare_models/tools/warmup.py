@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+# Models listed in WARM_MODEL_IDS (comma separated) are built on a background
+# thread at startup, in parallel, so the first request for them does not pay
+# for importing strands/boto3 and creating the Bedrock client.
+WARM_MODEL_IDS = [model_id.strip() for model_id in os.getenv("WARM_MODEL_IDS", "").split(",") if model_id.strip()]
+WARMUP_MAX_WORKERS = int(os.getenv("WARMUP_MAX_WORKERS", "4"))
+
+_ready = threading.Event()
+_startup_metrics = {"warmed_models": [], "failed_models": {}}
+
+def record_startup_metric(name, value):
+    """Store a startup timing such as runtime_import_seconds"""
+    _startup_metrics[name] = value
+
+def _warm_up(warm_model, model_ids):
+    """Import the agent stack, then build every configured model in parallel"""
+    started = time.perf_counter()
+    try:
+        import_started = time.perf_counter()
+        import boto3
+        import strands
+        import strands_tools.calculator
+        _startup_metrics["import_seconds"] = time.perf_counter() - import_started
+
+        def warm(model_id):
+            try:
+                warm_model(model_id)
+                _startup_metrics["warmed_models"].append(model_id)
+            except Exception as e:
+                _startup_metrics["failed_models"][model_id] = str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, WARMUP_MAX_WORKERS)) as pool:
+            list(pool.map(warm, model_ids))
+    finally:
+        _startup_metrics["warmup_seconds"] = time.perf_counter() - started
+        _ready.set()
+        print("Startup metrics:", _startup_metrics)
+
+def start_warmup(warm_model, model_ids=None):
+    """Start warming models on a background thread; readiness is reported once it finishes"""
+    model_ids = WARM_MODEL_IDS if model_ids is None else model_ids
+    if not model_ids:
+        _ready.set()
+        return
+    threading.Thread(target=_warm_up, args=(warm_model, model_ids), name="model-warmup", daemon=True).start()
+
+def is_ready():
+    """True once startup warm-up has finished (or none was configured)"""
+    return _ready.is_set()
+
+def get_startup_metrics():
+    """Return import and warm-up timings and which models were warmed"""
+    return dict(_startup_metrics, ready=is_ready())
@@ -0,0 +1,115 @@
+import os
+import warnings
+
+import numpy as np
+
+from judge_scores import CRITERIA
+
+# Adaptive evaluation: judge ratings are pooled per analyzed model, prompt and
+# criterion, and after every judged prompt the model's bootstrap confidence
+# intervals (over prompts) are recomputed. Once every criterion's interval is
+# narrower than ADAPTIVE_CI_WIDTH, or no longer overlaps the interval of any
+# other model, the model is settled and gets no further math or judge calls.
+# No model stops before ADAPTIVE_MIN_PROMPTS of its responses were rated, and
+# separation only counts once every other model has an interval.
+ADAPTIVE_CI_WIDTH = float(os.getenv("ADAPTIVE_CI_WIDTH", "1.0"))
+ADAPTIVE_CONFIDENCE = float(os.getenv("ADAPTIVE_CONFIDENCE", "0.95"))
+ADAPTIVE_MIN_PROMPTS = int(os.getenv("ADAPTIVE_MIN_PROMPTS", "10"))
+ADAPTIVE_BOOTSTRAP_SAMPLES = int(os.getenv("ADAPTIVE_BOOTSTRAP_SAMPLES", "1000"))
+# Prompts evaluated at the same time; more means faster runs but more calls past the stopping point
+ADAPTIVE_WINDOW = int(os.getenv("ADAPTIVE_WINDOW", "4"))
+ADAPTIVE_SEED = int(os.getenv("ADAPTIVE_SEED", "0"))
+# Prompts are taken in a random order, shuffled this many at a time as the dataset streams in
+ADAPTIVE_SHUFFLE_BUFFER = int(os.getenv("ADAPTIVE_SHUFFLE_BUFFER", "10000"))
+
+class AdaptiveStopper:
+    """Bootstrap confidence intervals of each analyzed model's ratings, and which models are settled"""
+
+    def __init__(self, model_ids, target_width=ADAPTIVE_CI_WIDTH, confidence=ADAPTIVE_CONFIDENCE, min_prompts=ADAPTIVE_MIN_PROMPTS,
+                 samples=ADAPTIVE_BOOTSTRAP_SAMPLES, criteria=CRITERIA, seed=ADAPTIVE_SEED):
+        self.model_ids = list(model_ids)
+        self.target_width = target_width
+        self.confidence = confidence
+        self.min_prompts = min_prompts
+        self.samples = samples
+        self.criteria = list(criteria)
+        self.rng = np.random.default_rng(seed)
+        # model_id -> prompt_index -> (rating sums, rating counts) per criterion
+        self.ratings = {}
+        self.intervals = {}
+        self.stopped = {}
+
+    def add(self, model_id, prompt_index, scores):
+        """Pool one judgment's ratings of model_id's response to a prompt"""
+        if not scores:
+            return
+        sums, counts = self.ratings.setdefault(model_id, {}).setdefault(
+            prompt_index, (np.zeros(len(self.criteria)), np.zeros(len(self.criteria)))
+        )
+        for i, criterion in enumerate(self.criteria):
+            if criterion in scores:
+                sums[i] += scores[criterion]
+                counts[i] += 1
+
+    def _bootstrap(self, model_id):
+        """(criterion x 2) interval bounds from resampling the model's prompts"""
+        per_prompt = self.ratings[model_id].values()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.array([sums / counts for sums, counts in per_prompt])
+        picks = self.rng.integers(0, len(means), size=(self.samples, len(means)))
+        # Criteria that no judge rated stay NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            resampled = np.nanmean(means[picks], axis=1)
+            tail = (1 - self.confidence) / 2
+            return np.nanquantile(resampled, [tail, 1 - tail], axis=0).T
+
+    def check(self, model_id):
+        """Recompute model_id's intervals; returns True once the model is settled"""
+        if model_id in self.stopped:
+            return True
+        if len(self.ratings.get(model_id, {})) < self.min_prompts:
+            return False
+        self.intervals[model_id] = self._bootstrap(model_id)
+
+        bounds = self.intervals[model_id]
+        widths = bounds[:, 1] - bounds[:, 0]
+        narrow = widths <= self.target_width
+        others = [self.intervals.get(other) for other in self.model_ids if other != model_id]
+        if others and all(interval is not None for interval in others):
+            others = np.array(others)
+            # Separated: the interval overlaps no other model's interval for that criterion
+            overlaps = (others[:, :, 0] <= bounds[:, 1]) & (others[:, :, 1] >= bounds[:, 0])
+            separated = ~overlaps.any(axis=0)
+        else:
+            separated = np.zeros(len(self.criteria), dtype=bool)
+        # Criteria no judge has rated yet do not hold a model back, as long as some are rated
+        unrated = np.isnan(widths)
+        if not np.all(unrated) and np.all(narrow | separated | unrated):
+            self.stopped[model_id] = {
+                "prompts": len(self.ratings[model_id]),
+                "reason": "interval width" if np.all(narrow | unrated) else "rank separation",
+            }
+            return True
+        return False
+
+    def is_stopped(self, model_id):
+        return model_id in self.stopped
+
+    def summary(self):
+        """Per analyzed model: prompts rated, whether and why it stopped, and its intervals"""
+        rows = []
+        for model_id in sorted(self.ratings):
+            bounds = self.intervals.get(model_id)
+            rows.append({
+                "model_id": model_id,
+                "prompts_rated": len(self.ratings[model_id]),
+                "stopped": model_id in self.stopped,
+                "stop_reason": self.stopped.get(model_id, {}).get("reason"),
+                "stopped_after_prompts": self.stopped.get(model_id, {}).get("prompts"),
+                "intervals": {
+                    criterion: [None if np.isnan(b) else float(b) for b in bounds[i]]
+                    for i, criterion in enumerate(self.criteria)
+                } if bounds is not None else None,
+            })
+        return rows
@@ -0,0 +1,38 @@
+import json
+
+from retry import AgentError, classify_error
+
+def parse_agent_response(raw):
+    """Split an agent runtime response body into (text, details)
+
+    The runtime JSON-encodes whatever the entrypoint returns, so an invocation
+    arrives as {"text": ..., "usage": {...}, "metrics": {...}, "cache_hit": ...}
+    and a text_only one as a quoted string; details holds everything but the
+    text. Anything else (e.g. an AgentError from the harness clients) is
+    passed through unchanged with empty details.
+    """
+    try:
+        body = json.loads(raw)
+    except (TypeError, ValueError):
+        return raw, {}
+    if isinstance(body, str):
+        return body, {}
+    if isinstance(body, dict) and "text" in body:
+        details = dict(body)
+        return details.pop("text"), details
+    return raw, {}
+
+def parse_batch_result(result):
+    """Turn one item of a batch response into (text, details)
+
+    Batch items come back as {"status": "ok", "text": ..., "usage": ...} or
+    {"status": "error", "error": ..., "error_type": ...}; errors become an
+    AgentError, like the ones the single-call clients return.
+    """
+    if isinstance(result, AgentError):
+        return result, {}
+    if result.get("status") != "ok":
+        message = f"{result.get('error_type', 'Exception')}: {result.get('error')}"
+        return AgentError(classify_error(500, message), message, 500), {}
+    details = {key: value for key, value in result.items() if key not in ("status", "text")}
+    return result.get("text", ""), details
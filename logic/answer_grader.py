@@ -0,0 +1,207 @@
+import hashlib
+import os
+import re
+
+# Local grading of a math response's final answer against the verified answer
+# of its prompt, without a judge call. Both final answers are read as a
+# number (decimals, fractions, percentages, LaTeX fractions) or a
+# multiple-choice letter and compared at the precision the two are written
+# in, plus GRADER_REL_TOL relative slack. A verdict is confident when the
+# response states its answer explicitly ("Final answer: ...", "the answer is
+# (C)", \boxed{...}) and matches or misses clearly.
+#
+# Judges still rate every response by default. GRADER_JUDGE_RATE is the
+# share of confidently graded responses that are judged anyway (0 skips
+# them all); the sample is fixed per model and prompt, so a resumed run
+# picks the same responses. Leaderboards then only rate the sampled and
+# uncertain responses, while the grader's accuracy covers all of them.
+GRADER_REL_TOL = float(os.getenv("GRADER_REL_TOL", "1e-4"))
+GRADER_JUDGE_RATE = float(os.getenv("GRADER_JUDGE_RATE", "1"))
+# Least number of decimals a response must agree on before a match counts
+GRADER_MIN_DECIMALS = int(os.getenv("GRADER_MIN_DECIMALS", "2"))
+
+VALUE = re.compile(
+    r"\\d?frac\{\s*(?P<frac_num>-?\d+(?:\.\d+)?)\s*\}\{\s*(?P<frac_den>\d+(?:\.\d+)?)\s*\}"
+    r"|(?P<num>(?:(?<![\w)])-)?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|(?<![\w.])\.\d+)"
+    r"(?:\s*/\s*(?P<den>\d+(?:\.\d+)?)(?![\d.]))?"
+    r"(?P<percent>\s*%)?"
+)
+# Where an answer states its result; the last one in the text wins
+FINAL_MARKER = re.compile(r"final answer|answer is|answer\s*:|\\boxed\{", re.IGNORECASE)
+CHOICE = re.compile(r"^[\s*:]*\(?([A-E])\)?(?![\w])|\(([A-E])\)|\b(?:option|choice)\s*\(?([A-E])\b")
+BOLD = re.compile(r"\*\*([^*]+)\*\*")
+PARENTHESIZED = re.compile(r"\([^()]*\)")
+# "(C) 0.24" lines of a multiple-choice question
+OPTION = re.compile(r"^\s*\(([A-E])\)\s*(.+?)\s*$", re.MULTILINE)
+
+def _decimals(text):
+    return len(text.split(".")[1]) if "." in text else 0
+
+def parse_value(match):
+    """(value, decimals) for a VALUE match; decimals is None for exact values such as fractions"""
+    if match.group("frac_num") is not None:
+        return float(match.group("frac_num")) / float(match.group("frac_den")), None
+    number = match.group("num").replace(",", "")
+    value = float(number)
+    decimals = _decimals(number)
+    if match.group("den") is not None:
+        denominator = float(match.group("den"))
+        if denominator == 0:
+            return None
+        value, decimals = value / denominator, None
+    if match.group("percent"):
+        value /= 100
+        decimals = decimals + 2 if decimals is not None else None
+    return value, decimals
+
+def _answer_part(line):
+    """The part of an answer line that holds the result: a bold span, else what follows the last " is " or "=" """
+    for bold in BOLD.findall(line):
+        if VALUE.search(bold):
+            return bold
+    # Asides such as "(since 3! = 3 x 2 x 1)" hold working, not the result
+    bare = PARENTHESIZED.sub("", line)
+    if VALUE.search(bare):
+        line = bare
+    for separator in (" is ", "="):
+        if separator in line and VALUE.search(line.rsplit(separator, 1)[1]):
+            return line.rsplit(separator, 1)[1]
+    return line
+
+def _first_value(text):
+    """The first number in text, read from each line's answer part"""
+    for line in text.splitlines():
+        for match in VALUE.finditer(_answer_part(line)):
+            parsed = parse_value(match)
+            if parsed is not None:
+                return parsed, match.group(0).strip()
+    return None, None
+
+def question_options(question):
+    """{letter: (value, decimals)} of a multiple-choice question's numeric options"""
+    if not isinstance(question, str):
+        return {}
+    options = {}
+    for letter, text in OPTION.findall(question):
+        parsed, _ = _first_value(text)
+        if parsed is not None:
+            options[letter] = parsed
+    return options
+
+def extract_answer(text, options=None):
+    """The final answer stated in text
+
+    Returns {"choice", "value", "decimals", "text", "source"}: the letter
+    picked (if any), the number (if any, a chosen option's value otherwise),
+    what was read, and "marker" when the answer follows an explicit
+    final-answer marker or "last number" when it is the text's last number.
+    None when neither a number nor a letter is found.
+    """
+    if not isinstance(text, str):
+        return None
+    options = options or {}
+    markers = list(FINAL_MARKER.finditer(text))
+    choice = value = read = None
+    source = "last number"
+    if markers:
+        # What closes a bold marker ("**Answer:**") is not part of the answer
+        window = text[markers[-1].end():markers[-1].end() + 300].lstrip(" \t\r\n*:")
+        choice_match = CHOICE.search(window[:40]) if options else None
+        if choice_match:
+            choice = next(letter for letter in choice_match.groups() if letter)
+            read = choice_match.group(0).strip(" *:")
+        if choice in options:
+            # The chosen option's value, not whatever number the explanation after the letter starts with
+            value, value_read = options[choice], None
+        else:
+            # The answer is on the marker's line or, for "Final answer:\n\n0.24", the next one that has a number
+            lines = [line for line in window.splitlines() if VALUE.search(line)]
+            value, value_read = _first_value(lines[0]) if lines else (None, None)
+        if choice is not None or value is not None:
+            source = "marker"
+            read = read or value_read
+    if choice is None and value is None:
+        matches = [match for match in VALUE.finditer(text) if parse_value(match) is not None]
+        if matches:
+            value, read = parse_value(matches[-1]), matches[-1].group(0).strip()
+    if choice is not None and choice in options and value is None:
+        value = options[choice]
+    if value is not None and choice is None:
+        # A number that is one of the options picks that option
+        choice = next((letter for letter, option in options.items() if _compare(option, value) == "match"), None)
+    if choice is None and value is None:
+        return None
+    return {
+        "choice": choice,
+        "value": value[0] if value is not None else None,
+        "decimals": value[1] if value is not None else None,
+        "text": read,
+        "source": source,
+    }
+
+def _compare(expected, found, rel_tol=GRADER_REL_TOL, min_decimals=GRADER_MIN_DECIMALS):
+    """"match", "mismatch" or "coarse" (equal only when rounded to fewer decimals than required)"""
+    (e, e_decimals), (f, f_decimals) = expected, found
+    slack = rel_tol * abs(e)
+    precisions = [d for d in (e_decimals, f_decimals) if d is not None]
+    if not precisions:
+        return "match" if abs(e - f) <= max(slack, 1e-9) else "mismatch"
+    # Compare at the coarser of the two precisions
+    decimals = min(precisions)
+    if abs(e - f) > max(slack, 0.5 * 10 ** -decimals + 1e-12):
+        return "mismatch"
+    required = min(min_decimals, e_decimals) if e_decimals is not None else min_decimals
+    if abs(e - f) <= slack or f_decimals is None or decimals >= required:
+        return "match"
+    return "coarse"
+
+def grade_answer(response, reference, question=None):
+    """Grade a response's final answer against the verified answer
+
+    Returns None when the reference has no readable final answer, otherwise
+    {"verdict": "correct" | "incorrect" | "unknown", "confident", "method",
+    "expected", "found"}; expected and found are the extracted answers.
+    """
+    options = question_options(question)
+    expected = extract_answer(reference, options)
+    if expected is None:
+        return None
+    found = extract_answer(response, options)
+    grade = {"verdict": "unknown", "confident": False, "method": None, "expected": expected, "found": found}
+    if found is None:
+        return grade
+    if expected["choice"] and found["choice"]:
+        grade["method"] = "choice"
+        grade["verdict"] = "correct" if expected["choice"] == found["choice"] else "incorrect"
+    elif expected["value"] is not None and found["value"] is not None:
+        grade["method"] = "value"
+        outcome = _compare((expected["value"], expected["decimals"]), (found["value"], found["decimals"]))
+        grade["verdict"] = {"match": "correct", "mismatch": "incorrect"}.get(outcome, "unknown")
+    grade["confident"] = grade["verdict"] != "unknown" and found["source"] == "marker"
+    return grade
+
+def should_judge(grade, model_id, prompt_key, rate=GRADER_JUDGE_RATE):
+    """Whether a response still goes to the judges: always unless it was graded confidently, then a fixed sample of rate
+
+    prompt_key identifies the prompt (its ID, or its index for results
+    stored without one), so every shard samples the same responses.
+    """
+    if not grade or not grade["confident"] or rate >= 1:
+        return True
+    digest = hashlib.sha256(f"{model_id}|{prompt_key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < rate
+
+def grader_summary(grades):
+    """Per model: responses graded, correct, incorrect, unknown, confident and accuracy, from (model_id, grade) pairs"""
+    rows = {}
+    for model_id, grade in grades:
+        row = rows.setdefault(model_id, {"model_id": model_id, "graded": 0, "correct": 0, "incorrect": 0, "unknown": 0, "confident": 0})
+        if not grade:
+            continue
+        row["graded"] += 1
+        row[grade["verdict"]] += 1
+        row["confident"] += int(grade["confident"])
+    for row in rows.values():
+        decided = row["correct"] + row["incorrect"]
+        row["accuracy"] = row["correct"] / decided if decided else None
+    return sorted(rows.values(), key=lambda row: (-(row["accuracy"] or 0), row["model_id"]))
@@ -0,0 +1,21 @@
+def format_compare_prompt(question, response, correct_answer=None, cache_split=False):
+    """Build the prompt sent to a judging model as (prefix, remainder)
+
+    By default the prefix is empty and the remainder holds the classic prompt.
+    With cache_split the question and verified answer come first, so the same
+    prefix is shared by every response and judge for a prompt and can be
+    marked as a Bedrock prompt cache point by the compare agent.
+    """
+    if not cache_split:
+        formatted_prompt = f"User requested answer for following problem: {question}. AI-Agent responded like this: {response}"
+        if correct_answer:
+            formatted_prompt += f". This is the answer we know is correct: {correct_answer}. Please compare the given answer to the verified one and make sure to adjust your ratings accordingly."
+        return "", formatted_prompt
+    
+    prefix = f"User requested answer for following problem: {question}. "
+    if correct_answer:
+        prefix += f"This is the answer we know is correct: {correct_answer}. "
+    remainder = f"AI-Agent responded like this: {response}"
+    if correct_answer:
+        remainder += ". Please compare the given answer to the verified one and make sure to adjust your ratings accordingly."
+    return prefix, remainder
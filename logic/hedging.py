@@ -0,0 +1,117 @@
+import asyncio
+from collections import deque
+import os
+import time
+
+from retry import AgentError
+
+# A call that has not answered after the HEDGE_PERCENTILE latency of its model
+# (tracked over the last HEDGE_WINDOW successful calls, once there are at least
+# HEDGE_MIN_SAMPLES) gets a duplicate, and the first good answer wins. Hedges are
+# capped at HEDGE_MAX_EXTRA_LOAD times the number of calls made so far.
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_EXTRA_LOAD = float(os.getenv("HEDGE_MAX_EXTRA_LOAD", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# How often a call that started before its model had enough history checks again
+HISTORY_POLL_SECONDS = 0.25
+
+class Hedger:
+    """Sends a backup request when a call runs past its model's latency percentile"""
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, max_extra_load=HEDGE_MAX_EXTRA_LOAD,
+                 min_samples=HEDGE_MIN_SAMPLES, window=HEDGE_WINDOW):
+        self.percentile = percentile
+        self.max_extra_load = max_extra_load
+        self.min_samples = min_samples
+        self.window = window
+        self.latencies = {}
+        self.stats = {}
+        self.calls = 0
+        self.hedges = 0
+
+    def hedge_delay(self, model_id):
+        """Seconds to wait before hedging a call to model_id, or None while there is too little history"""
+        samples = self.latencies.get(model_id)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def _record(self, model_id, seconds):
+        self.latencies.setdefault(model_id, deque(maxlen=self.window)).append(seconds)
+
+    async def _timed(self, make_call):
+        started = time.perf_counter()
+        result = await make_call()
+        return result, time.perf_counter() - started
+
+    async def run(self, model_id, make_call, admit=None):
+        """Await make_call(), hedging it with a second make_call() if it is slow
+
+        admit, if given, is asked right before a hedge is sent (e.g. to take
+        rate limit quota) and can veto it. AgentError results only win when
+        both calls fail.
+        """
+        stats = self.stats.setdefault(model_id, {"calls": 0, "hedged": 0, "hedge_wins": 0})
+        stats["calls"] += 1
+        self.calls += 1
+
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._timed(make_call))
+        while not primary.done():
+            # The first calls of a run start together, so history may arrive while they wait
+            delay = self.hedge_delay(model_id)
+            elapsed = time.perf_counter() - started
+            if delay is not None and elapsed >= delay:
+                break
+            await asyncio.wait({primary}, timeout=delay - elapsed if delay is not None else HISTORY_POLL_SECONDS)
+        if primary.done():
+            result, seconds = await primary
+            if not isinstance(result, AgentError):
+                self._record(model_id, seconds)
+            return result
+
+        if self.hedges + 1 > self.max_extra_load * self.calls or (admit is not None and not admit()):
+            result, seconds = await primary
+            if not isinstance(result, AgentError):
+                self._record(model_id, seconds)
+            return result
+
+        self.hedges += 1
+        stats["hedged"] += 1
+        backup = asyncio.ensure_future(self._timed(make_call))
+        pending = {primary, backup}
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result, seconds = task.result()
+                    if not isinstance(result, AgentError):
+                        if task is backup:
+                            # Record how long the primary had run, so slow calls stay in the history
+                            seconds = time.perf_counter() - started
+                            stats["hedge_wins"] += 1
+                        self._record(model_id, seconds)
+                        return result
+            return result
+        finally:
+            # The loser's connection is closed; the runtime may still finish its work
+            for task in pending:
+                task.cancel()
+
+    def summary(self):
+        """Hedged calls and hedge wins per model"""
+        rows = []
+        for model_id in sorted(self.stats):
+            stats = self.stats[model_id]
+            delay = self.hedge_delay(model_id)
+            rows.append(dict(
+                stats,
+                model_id=model_id,
+                hedge_rate=stats["hedged"] / stats["calls"] if stats["calls"] else 0.0,
+                hedge_delay_s=delay,
+            ))
+        return rows
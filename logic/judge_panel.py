@@ -0,0 +1,113 @@
+import os
+import warnings
+
+import numpy as np
+
+from judge_scores import CRITERIA
+from model_ids import JUDGE_MODEL_IDS
+
+# Which judges rate a math response. The judges come from JUDGE_MODEL_IDS
+# (cheapest first), not from the models being compared:
+#   all      every judge rates every response
+#   panel    the first JUDGE_PANEL_SIZE judges rate every response
+#   cascade  the cheapest judge rates first; the next judge is only called
+#            while the response's ratings are uncertain, up to
+#            JUDGE_PANEL_SIZE judges
+# Ratings are uncertain when a judge left none, when their overall mean lies
+# inside JUDGE_CASCADE_BAND (low,high), or when two judges are more than
+# JUDGE_CASCADE_DISAGREEMENT apart on some criterion. With
+# JUDGE_EXCLUDE_SELF, a model never judges its own responses.
+JUDGE_PANEL = os.getenv("JUDGE_PANEL", "all").lower()
+JUDGE_PANEL_SIZE = int(os.getenv("JUDGE_PANEL_SIZE", "3"))
+JUDGE_EXCLUDE_SELF = os.getenv("JUDGE_EXCLUDE_SELF", "false").lower() in ("1", "true", "yes")
+JUDGE_CASCADE_BAND = tuple(float(bound) for bound in os.getenv("JUDGE_CASCADE_BAND", "4,7").split(","))
+JUDGE_CASCADE_DISAGREEMENT = float(os.getenv("JUDGE_CASCADE_DISAGREEMENT", "2"))
+
+JUDGE_PANEL_MODES = ("all", "panel", "cascade")
+
+class JudgePanel:
+    """Picks the judges for each math response and counts why the cascade escalated"""
+
+    def __init__(self, mode=JUDGE_PANEL, judge_ids=JUDGE_MODEL_IDS, size=JUDGE_PANEL_SIZE, exclude_self=JUDGE_EXCLUDE_SELF,
+                 band=JUDGE_CASCADE_BAND, disagreement=JUDGE_CASCADE_DISAGREEMENT):
+        if mode not in JUDGE_PANEL_MODES:
+            raise ValueError(f"Unknown judge panel {mode!r}, expected one of {', '.join(JUDGE_PANEL_MODES)}")
+        self.mode = mode
+        self.judge_ids = list(judge_ids)
+        self.size = size
+        self.exclude_self = exclude_self
+        self.band = band
+        self.disagreement = disagreement
+        self.escalations = {"no ratings": 0, "uncertain band": 0, "disagreement": 0}
+
+    def eligible(self, analyzed_model_id):
+        """Judges allowed to rate analyzed_model_id's responses, cheapest first"""
+        return [judge for judge in self.judge_ids if not (self.exclude_self and judge == analyzed_model_id)]
+
+    def max_judges(self, analyzed_model_id):
+        """The most judge calls one of analyzed_model_id's responses can take"""
+        eligible = len(self.eligible(analyzed_model_id))
+        return eligible if self.mode == "all" else min(self.size, eligible)
+
+    def next_judges(self, analyzed_model_id, rated):
+        """Judges to call next for a response, given {judge: scores} of the judgments it has; empty when done
+
+        A judge already in rated is never called again for the response,
+        even if its call failed.
+        """
+        eligible = self.eligible(analyzed_model_id)
+        if self.mode == "all":
+            return [judge for judge in eligible if judge not in rated]
+        if self.mode == "panel":
+            return [judge for judge in eligible[:self.size] if judge not in rated]
+
+        remaining = [judge for judge in eligible if judge not in rated]
+        if not remaining or len(rated) >= self.size:
+            return []
+        if not rated:
+            return remaining[:1]
+        reason = self.uncertainty(list(rated.values()))
+        if reason is None:
+            return []
+        self.escalations[reason] += 1
+        return remaining[:1]
+
+    def iter_judges(self, analyzed_model_id, rated):
+        """Yield a response's judges one by one, for callers that judge sequentially
+
+        The caller adds each judge's scores to rated before asking for the
+        next one, so the cascade can decide whether to go on.
+        """
+        judges = self.next_judges(analyzed_model_id, rated)
+        while judges:
+            yield from judges
+            judges = self.next_judges(analyzed_model_id, rated)
+
+    def uncertainty(self, scores):
+        """Why a response's ratings (one scores dict per judge) need another judge, or None"""
+        rated = [s for s in scores if s]
+        if not rated:
+            return "no ratings"
+        ratings = np.array([[s.get(c, np.nan) for c in CRITERIA] for s in rated])
+        # Judges that rated a criterion differently by more than the threshold
+        with warnings.catch_warnings():
+            # Criteria no judge rated are all-NaN columns
+            warnings.simplefilter("ignore", RuntimeWarning)
+            ranges = np.nanmax(ratings, axis=0) - np.nanmin(ratings, axis=0)
+        if np.any(np.nan_to_num(ranges) > self.disagreement):
+            return "disagreement"
+        overall = np.nanmean(np.nanmean(ratings, axis=1))
+        if self.band[0] <= overall <= self.band[1]:
+            return "uncertain band"
+        return None
+
+    def describe(self):
+        """One line for the harness headers"""
+        if self.mode == "all":
+            text = f"all {len(self.judge_ids)} judges"
+        elif self.mode == "panel":
+            text = f"panel of {self.size} ({', '.join(self.judge_ids[:self.size])})"
+        else:
+            text = (f"cascade of up to {self.size}, starting with {self.judge_ids[0] if self.judge_ids else 'n/a'} "
+                    f"(uncertain band {self.band[0]:g}-{self.band[1]:g}, disagreement > {self.disagreement:g})")
+        return text + (", no self-judging" if self.exclude_self else "")
@@ -0,0 +1,74 @@
+import json
+import re
+
+# The ratings the compare agent's system prompt asks for, on a 1-10 scale
+CRITERIA = ("factual_correctness", "subject_focus", "completeness", "professionalism")
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+FENCED_BLOCK = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+# "criterion": 8 (quotes and the value's own quotes optional), for cut-off or otherwise broken JSON
+CRITERION_VALUE = re.compile(
+    r"[\"']?(" + "|".join(CRITERIA) + r")[\"']?\s*[:=]\s*[\"']?(-?\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+
+def _json_objects(text):
+    """Candidate JSON objects in text: fenced blocks first, then every {...} span"""
+    candidates = [match.group(1) for match in FENCED_BLOCK.finditer(text)]
+    start = text.find("{")
+    while start != -1:
+        depth = 0
+        for end in range(start, len(text)):
+            if text[end] == "{":
+                depth += 1
+            elif text[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    candidates.append(text[start:end + 1])
+                    break
+        start = text.find("{", start + 1)
+    return candidates
+
+def _valid(value):
+    """A rating as a float, or None when it is not a number on the 1-10 scale"""
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if MIN_SCORE <= value <= MAX_SCORE else None
+
+def parse_judge_scores(text):
+    """Extract the criterion ratings from a judge's analysis
+
+    Accepts a bare JSON object, one inside a ```json fence or surrounded by
+    prose, and partial JSON (e.g. a response cut off mid-object), in which
+    case whatever criteria can be read are returned. Ratings off the 1-10
+    scale are dropped. Returns {criterion: float}, empty if nothing parses.
+    """
+    if not isinstance(text, str):
+        return {}
+    for candidate in _json_objects(text):
+        try:
+            body = json.loads(candidate)
+        except ValueError:
+            continue
+        if not isinstance(body, dict):
+            continue
+        # Some judges nest the ratings, e.g. {"ratings": {...}}
+        nested = [value for value in body.values() if isinstance(value, dict)]
+        for source in [body] + nested:
+            keys = {key.lower(): value for key, value in source.items() if isinstance(key, str)}
+            scores = {criterion: _valid(keys.get(criterion)) for criterion in CRITERIA}
+            scores = {criterion: value for criterion, value in scores.items() if value is not None}
+            if scores:
+                return scores
+
+    scores = {}
+    for name, value in CRITERION_VALUE.findall(text):
+        value = _valid(value)
+        if value is not None:
+            scores.setdefault(name.lower(), value)
+    return scores
@@ -1,3 +1,6 @@
+import json
+import os
+
 # Shared list of model IDs for testing
 MODEL_IDS = [
     "eu.anthropic.claude-3-7-sonnet-20250219-v1:0",
@@ -11,4 +14,61 @@ MODEL_IDS = [
     #"eu.amazon.nova-lite-v1:0",
     #"amazon.nova-pro-v1:0",
     #"cohere.rerank-v3-5:0",
-]
\ No newline at end of file
+]
+# Bedrock on-demand quotas per model, in requests per minute (rpm) and tokens
+# per minute (tpm); match them to the account's Service Quotas. The async
+# pipeline paces both stages against these, and models that are not listed
+# use DEFAULT_RATE_LIMITS. Leave a key out to not limit it.
+#
+# MODEL_RATE_LIMITS (inline JSON, or the path to a JSON file) overrides them
+# without editing this file, e.g. {"default": {"rpm": 100}, "<model id>":
+# {"rpm": 20, "tpm": null}}; keys that are not given keep the values below,
+# and null removes a limit.
+DEFAULT_RATE_LIMITS = {"rpm": 50, "tpm": 200000}
+
+MODEL_RATE_LIMITS = {
+    "eu.anthropic.claude-3-7-sonnet-20250219-v1:0": {"rpm": 50, "tpm": 200000},
+    "eu.anthropic.claude-3-5-haiku-20241022-v1:0": {"rpm": 100, "tpm": 400000},
+    "eu.anthropic.claude-3-5-sonnet-20241022-v2:0": {"rpm": 50, "tpm": 200000},
+    "eu.anthropic.claude-3-opus-20240229-v1:0": {"rpm": 50, "tpm": 400000},
+    "eu.anthropic.claude-3-haiku-20240307-v1:0": {"rpm": 400, "tpm": 600000},
+    "eu.anthropic.claude-sonnet-4-20250514-v1:0": {"rpm": 50, "tpm": 200000},
+    "eu.meta.llama3-2-3b-instruct-v1:0": {"rpm": 800, "tpm": 300000},
+    "eu.mistral.pixtral-large-2502-v1:0": {"rpm": 100, "tpm": 200000},
+    "eu.amazon.nova-lite-v1:0": {"rpm": 200, "tpm": 400000},
+    "amazon.nova-pro-v1:0": {"rpm": 200, "tpm": 400000},
+}
+
+def load_rate_limits():
+    """Read rate limit overrides from MODEL_RATE_LIMITS"""
+    raw = os.getenv("MODEL_RATE_LIMITS", "").strip()
+    if not raw:
+        return {}
+    if not raw.startswith("{"):
+        with open(raw, "r") as f:
+            return json.load(f)
+    return json.loads(raw)
+
+def _override_limits(limits, overrides):
+    merged = dict(limits, **overrides)
+    return {key: value for key, value in merged.items() if value is not None}
+
+_rate_limit_overrides = load_rate_limits()
+DEFAULT_RATE_LIMITS = _override_limits(DEFAULT_RATE_LIMITS, _rate_limit_overrides.pop("default", {}))
+for _model_id, _overrides in _rate_limit_overrides.items():
+    MODEL_RATE_LIMITS[_model_id] = _override_limits(MODEL_RATE_LIMITS.get(_model_id, DEFAULT_RATE_LIMITS), _overrides)
+
+# Models that judge the math responses, cheapest first; the compare stage picks
+# its judges from this list (see logic/judge_panel.py), so the judges need not
+# be the models being compared and a cascade can start with the cheap ones.
+JUDGE_MODEL_IDS = [
+    #"eu.amazon.nova-lite-v1:0",
+    "eu.meta.llama3-2-3b-instruct-v1:0",
+    #"eu.anthropic.claude-3-haiku-20240307-v1:0",
+    #"eu.anthropic.claude-3-5-haiku-20241022-v1:0",
+    #"amazon.nova-pro-v1:0",
+    #"eu.mistral.pixtral-large-2502-v1:0",
+    "eu.anthropic.claude-3-7-sonnet-20250219-v1:0",
+    #"eu.anthropic.claude-sonnet-4-20250514-v1:0",
+    #"eu.anthropic.claude-3-opus-20240229-v1:0",
+]
@@ -0,0 +1,157 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+import random
+
+from test_prompts import TEST_PROMPTS
+
+# Where the harnesses read their prompts from: a JSONL, CSV or Parquet file, a
+# directory of them or a glob such as "data/math-*.jsonl" (files are read in
+# name order). Rows are read one at a time and handed out as they are read, so
+# a dataset never has to fit in memory. Each row needs a "question" (or
+# "prompt") and may have a verified "answer" and an "id". Rows without an id
+# are identified by a hash of their question, so a prompt keeps its ID when
+# rows are added, removed or reordered. Empty means the TEST_PROMPTS list.
+#
+# PROMPT_SHARD "i/n" keeps the prompts whose ID hashes to shard i of n
+# (0-based), so n machines can split a dataset without coordinating.
+# PROMPT_SAMPLE keeps that share of the prompts, again by ID hash (with
+# PROMPT_SEED), and PROMPT_LIMIT stops after that many prompts (0: no limit).
+PROMPT_DATASET = os.getenv("PROMPT_DATASET", "")
+PROMPT_SHARD = os.getenv("PROMPT_SHARD", "")
+PROMPT_SAMPLE = float(os.getenv("PROMPT_SAMPLE", "1"))
+PROMPT_LIMIT = int(os.getenv("PROMPT_LIMIT", "0"))
+PROMPT_SEED = int(os.getenv("PROMPT_SEED", "0"))
+# Rows read from a Parquet file at a time
+PARQUET_BATCH_ROWS = int(os.getenv("PARQUET_BATCH_ROWS", "1024"))
+
+DATASET_EXTENSIONS = (".jsonl", ".csv", ".parquet")
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+def dataset_files(source):
+    """The files of a dataset path, directory or glob, in name order"""
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name) for name in os.listdir(source) if name.endswith(DATASET_EXTENSIONS))
+    if glob.has_magic(source):
+        return sorted(glob.glob(source))
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Prompt dataset not found: {source}")
+    return [source]
+
+def _read_rows(path):
+    """Yield the rows of one dataset file as dicts"""
+    if path.endswith(".jsonl"):
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith(".csv"):
+        with open(path, "r", newline="") as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(".parquet"):
+        if pq is None:
+            raise ImportError(f"Reading {path} needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported prompt dataset file: {path} (expected {', '.join(DATASET_EXTENSIONS)})")
+
+def prompt_id(question):
+    """Stable ID of a prompt that has none of its own"""
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+def _fraction(*parts):
+    """Deterministic number in [0, 1) for the given key"""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def parse_shard(shard):
+    """(i, n) from "i/n", or None for no sharding"""
+    if not shard:
+        return None
+    index, count = (int(part) for part in shard.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid prompt shard {shard!r}, expected i/n with 0 <= i < n")
+    return index, count
+
+def load_prompts(dataset=None, shard=PROMPT_SHARD, sample=PROMPT_SAMPLE, limit=PROMPT_LIMIT, seed=PROMPT_SEED):
+    """Lazily yield the prompts of a dataset, after sharding and sampling
+
+    dataset is a dataset path (see above) or a list of TEST_PROMPTS-style
+    items; by default PROMPT_DATASET, or TEST_PROMPTS when that is unset.
+    Each prompt is {"id", "index", "question", "answer"}, where index is the
+    1-based row number in the whole dataset, so it is the same in every
+    shard and sample.
+    """
+    if dataset is None:
+        dataset = PROMPT_DATASET or TEST_PROMPTS
+    rows = dataset if isinstance(dataset, list) else (row for path in dataset_files(dataset) for row in _read_rows(path))
+    shard = parse_shard(shard)
+    kept = 0
+    for index, row in enumerate(rows, 1):
+        if isinstance(row, str):
+            row = {"question": row}
+        question = row.get("question") or row.get("prompt")
+        if not question:
+            continue
+        item_id = str(row["id"]) if row.get("id") not in (None, "") else prompt_id(question)
+        if shard is not None and int(_fraction("shard", item_id) * shard[1]) != shard[0]:
+            continue
+        if sample < 1 and _fraction("sample", seed, item_id) >= sample:
+            continue
+        answer = row.get("answer")
+        yield {"id": item_id, "index": index, "question": question, "answer": str(answer) if answer not in (None, "") else None}
+        kept += 1
+        if limit and kept >= limit:
+            return
+
+def dataset_size(dataset=None, shard=PROMPT_SHARD, sample=PROMPT_SAMPLE, limit=PROMPT_LIMIT, seed=PROMPT_SEED):
+    """Rows load_prompts would yield, when that is known without reading them (a list, or Parquet footers); else None
+
+    Shards and samples are only known by reading every prompt's ID, so
+    they count as unknown.
+    """
+    if dataset is None:
+        dataset = PROMPT_DATASET or TEST_PROMPTS
+    if shard or sample < 1:
+        return None
+    if isinstance(dataset, list):
+        size = len(dataset)
+    else:
+        files = dataset_files(dataset)
+        if pq is None or not all(path.endswith(".parquet") for path in files):
+            return None
+        size = sum(pq.ParquetFile(path).metadata.num_rows for path in files)
+    return min(size, limit) if limit else size
+
+def shuffled(prompts, buffer_size, seed):
+    """Yield prompts in a seeded random order, holding at most buffer_size of them at a time"""
+    rng = random.Random(seed)
+    buffer = []
+    for prompt in prompts:
+        buffer.append(prompt)
+        if len(buffer) >= buffer_size:
+            yield buffer.pop(rng.randrange(len(buffer)))
+    rng.shuffle(buffer)
+    yield from buffer
+
+def dataset_options(dataset=None, shard=PROMPT_SHARD, sample=PROMPT_SAMPLE, limit=PROMPT_LIMIT, seed=PROMPT_SEED):
+    """load_prompts arguments as stored with a run, so a resumed run reads the same prompts"""
+    return {"dataset": dataset or PROMPT_DATASET or None, "shard": shard or None, "sample": sample, "limit": limit, "seed": seed}
+
+def describe_dataset(dataset=None, shard=PROMPT_SHARD, sample=PROMPT_SAMPLE, limit=PROMPT_LIMIT, seed=PROMPT_SEED):
+    """One line for the harness headers"""
+    text = dataset or PROMPT_DATASET or f"test_prompts.py ({len(TEST_PROMPTS)} prompts)"
+    if shard:
+        text += f", shard {shard}"
+    if sample < 1:
+        text += f", {sample:.0%} sample (seed {seed})"
+    if limit:
+        text += f", first {limit}"
+    return text
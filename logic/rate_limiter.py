@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+
+# Output tokens charged against a model's TPM bucket before the real count is
+# known; the difference is settled once the response reports its usage.
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("EXPECTED_OUTPUT_TOKENS", "500"))
+
+def estimate_tokens(prompt, expected_output_tokens=EXPECTED_OUTPUT_TOKENS):
+    """Rough token count of a call: about four characters per input token plus the expected output"""
+    return len(prompt) // 4 + expected_output_tokens
+
+class TokenBucket:
+    """Token bucket that refills at a per-minute rate, up to one minute's worth"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until amount tokens are available and take them; waiters are served in order"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def available(self, amount=1):
+        """Whether amount tokens could be taken right now without waiting"""
+        self._refill()
+        return not self._lock.locked() and self.tokens >= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Take more tokens (positive) or give some back (negative) after the fact"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class ModelRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for each model ID"""
+
+    def __init__(self, limits, default_limits=None):
+        self.limits = limits
+        self.default_limits = default_limits or {}
+        self.buckets = {}
+        self.stats = {}
+
+    def _buckets_for(self, model_id):
+        if model_id not in self.buckets:
+            limits = self.limits.get(model_id, self.default_limits)
+            self.buckets[model_id] = {key: TokenBucket(limits[key]) for key in ("rpm", "tpm") if limits.get(key)}
+            self.stats[model_id] = {"requests": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+        return self.buckets[model_id]
+
+    async def acquire(self, model_id, estimated_tokens):
+        """Wait for one request and estimated_tokens of the model's quota"""
+        buckets = self._buckets_for(model_id)
+        started = time.perf_counter()
+        if "rpm" in buckets:
+            await buckets["rpm"].acquire(1)
+        if "tpm" in buckets:
+            await buckets["tpm"].acquire(estimated_tokens)
+        waited = time.perf_counter() - started
+        stats = self.stats[model_id]
+        stats["requests"] += 1
+        stats["wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+        return waited
+
+    def try_acquire(self, model_id, estimated_tokens):
+        """Take one request and estimated_tokens of the model's quota only if both are free right now"""
+        buckets = self._buckets_for(model_id)
+        needed = {"rpm": 1, "tpm": estimated_tokens}
+        if not all(bucket.available(needed[key]) for key, bucket in buckets.items()):
+            return False
+        for key, bucket in buckets.items():
+            bucket.adjust(min(needed[key], bucket.capacity))
+        return True
+
+    def settle(self, model_id, estimated_tokens, usage):
+        """Correct the TPM bucket with the usage a response reported"""
+        bucket = self._buckets_for(model_id).get("tpm")
+        if bucket is None or not usage:
+            return
+        actual = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        bucket.adjust(actual - estimated_tokens)
+
+    def summary(self):
+        """Time spent waiting for quota, per model"""
+        return [dict(self.stats[model_id], model_id=model_id) for model_id in sorted(self.stats)]
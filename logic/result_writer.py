@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import time
+
+from results_store import add_judgments, add_math_responses
+
+# The async pipeline hands every write (results store rows, text exports and
+# JSONL summary lines) to one background stage. It takes up to
+# RESULT_WRITER_BATCH queued writes at a time and runs them in a worker
+# thread, with one results store transaction per table for the whole batch.
+# At most RESULT_WRITER_QUEUE writes wait in the queue; when the disk falls
+# behind, callers wait for room instead of piling up results in memory.
+RESULT_WRITER_QUEUE = int(os.getenv("RESULT_WRITER_QUEUE", "256"))
+RESULT_WRITER_BATCH = int(os.getenv("RESULT_WRITER_BATCH", "64"))
+
+class ResultWriter:
+    """Batched background writer that keeps file and database I/O off the event loop"""
+
+    def __init__(self, max_queue=RESULT_WRITER_QUEUE, max_batch=RESULT_WRITER_BATCH):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.max_batch = max_batch
+        self.task = None
+        self.files = {}
+        self.stats = {"writes": 0, "batches": 0, "largest_batch": 0, "write_seconds": 0.0, "blocked_seconds": 0.0}
+
+    def start(self):
+        self.task = asyncio.create_task(self._drain())
+        return self
+
+    async def _submit(self, kind, *args):
+        """Queue a write, waiting while the queue is full; returns a future for its result"""
+        future = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self.queue.put((kind, args, future))
+        self.stats["blocked_seconds"] += time.perf_counter() - started
+        return future
+
+    async def add_math_responses(self, run_id, records):
+        """Store math records and return their ids once written (judgments need them)"""
+        return await (await self._submit("math", run_id, records))
+
+    async def add_judgments(self, run_id, records):
+        """Queue judgment records for the results store"""
+        await self._submit("judgments", run_id, records)
+
+    async def export(self, save, *args):
+        """Queue a call to a text export function such as save_math_output"""
+        await self._submit("export", save, *args)
+
+    async def append_jsonl(self, path, record):
+        """Queue one summary record as a line of a JSONL file"""
+        await self._submit("jsonl", path, record)
+
+    async def flush(self):
+        """Wait until every write queued so far is done"""
+        await (await self._submit("flush"))
+
+    async def _drain(self):
+        closing = False
+        while not closing:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            if None in batch:
+                closing = True
+                batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            outcomes = await asyncio.to_thread(self._write_batch, batch)
+            self.stats["write_seconds"] += time.perf_counter() - started
+            self.stats["writes"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for (kind, _, future), (value, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None and kind == "math":
+                    future.set_exception(error)
+                    continue
+                if error is not None:
+                    # Nobody waits for the other writes, so report them here
+                    print(f"❌ Failed to write {kind} output: {error}")
+                future.set_result(value)
+
+    def _write_batch(self, batch):
+        """Run one batch of writes (in the worker thread); returns (result, error) per write"""
+        outcomes = [(None, None)] * len(batch)
+        # Rows for the same table and run share one transaction
+        grouped = {}
+        for index, (kind, args, _) in enumerate(batch):
+            if kind in ("math", "judgments"):
+                grouped.setdefault((kind, args[0]), []).append((index, args[1]))
+        for (kind, run_id), writes in grouped.items():
+            insert = add_math_responses if kind == "math" else add_judgments
+            try:
+                ids = insert(run_id, [record for _, records in writes for record in records])
+            except Exception as e:
+                for index, _ in writes:
+                    outcomes[index] = (None, e)
+                continue
+            for index, records in writes:
+                outcomes[index] = (ids[:len(records)], None)
+                ids = ids[len(records):]
+
+        touched = set()
+        for index, (kind, args, _) in enumerate(batch):
+            try:
+                if kind == "export":
+                    outcomes[index] = (args[0](*args[1:]), None)
+                elif kind == "jsonl":
+                    path, record = args
+                    if path not in self.files:
+                        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                        self.files[path] = open(path, "a")
+                    self.files[path].write(json.dumps(record) + "\n")
+                    touched.add(path)
+            except Exception as e:
+                outcomes[index] = (None, e)
+        for path in touched:
+            self.files[path].flush()
+        return outcomes
+
+    async def close(self):
+        """Write everything still queued, then close the summary files"""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        for f in self.files.values():
+            f.close()
+        self.files = {}
@@ -0,0 +1,268 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Results of every harness run, kept in one SQLite file next to the output
+# folders. A run has math responses (one per model and prompt) and judgments
+# (one per judge and math response); the per-prompt text files in math_output/
+# and compare_output/ are only written when a harness is asked to export them.
+# Rows are only ever appended and each insert is committed before the harness
+# moves on, so the tables double as the run's journal: a run whose finished
+# column is still empty was interrupted, and its error-free rows are the units
+# a resumed run can skip.
+RESULTS_DB = os.getenv("RESULTS_DB", "../results.db")
+# WAL lets readers and a writer overlap, but only on one machine; queue
+# workers on several machines that share the database need DELETE. Writers
+# from other processes are waited for up to RESULTS_DB_BUSY_SECONDS.
+RESULTS_DB_JOURNAL = os.getenv("RESULTS_DB_JOURNAL", "WAL")
+RESULTS_DB_BUSY_SECONDS = float(os.getenv("RESULTS_DB_BUSY_SECONDS", "60"))
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " harness TEXT,"
+    " timestamp TEXT,"
+    " options TEXT,"
+    " started REAL,"
+    " finished REAL)",
+    "CREATE TABLE IF NOT EXISTS math_responses ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " run_id INTEGER REFERENCES runs (run_id),"
+    " model_id TEXT,"
+    " prompt_index INTEGER,"
+    " prompt_id TEXT,"
+    " prompt TEXT,"
+    " correct_answer TEXT,"
+    " response TEXT,"
+    " grade TEXT,"
+    " error TEXT,"
+    " usage TEXT,"
+    " metrics TEXT,"
+    " response_cache_hit INTEGER,"
+    " created REAL)",
+    "CREATE TABLE IF NOT EXISTS judgments ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " run_id INTEGER REFERENCES runs (run_id),"
+    " math_response_id INTEGER REFERENCES math_responses (id),"
+    " analyzed_model_id TEXT,"
+    " answering_model_id TEXT,"
+    " prompt_index INTEGER,"
+    " prompt_id TEXT,"
+    " formatted_prompt TEXT,"
+    " analysis_response TEXT,"
+    " scores TEXT,"
+    " error TEXT,"
+    " usage TEXT,"
+    " metrics TEXT,"
+    " response_cache_hit INTEGER,"
+    " created REAL)",
+    "CREATE INDEX IF NOT EXISTS runs_harness ON runs (harness, run_id)",
+    "CREATE INDEX IF NOT EXISTS math_responses_model ON math_responses (run_id, model_id, prompt_index)",
+    "CREATE INDEX IF NOT EXISTS math_responses_prompt ON math_responses (run_id, prompt_index)",
+    "CREATE INDEX IF NOT EXISTS math_responses_prompt_id ON math_responses (run_id, prompt_id)",
+    "CREATE INDEX IF NOT EXISTS judgments_judge ON judgments (run_id, answering_model_id, prompt_index)",
+    "CREATE INDEX IF NOT EXISTS judgments_analyzed ON judgments (run_id, analyzed_model_id, prompt_index)",
+    "CREATE INDEX IF NOT EXISTS judgments_response ON judgments (math_response_id)",
+    "CREATE INDEX IF NOT EXISTS judgments_prompt_id ON judgments (run_id, prompt_id)",
+)
+
+# Stored as JSON text and decoded again when read
+JSON_COLUMNS = ("options", "error", "usage", "metrics", "scores", "grade")
+
+_connection = None
+_lock = threading.Lock()
+
+def _connect():
+    """Open the results database on first use (caller holds the lock)"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(os.path.abspath(RESULTS_DB)), exist_ok=True)
+        _connection = sqlite3.connect(RESULTS_DB, timeout=RESULTS_DB_BUSY_SECONDS, check_same_thread=False)
+        _connection.row_factory = sqlite3.Row
+        _connection.execute(f"PRAGMA journal_mode={RESULTS_DB_JOURNAL}")
+        for statement in SCHEMA:
+            _connection.execute(statement)
+        _connection.commit()
+    return _connection
+
+def _encode(value):
+    return json.dumps(value) if value is not None else None
+
+def _row(row):
+    """Turn a result row into a dict with its JSON columns decoded"""
+    record = dict(row)
+    for key in JSON_COLUMNS:
+        if record.get(key) is not None:
+            record[key] = json.loads(record[key])
+    if "response_cache_hit" in record:
+        record["response_cache_hit"] = bool(record["response_cache_hit"])
+    return record
+
+def start_run(harness, timestamp, options=None):
+    """Register a harness run and return its run_id"""
+    with _lock:
+        connection = _connect()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (harness, timestamp, options, started) VALUES (?, ?, ?, ?)",
+                (harness, timestamp, _encode(options or {}), time.time()),
+            )
+        return cursor.lastrowid
+
+def finish_run(run_id):
+    """Mark a run as complete"""
+    with _lock:
+        connection = _connect()
+        with connection:
+            connection.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (time.time(), run_id))
+
+def add_math_responses(run_id, records):
+    """Insert math result records in one transaction; returns their ids in order
+
+    records are the dicts the harnesses build per call (model_id,
+    prompt_index, prompt_id, prompt_text, correct_answer, response, grade,
+    error, usage, metrics, response_cache_hit).
+    """
+    ids = []
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        with connection:
+            for record in records:
+                cursor = connection.execute(
+                    "INSERT INTO math_responses (run_id, model_id, prompt_index, prompt_id, prompt, correct_answer, response, grade,"
+                    " error, usage, metrics, response_cache_hit, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, record["model_id"], int(record["prompt_index"]), record.get("prompt_id"), record["prompt_text"],
+                     record.get("correct_answer"), record.get("response"), _encode(record.get("grade")), _encode(record.get("error")),
+                     _encode(record.get("usage")), _encode(record.get("metrics")),
+                     int(bool(record.get("response_cache_hit"))), now),
+                )
+                ids.append(cursor.lastrowid)
+    return ids
+
+def add_judgments(run_id, records):
+    """Insert comparison records in one transaction; returns their ids in order
+
+    records are the harnesses' comparison dicts; math_response_id links each
+    one to the response it judged.
+    """
+    ids = []
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        with connection:
+            for record in records:
+                cursor = connection.execute(
+                    "INSERT INTO judgments (run_id, math_response_id, analyzed_model_id, answering_model_id, prompt_index,"
+                    " prompt_id, formatted_prompt, analysis_response, scores, error, usage, metrics, response_cache_hit, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, record.get("math_response_id"), record["analyzed_model_id"], record["answering_model_id"],
+                     int(record["prompt_index"]), record.get("prompt_id"), record.get("formatted_prompt"), record.get("analysis_response"),
+                     _encode(record.get("scores")), _encode(record.get("error")), _encode(record.get("usage")), _encode(record.get("metrics")),
+                     int(bool(record.get("response_cache_hit"))), now),
+                )
+                ids.append(cursor.lastrowid)
+    return ids
+
+def get_run(run_id):
+    """The runs row for run_id, or None"""
+    with _lock:
+        row = _connect().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    return _row(row) if row else None
+
+def latest_run(harnesses=None, table="math_responses"):
+    """Most recent run with rows in table (math_responses or judgments), optionally only from the given harnesses"""
+    if table not in ("math_responses", "judgments"):
+        raise ValueError(f"unknown results table: {table}")
+    query = f"SELECT * FROM runs WHERE run_id IN (SELECT DISTINCT run_id FROM {table})"
+    params = []
+    if harnesses:
+        query += f" AND harness IN ({', '.join('?' for _ in harnesses)})"
+        params = list(harnesses)
+    with _lock:
+        row = _connect().execute(query + " ORDER BY run_id DESC LIMIT 1", params).fetchone()
+    return _row(row) if row else None
+
+def math_responses(run_id, model_id=None, prompt_index=None, include_errors=True):
+    """Math responses of a run, ordered by model and prompt"""
+    query = "SELECT * FROM math_responses WHERE run_id = ?"
+    params = [run_id]
+    if model_id is not None:
+        query += " AND model_id = ?"
+        params.append(model_id)
+    if prompt_index is not None:
+        query += " AND prompt_index = ?"
+        params.append(int(prompt_index))
+    if not include_errors:
+        query += " AND error IS NULL"
+    with _lock:
+        rows = _connect().execute(query + " ORDER BY model_id, prompt_index, id", params).fetchall()
+    return [_row(row) for row in rows]
+
+def judgments(run_id, answering_model_id=None, analyzed_model_id=None, prompt_index=None, include_errors=True):
+    """Judgments of a run, with the question, correct answer, judged response and its grade joined in"""
+    query = (
+        "SELECT j.*, m.prompt AS original_question, m.correct_answer, m.response AS original_response, m.grade"
+        " FROM judgments j LEFT JOIN math_responses m ON m.id = j.math_response_id WHERE j.run_id = ?"
+    )
+    params = [run_id]
+    for column, value in (("answering_model_id", answering_model_id), ("analyzed_model_id", analyzed_model_id)):
+        if value is not None:
+            query += f" AND j.{column} = ?"
+            params.append(value)
+    if prompt_index is not None:
+        query += " AND j.prompt_index = ?"
+        params.append(int(prompt_index))
+    if not include_errors:
+        query += " AND j.error IS NULL"
+    with _lock:
+        rows = _connect().execute(query + " ORDER BY j.analyzed_model_id, j.prompt_index, j.answering_model_id, j.id", params).fetchall()
+    return [_row(row) for row in rows]
+
+def result_counts(run_id):
+    """(math responses, judgments) a run has stored without errors"""
+    with _lock:
+        connection = _connect()
+        math = connection.execute("SELECT COUNT(*) FROM math_responses WHERE run_id = ? AND error IS NULL", (run_id,)).fetchone()[0]
+        judged = connection.execute("SELECT COUNT(*) FROM judgments WHERE run_id = ? AND error IS NULL", (run_id,)).fetchone()[0]
+    return math, judged
+
+def prompt_results(run_id, prompt_id):
+    """Successful math responses and judgments a run stored for one prompt, as two lists"""
+    where = " WHERE {0}run_id = ? AND {0}error IS NULL AND {0}prompt_id = ?"
+    params = (run_id, prompt_id)
+    with _lock:
+        connection = _connect()
+        math = connection.execute("SELECT * FROM math_responses" + where.format("") + " ORDER BY id", params).fetchall()
+        judged = connection.execute(
+            "SELECT j.*, m.prompt AS original_question, m.correct_answer, m.response AS original_response, m.grade"
+            " FROM judgments j LEFT JOIN math_responses m ON m.id = j.math_response_id" + where.format("j.") + " ORDER BY j.id",
+            params,
+        ).fetchall()
+    return [_row(row) for row in math], [_row(row) for row in judged]
+
+def judgment_scores(run_id):
+    """(analyzed_model_id, answering_model_id, prompt_index, scores) for every successful judgment of a run
+
+    Only the columns the aggregation needs are read.
+    """
+    with _lock:
+        rows = _connect().execute(
+            "SELECT analyzed_model_id, answering_model_id, prompt_index, scores"
+            " FROM judgments WHERE run_id = ? AND error IS NULL ORDER BY id",
+            (run_id,),
+        ).fetchall()
+    return [(row[0], row[1], row[2], json.loads(row[3]) if row[3] is not None else None) for row in rows]
+
+def response_grades(run_id):
+    """(model_id, prompt_index, grade) for every successful math response of a run, or judged in it"""
+    with _lock:
+        rows = _connect().execute(
+            "SELECT model_id, prompt_index, grade FROM math_responses"
+            " WHERE error IS NULL AND (run_id = ? OR id IN (SELECT math_response_id FROM judgments WHERE run_id = ?))"
+            " ORDER BY id",
+            (run_id, run_id),
+        ).fetchall()
+    return [(row[0], row[1], json.loads(row[2]) if row[2] is not None else None) for row in rows]
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import random
+import time
+
+# Retry policy for the harness clients. Throttling, 5xx responses, timeouts and
+# connection failures are retried with exponential backoff and full jitter;
+# anything else fails at once. After CIRCUIT_FAILURE_THRESHOLD failed requests in
+# a row (a request fails once it runs out of retries) a model's circuit opens and
+# its calls fail fast for CIRCUIT_RESET_SECONDS, after which a single trial call
+# decides whether it closes again.
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "1"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "20"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_KINDS = ("throttled", "server", "timeout", "network")
+
+# Runtime errors arrive as {"error": "<message>"}, so they are told apart by text
+THROTTLING_MARKERS = ("throttl", "too many requests", "rate exceeded")
+PERMANENT_MARKERS = ("validationexception", "accessdenied", "resourcenotfound", "unrecognizedclient", "not authorized")
+
+class AgentError(Exception):
+    """Failed agent call: kind is throttled, server, timeout, network, client or circuit_open"""
+
+    def __init__(self, kind, message, status=None, model_id=None, attempts=1):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.status = status
+        self.model_id = model_id
+        self.attempts = attempts
+
+    @property
+    def retryable(self):
+        return self.kind in RETRYABLE_KINDS
+
+    def __str__(self):
+        return f"Error: {self.kind} - {self.message}"
+
+    def to_dict(self):
+        return {"kind": self.kind, "message": self.message, "status": self.status, "attempts": self.attempts}
+
+def classify_error(status, message):
+    """Error kind for an HTTP status (None for transport failures) and error text"""
+    text = str(message).lower()
+    if any(marker in text for marker in PERMANENT_MARKERS):
+        return "client"
+    if status == 429 or any(marker in text for marker in THROTTLING_MARKERS):
+        return "throttled"
+    if status is None:
+        return "timeout" if "timeout" in text or "timed out" in text else "network"
+    if status >= 500:
+        return "server"
+    return "client"
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given (zero-based) retry"""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one model"""
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def allow(self):
+        """Whether a call may go out now"""
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+            return False
+        # Half-open: let one trial call through
+        self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+_breakers = {}
+
+def get_breaker(model_id):
+    """Circuit breaker shared by every call to a model"""
+    key = model_id or "default"
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker()
+    return _breakers[key]
+
+def record_outcome(model_id, error=None):
+    """Feed the result of a call that was made outside call_with_retry to the model's breaker"""
+    if error is None:
+        get_breaker(model_id).record_success()
+    elif error.retryable:
+        get_breaker(model_id).record_failure()
+
+def circuit_states():
+    """Open circuits and their consecutive failure counts"""
+    return {model_id: {"failures": breaker.failures, "open": breaker.opened_at is not None}
+            for model_id, breaker in _breakers.items()}
+
+def _circuit_open_error(breaker, model_id, attempt):
+    return AgentError("circuit_open", f"circuit open for {model_id} after {breaker.failures} failures",
+                      model_id=model_id, attempts=attempt)
+
+def _settle_failed_attempt(breaker, model_id, attempt, error):
+    """Record a failed attempt of a request; returns the backoff before the next attempt, or None when the request has failed
+
+    The breaker counts the request once, when it fails, however many
+    attempts it took. A failed trial call of a half-open circuit opens it
+    again straight away.
+    """
+    error.model_id = model_id
+    error.attempts = attempt + 1
+    if not error.retryable:
+        breaker.trial_in_flight = False
+        return None
+    if attempt + 1 >= RETRY_MAX_ATTEMPTS or breaker.opened_at is not None:
+        breaker.record_failure()
+        return None
+    return backoff_delay(attempt)
+
+async def call_with_retry(model_id, attempt_call, breaker=None):
+    """Await attempt_call() until it succeeds or fails permanently; returns its result or an AgentError
+
+    breaker defaults to the model's shared breaker; requests that are not
+    calls to a single model bring their own, which circuit_states leaves out.
+    """
+    breaker = breaker or get_breaker(model_id)
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        if not breaker.allow():
+            return _circuit_open_error(breaker, model_id, attempt)
+        try:
+            result = await attempt_call()
+        except AgentError as error:
+            delay = _settle_failed_attempt(breaker, model_id, attempt, error)
+            if delay is None:
+                return error
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def call_with_retry_sync(model_id, attempt_call):
+    """Blocking counterpart of call_with_retry for the sequential harnesses"""
+    breaker = get_breaker(model_id)
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        if not breaker.allow():
+            return _circuit_open_error(breaker, model_id, attempt)
+        try:
+            result = attempt_call()
+        except AgentError as error:
+            delay = _settle_failed_attempt(breaker, model_id, attempt, error)
+            if delay is None:
+                return error
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
@@ -43,7 +43,7 @@ def main():
     try:
         # Run the async pipeline script
         result = subprocess.run(
-            [sys.executable, "test_async_pipeline.py"], 
+            [sys.executable, "test_async_pipeline.py", *sys.argv[1:]],  # Pass through options such as --stream
             capture_output=False,  # Show output in real-time
             text=True,
             cwd="tools"
@@ -67,9 +67,10 @@ def main():
     
     if success:
         print("✅ Async pipeline completed successfully!")
-        print("\nResults saved in:")
-        print("- math_output/ (organized by prompt folders)")
-        print("- compare_output/ (organized by prompt folders)")
+        print("\nResults stored in results.db (runs, math_responses and judgments tables)")
+        if "--export-text" in sys.argv:
+            print("- math_output/ (organized by prompt folders)")
+            print("- compare_output/ (organized by prompt folders)")
         print("\n🚀 Performance Benefits:")
         print("- Math and compare agents work in parallel")
         print("- No waiting between requests")
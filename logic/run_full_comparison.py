@@ -4,14 +4,19 @@ Full Model Comparison Runner
 Runs the complete workflow:
 1. First runs test_math_agent.py to generate initial responses
 2. Then runs test_compare_models.py to analyze those responses
+
+--export-text goes to both stages; other options go to one stage each:
+    python run_full_comparison.py --math-args "--dataset ../data/math.jsonl --limit 100" --compare-args "--judges cascade"
 """
 
+import argparse
+import shlex
 import subprocess
 import sys
 import time
 from datetime import datetime
 
-def run_script(script_name, description):
+def run_script(script_name, description, args=()):
     """Run a Python script and handle the output"""
     print(f"\n{'='*60}")
     print(f"STEP: {description}")
@@ -21,7 +26,7 @@ def run_script(script_name, description):
     try:
         # Run the script and capture output
         result = subprocess.run(
-            [sys.executable, script_name], 
+            [sys.executable, script_name, *args],
             capture_output=False,  # Show output in real-time
             text=True,
             cwd="tools"
@@ -40,6 +45,13 @@ def run_script(script_name, description):
 
 def main():
     """Run the full comparison workflow"""
+    parser = argparse.ArgumentParser(description="Run the math harness, then the compare harness on its responses")
+    parser.add_argument("--export-text", action="store_true", help="have both stages also write one text file per result")
+    parser.add_argument("--math-args", default="", help="options for test_math_agent.py, as one quoted string")
+    parser.add_argument("--compare-args", default="", help="options for test_compare_models.py, as one quoted string")
+    args = parser.parse_args()
+    shared_args = ["--export-text"] if args.export_text else []
+    
     start_time = datetime.now()
     
     print("🚀 Starting Full Model Comparison Workflow")
@@ -65,7 +77,7 @@ def main():
     total_steps = 2
     
     # Step 1: Run math agent tests
-    if run_script("test_math_agent.py", "Generate initial math responses"):
+    if run_script("test_math_agent.py", "Generate initial math responses", shared_args + shlex.split(args.math_args)):
         success_count += 1
         print(f"\n⏳ Waiting 3 seconds before next step...")
         time.sleep(3)
@@ -74,7 +86,7 @@ def main():
         return
     
     # Step 2: Run comparison tests
-    if run_script("test_compare_models.py", "Analyze responses with compare models"):
+    if run_script("test_compare_models.py", "Analyze responses with compare models", shared_args + shlex.split(args.compare_args)):
         success_count += 1
     
     # Summary
@@ -90,9 +102,10 @@ def main():
     
     if success_count == total_steps:
         print("✅ All steps completed successfully!")
-        print("\nResults saved in:")
-        print("- math_output/ (original responses)")
-        print("- compare_output/ (comparison analyses)")
+        print("\nResults stored in results.db (runs, math_responses and judgments tables)")
+        if args.export_text:
+            print("- math_output/ (original responses)")
+            print("- compare_output/ (comparison analyses)")
     else:
         print("❌ Some steps failed. Check the output above for details.")
 
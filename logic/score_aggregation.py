@@ -0,0 +1,133 @@
+import warnings
+
+import numpy as np
+
+from judge_scores import CRITERIA
+
+class ScoreArray:
+    """Judge ratings as an analyzed model x judge x prompt x criterion array
+
+    Missing ratings (failed calls, unparseable analyses, criteria a judge
+    left out) are NaN, so every statistic below ignores them.
+    """
+
+    def __init__(self, scores, analyzed_models, judges, prompts, criteria=CRITERIA):
+        self.scores = scores
+        self.analyzed_models = list(analyzed_models)
+        self.judges = list(judges)
+        self.prompts = list(prompts)
+        self.criteria = list(criteria)
+
+    @classmethod
+    def from_judgments(cls, judgments, criteria=CRITERIA):
+        """Build the array from (analyzed_model_id, judge_model_id, prompt_index, scores) tuples"""
+        judgments = [j for j in judgments if j[3]]
+        analyzed_models, analyzed_index = np.unique(np.array([j[0] for j in judgments], dtype=str), return_inverse=True)
+        judges, judge_index = np.unique(np.array([j[1] for j in judgments], dtype=str), return_inverse=True)
+        prompts, prompt_index = np.unique(np.array([j[2] for j in judgments], dtype=np.int64), return_inverse=True)
+        values = np.array([[scores.get(c, np.nan) for c in criteria] for *_, scores in judgments], dtype=float).reshape(-1, len(criteria))
+
+        scores = np.full((len(analyzed_models), len(judges), len(prompts), len(criteria)), np.nan)
+        # A repeated judgment (e.g. a retry in a resumed run) overwrites the earlier one
+        scores[analyzed_index, judge_index, prompt_index] = values
+        return cls(scores, analyzed_models.tolist(), judges.tolist(), prompts.tolist(), criteria)
+
+    def counts(self):
+        """Ratings per analyzed model and criterion"""
+        return np.sum(~np.isnan(self.scores), axis=(1, 2))
+
+    def means(self):
+        """Mean rating per analyzed model and criterion, over every judge and prompt"""
+        return _nan_stat(np.nanmean, self.scores, axis=(1, 2))
+
+    def variances(self):
+        """Variance of the ratings per analyzed model and criterion"""
+        return _nan_stat(np.nanvar, self.scores, axis=(1, 2))
+
+    def judge_means(self):
+        """Mean rating per analyzed model, judge and criterion (each judge's view of each model)"""
+        return _nan_stat(np.nanmean, self.scores, axis=2)
+
+    def judge_spread(self):
+        """Mean standard deviation across judges of the ratings for one response, per criterion"""
+        per_response = _nan_stat(np.nanstd, self.scores, axis=1)
+        return _nan_stat(np.nanmean, per_response, axis=(0, 1))
+
+    def judge_agreement(self):
+        """Mean pairwise Pearson correlation between judges per criterion
+
+        Each judge's ratings form a vector over (analyzed model, prompt)
+        responses; every pair of judges is correlated on the responses both
+        rated. NaN where fewer than two judges overlap.
+        """
+        # criterion x judge x response
+        responses = len(self.analyzed_models) * len(self.prompts)
+        x = np.moveaxis(self.scores, (3, 1), (0, 1)).reshape(len(self.criteria), len(self.judges), responses)
+        present = (~np.isnan(x)).astype(float)
+        x0 = np.nan_to_num(x)
+        # Sums over the responses both judges of each pair rated
+        n = present @ present.transpose(0, 2, 1)
+        sx = x0 @ present.transpose(0, 2, 1)
+        sxx = (x0 ** 2) @ present.transpose(0, 2, 1)
+        sxy = x0 @ x0.transpose(0, 2, 1)
+        sy = sx.transpose(0, 2, 1)
+        syy = sxx.transpose(0, 2, 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = sxy - sx * sy / n
+            r = cov / np.sqrt((sxx - sx ** 2 / n) * (syy - sy ** 2 / n))
+        pairs = np.triu(np.ones((len(self.judges), len(self.judges)), dtype=bool), k=1)
+        r = np.where(pairs & (n >= 2), r, np.nan)
+        return _nan_stat(np.nanmean, r, axis=(1, 2))
+
+    def leaderboards(self):
+        """Analyzed models ranked by mean rating, per criterion and overall
+
+        The overall score of a model is the mean of its criterion means.
+        """
+        means = self.means()
+        variances = self.variances()
+        counts = self.counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std_errors = np.sqrt(variances / counts)
+        overall = _nan_stat(np.nanmean, means, axis=1)
+
+        boards = {}
+        columns = [(criterion, means[:, i], std_errors[:, i], counts[:, i]) for i, criterion in enumerate(self.criteria)]
+        columns.append(("overall", overall, np.full(len(overall), np.nan), counts.sum(axis=1)))
+        for name, column, errors, n in columns:
+            # NaN means sort last
+            order = np.argsort(np.where(np.isnan(column), -np.inf, column))[::-1]
+            boards[name] = [{
+                "rank": rank,
+                "model_id": self.analyzed_models[i],
+                "mean": _float(column[i]),
+                "std_error": _float(errors[i]),
+                "ratings": int(n[i]),
+            } for rank, i in enumerate(order, 1)]
+        return boards
+
+    def summary(self):
+        """Leaderboards plus per-criterion judge agreement and spread, as plain JSON-ready values"""
+        agreement = self.judge_agreement()
+        spread = self.judge_spread()
+        return {
+            "analyzed_models": len(self.analyzed_models),
+            "judges": len(self.judges),
+            "prompts": len(self.prompts),
+            "ratings": int(np.sum(~np.isnan(self.scores))),
+            "leaderboards": self.leaderboards(),
+            "judge_agreement": {criterion: _float(agreement[i]) for i, criterion in enumerate(self.criteria)},
+            "judge_spread": {criterion: _float(spread[i]) for i, criterion in enumerate(self.criteria)},
+        }
+
+def _nan_stat(stat, values, axis):
+    """NumPy nan-statistic without the all-NaN slice warnings (those slices stay NaN)"""
+    if values.size == 0:
+        shape = [size for i, size in enumerate(values.shape) if i not in np.atleast_1d(axis) % values.ndim]
+        return np.full(shape, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return stat(values, axis=axis)
+
+def _float(value):
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,12 @@
+import pytest
+
+import results_store
+
+@pytest.fixture
+def results_db(tmp_path, monkeypatch):
+    """A fresh results database for the test"""
+    monkeypatch.setattr(results_store, "RESULTS_DB", str(tmp_path / "results.db"))
+    monkeypatch.setattr(results_store, "_connection", None)
+    yield
+    if results_store._connection is not None:
+        results_store._connection.close()
@@ -0,0 +1,46 @@
+from adaptive import AdaptiveStopper
+from judge_scores import CRITERIA
+
+def rate(stopper, model_id, prompts, score):
+    for prompt in prompts:
+        stopper.add(model_id, prompt, dict.fromkeys(CRITERIA, score(prompt)))
+
+def test_waits_for_min_prompts():
+    stopper = AdaptiveStopper(["a"], min_prompts=5, samples=200)
+    rate(stopper, "a", range(4), lambda prompt: 7)
+    assert not stopper.check("a")
+    rate(stopper, "a", [4], lambda prompt: 7)
+    assert stopper.check("a")
+    assert stopper.stopped["a"] == {"prompts": 5, "reason": "interval width"}
+
+def test_noisy_model_keeps_going():
+    stopper = AdaptiveStopper(["a"], target_width=0.5, min_prompts=5, samples=200)
+    rate(stopper, "a", range(10), lambda prompt: 1 if prompt % 2 else 10)
+    assert not stopper.check("a")
+    assert not stopper.is_stopped("a")
+
+def test_rank_separation():
+    stopper = AdaptiveStopper(["a", "b"], target_width=0.5, min_prompts=5, samples=200)
+    rate(stopper, "a", range(10), lambda prompt: 1 + prompt % 2)
+    rate(stopper, "b", range(10), lambda prompt: 8 + prompt % 2)
+    # Separation only counts once the other model has an interval
+    assert not stopper.check("a")
+    assert stopper.check("b")
+    assert stopper.stopped["b"]["reason"] == "rank separation"
+
+def test_unrated_criteria_do_not_hold_a_model_back():
+    stopper = AdaptiveStopper(["a"], min_prompts=3, samples=200)
+    for prompt in range(3):
+        stopper.add("a", prompt, {"completeness": 6})
+    assert stopper.check("a")
+    intervals = stopper.summary()[0]["intervals"]
+    assert intervals["completeness"] == [6, 6]
+    assert intervals["professionalism"] == [None, None]
+
+def test_summary():
+    stopper = AdaptiveStopper(["a"], min_prompts=2, samples=50)
+    rate(stopper, "a", range(2), lambda prompt: 5)
+    stopper.add("a", 2, {})
+    stopper.check("a")
+    row, = stopper.summary()
+    assert (row["model_id"], row["prompts_rated"], row["stopped"], row["stopped_after_prompts"]) == ("a", 2, True, 2)
@@ -0,0 +1,93 @@
+from answer_grader import extract_answer, grade_answer, grader_summary, question_options, should_judge
+from test_prompts import TEST_PROMPTS
+
+def test_final_answer_marker_wins_over_later_numbers():
+    answer = extract_answer("2 + 2 = 4, so\nFinal answer: 4\nChecked in 3 steps.")
+    assert answer["value"] == 4
+    assert answer["source"] == "marker"
+
+def test_last_number_without_marker():
+    answer = extract_answer("First 12, then 15 and finally 17")
+    assert answer["value"] == 17
+    assert answer["source"] == "last number"
+
+def test_fractions_percentages_and_boxed():
+    assert extract_answer(r"The answer is \boxed{\frac{1}{4}}")["value"] == 0.25
+    assert extract_answer("Final answer: 3/4")["value"] == 0.75
+    assert extract_answer("Final answer: 12.5%")["value"] == 0.125
+    assert extract_answer("Final answer: 1,234")["value"] == 1234
+
+def test_bold_answer_marker():
+    response = "**Answer:** The probability that at most 2 are accepted is **0.8369** (or about 83.69%)."
+    answer = extract_answer(response)
+    assert (answer["value"], answer["source"]) == (0.8369, "marker")
+    grade = grade_answer(response, "Final answer: 0.8369")
+    assert grade["verdict"] == "correct"
+    assert grade["confident"]
+    assert extract_answer("**Final answer**: 12")["value"] == 12
+
+def test_no_answer():
+    assert extract_answer("I cannot tell.") is None
+    assert extract_answer(None) is None
+
+def test_correct_and_confident():
+    grade = grade_answer("Working...\nFinal answer: 42", "42")
+    assert grade["verdict"] == "correct"
+    assert grade["confident"]
+    assert grade["method"] == "value"
+
+def test_incorrect():
+    grade = grade_answer("Final answer: 41", "42")
+    assert grade["verdict"] == "incorrect"
+    assert grade["confident"]
+
+def test_unmarked_answer_is_not_confident():
+    grade = grade_answer("I get 42", "42")
+    assert grade["verdict"] == "correct"
+    assert not grade["confident"]
+
+def test_compares_at_the_coarser_precision():
+    assert grade_answer("Final answer: 0.333", "1/3")["verdict"] == "correct"
+    assert grade_answer("Final answer: 3.14", "3.14159")["verdict"] == "correct"
+    # Agreeing only to fewer decimals than required is not decided
+    assert grade_answer("Final answer: 3.1", "3.14159")["verdict"] == "unknown"
+
+def test_multiple_choice():
+    question = "Which is largest?\n(A) 0.2\n(B) 0.24\n(C) 0.3"
+    reference = "The correct answer is C. The others are smaller."
+    assert grade_answer("The answer is (C)", reference, question)["verdict"] == "correct"
+    # A number that is one of the options picks it
+    assert grade_answer("Final answer: 0.3", reference, question)["method"] == "choice"
+    assert grade_answer("The answer is (A)", reference, question)["verdict"] == "incorrect"
+
+def test_chosen_option_value_wins_over_the_explanation():
+    question = "Which is largest?\n(A) 0.2\n(B) 0.24\n(C) 0.3"
+    answer = extract_answer("The correct answer is C. For this analysis, let P1 = 0.52.", question_options(question))
+    assert (answer["choice"], answer["value"]) == ("C", 0.3)
+
+def test_test_prompt_references():
+    expected = [("C", 0.24), (None, 4 / 13), (None, 0.8369), (None, 6)]
+    references = [prompt for prompt in TEST_PROMPTS if isinstance(prompt, dict) and prompt.get("answer")]
+    for prompt, (choice, value) in zip(references, expected):
+        answer = extract_answer(prompt["answer"], question_options(prompt["question"]))
+        assert answer["choice"] == choice
+        assert abs(answer["value"] - value) < 1e-9
+
+def test_reference_without_answer():
+    assert grade_answer("Final answer: 1", "no idea") is None
+
+def test_should_judge_samples_only_confident_grades():
+    confident = {"confident": True}
+    assert should_judge(None, "m", 1, rate=0)
+    assert should_judge({"confident": False}, "m", 1, rate=0)
+    assert not should_judge(confident, "m", 1, rate=0)
+    assert should_judge(confident, "m", 1, rate=1)
+    picked = [should_judge(confident, "m", key, rate=0.3) for key in range(1000)]
+    assert 200 < sum(picked) < 400
+    # The sample is fixed per model and prompt
+    assert picked == [should_judge(confident, "m", key, rate=0.3) for key in range(1000)]
+
+def test_grader_summary():
+    grades = [("m", grade_answer("Final answer: 1", "1")), ("m", grade_answer("Final answer: 2", "1")), ("m", None)]
+    row, = grader_summary(grades)
+    assert (row["graded"], row["correct"], row["incorrect"], row["confident"]) == (2, 1, 1, 2)
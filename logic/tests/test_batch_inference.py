@@ -0,0 +1,102 @@
+import glob
+import json
+import os
+
+import pytest
+
+import batch_inference
+import results_store
+from judge_panel import JudgePanel
+
+MODELS = ["eu.anthropic.claude-3-7-sonnet-20250219-v1:0", "eu.meta.llama3-2-3b-instruct-v1:0"]
+PROMPTS = [{"question": "What is 1 + 1?", "answer": "2"}, {"question": "What is 2 + 2?", "answer": "4"}]
+
+@pytest.fixture(autouse=True)
+def in_tools_dir(tmp_path, monkeypatch, results_db):
+    # The harnesses run from logic/tools and write next to it
+    (tmp_path / "tools").mkdir()
+    monkeypatch.chdir(tmp_path / "tools")
+
+def read_manifest(job_dir):
+    with open(os.path.join(job_dir, "manifest.json")) as f:
+        return json.load(f)
+
+def fail_first_record(job_dir, filename, message="ThrottlingException: Too many requests"):
+    path = os.path.join(job_dir, f"{filename}.out")
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    del records[0]["modelOutput"]
+    records[0]["error"] = {"errorCode": 429, "errorMessage": message}
+    with open(path, "w") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+def test_round_trip():
+    job_dir = batch_inference.export_math(MODELS, PROMPTS)
+    manifest = read_manifest(job_dir)
+    assert sorted(entry["model_id"] for entry in manifest["files"].values()) == sorted(MODELS)
+    batch_inference.simulate(job_dir)
+    math_run_id = batch_inference.import_math(job_dir)
+    run = results_store.get_run(math_run_id)
+    assert run["harness"] == "batch" and run["finished"] is not None
+    responses = results_store.math_responses(math_run_id)
+    assert len(responses) == 4
+    assert all(response["error"] is None and response["response"].startswith("Simulated answer") for response in responses)
+    assert {(response["prompt"], response["correct_answer"]) for response in responses} == {(p["question"], p["answer"]) for p in PROMPTS}
+    assert all(response["grade"] for response in responses)
+    # Text files are opt-in
+    assert not os.path.exists(os.path.join("..", "math_output"))
+
+    compare_dir = batch_inference.export_compare(math_run_id, JudgePanel(judge_ids=MODELS))
+    batch_inference.simulate(compare_dir)
+    compare_run_id = batch_inference.import_compare(compare_dir)
+    judgments = results_store.judgments(compare_run_id)
+    assert len(judgments) == 8
+    assert all(judgment["error"] is None and judgment["scores"]["factual_correctness"] == 8 for judgment in judgments)
+    # Each judgment is linked to the response it rated
+    assert {judgment["math_response_id"] for judgment in judgments} == {response["id"] for response in responses}
+    assert all(judgment["original_response"].startswith("Simulated answer") for judgment in judgments)
+    assert results_store.latest_run(table="judgments")["run_id"] == compare_run_id
+
+def test_export_text():
+    job_dir = batch_inference.export_math(MODELS[:1], PROMPTS[:1])
+    batch_inference.simulate(job_dir)
+    math_run_id = batch_inference.import_math(job_dir, export_text=True)
+    assert len(glob.glob(os.path.join("..", "math_output", "prompt_1", "*.txt"))) == 1
+
+    compare_dir = batch_inference.export_compare(math_run_id, JudgePanel(judge_ids=MODELS[:1]))
+    batch_inference.simulate(compare_dir)
+    batch_inference.import_compare(compare_dir, export_text=True)
+    exported, = glob.glob(os.path.join("..", "compare_output", "prompt_1", "*.txt"))
+    with open(exported) as f:
+        assert "ANALYSIS RESPONSE:" in f.read()
+
+def test_failed_math_record_does_not_reach_the_judges():
+    job_dir = batch_inference.export_math(MODELS, PROMPTS)
+    batch_inference.simulate(job_dir)
+    fail_first_record(job_dir, next(iter(read_manifest(job_dir)["files"])))
+    math_run_id = batch_inference.import_math(job_dir)
+    failed = [response for response in results_store.math_responses(math_run_id) if response["error"]]
+    assert len(failed) == 1
+    assert failed[0]["response"] is None
+    assert failed[0]["grade"] is None
+    assert failed[0]["error"]["kind"] == "throttled"
+
+    compare_dir = batch_inference.export_compare(math_run_id, JudgePanel(judge_ids=MODELS))
+    records = [record for entry in read_manifest(compare_dir)["files"].values() for record in entry["records"].values()]
+    # The three answered prompts, once per judge
+    assert len(records) == 6
+    assert all(record["original_response"].startswith("Simulated answer") for record in records)
+    for path in glob.glob(os.path.join(compare_dir, "*.jsonl")):
+        with open(path) as f:
+            assert "ThrottlingException" not in f.read()
+
+def test_failed_judge_record_is_not_an_analysis():
+    job_dir = batch_inference.export_math(MODELS[:1], PROMPTS[:1])
+    batch_inference.simulate(job_dir)
+    compare_dir = batch_inference.export_compare(batch_inference.import_math(job_dir), JudgePanel(judge_ids=MODELS[:1]))
+    batch_inference.simulate(compare_dir)
+    fail_first_record(compare_dir, next(iter(read_manifest(compare_dir)["files"])), "ValidationException: bad input")
+    judgment, = results_store.judgments(batch_inference.import_compare(compare_dir))
+    assert judgment["analysis_response"] is None
+    assert judgment["scores"] is None
+    assert judgment["error"]["kind"] == "client"
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from tools import concurrency
+from tools.concurrency import get_concurrency_stats, request_slot
+
+@pytest.fixture(autouse=True)
+def fresh_slots(monkeypatch):
+    monkeypatch.setattr(concurrency, "_global_slots", None)
+    monkeypatch.setattr(concurrency, "_model_slots", {})
+    monkeypatch.setattr(concurrency, "_stats", {})
+
+def peak_in_flight(calls):
+    """Run (model_id, seconds) calls at once; returns the most in flight together, per model and overall"""
+    in_flight = {}
+    peaks = {}
+
+    async def call(model_id, seconds):
+        async with request_slot(model_id):
+            for key in (model_id, "all"):
+                in_flight[key] = in_flight.get(key, 0) + 1
+                peaks[key] = max(peaks.get(key, 0), in_flight[key])
+            await asyncio.sleep(seconds)
+            for key in (model_id, "all"):
+                in_flight[key] -= 1
+
+    async def main():
+        await asyncio.gather(*(call(model_id, seconds) for model_id, seconds in calls))
+
+    asyncio.run(main())
+    return peaks
+
+def test_per_model_limit(monkeypatch):
+    monkeypatch.setattr(concurrency, "MAX_CONCURRENT_PER_MODEL", 2)
+    monkeypatch.setattr(concurrency, "MODEL_CONCURRENCY_LIMITS", {"slow": 1})
+    peaks = peak_in_flight([("fast", 0.02)] * 5 + [("slow", 0.02)] * 3)
+    assert (peaks["fast"], peaks["slow"]) == (2, 1)
+    stats = get_concurrency_stats()
+    assert stats["fast"] == {"in_flight": 0, "queued": 0, "completed": 5}
+    assert stats["slow"]["completed"] == 3
+
+def test_global_limit(monkeypatch):
+    monkeypatch.setattr(concurrency, "MAX_CONCURRENT_REQUESTS", 3)
+    peaks = peak_in_flight([(f"m{n % 4}", 0.02) for n in range(12)])
+    assert peaks["all"] == 3
+
+def test_slots_are_released_on_errors():
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with request_slot("m"):
+                raise RuntimeError("model call failed")
+        async with request_slot("m"):
+            pass
+
+    asyncio.run(main())
+    assert get_concurrency_stats()["m"] == {"in_flight": 0, "queued": 0, "completed": 2}
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import retry
+import test_async_pipeline
+from hedging import Hedger
+from rate_limiter import ModelRateLimiter
+from retry import AgentError, circuit_states
+
+def hedger_with_history(latency=0.01, **kwargs):
+    hedger = Hedger(min_samples=5, max_extra_load=1, **kwargs)
+    for _ in range(5):
+        hedger._record("m", latency)
+    return hedger
+
+def calls_taking(*durations):
+    """make_call whose n-th call answers with n after durations[n]"""
+    started = []
+
+    async def make_call():
+        n = len(started)
+        started.append(n)
+        await asyncio.sleep(durations[n])
+        return n
+    return make_call, started
+
+def test_no_hedge_without_history():
+    hedger = Hedger(min_samples=5)
+    make_call, started = calls_taking(0.05)
+    assert asyncio.run(hedger.run("m", make_call)) == 0
+    assert started == [0]
+    assert hedger.hedge_delay("m") is None
+
+def test_slow_call_is_hedged_and_the_hedge_wins():
+    hedger = hedger_with_history()
+    make_call, started = calls_taking(1, 0.01)
+    assert asyncio.run(hedger.run("m", make_call)) == 1
+    assert started == [0, 1]
+    row, = hedger.summary()
+    assert (row["calls"], row["hedged"], row["hedge_wins"]) == (1, 1, 1)
+
+def test_admit_can_veto_the_hedge():
+    hedger = hedger_with_history()
+    make_call, started = calls_taking(0.1, 0.01)
+    assert asyncio.run(hedger.run("m", make_call, admit=lambda: False)) == 0
+    assert started == [0]
+
+def test_extra_load_cap():
+    hedger = Hedger(min_samples=5, max_extra_load=0.05)
+    for _ in range(5):
+        hedger._record("m", 0.01)
+    make_call, started = calls_taking(0.1, 0.01)
+    # One hedge would be a 100% extra load on the first call
+    asyncio.run(hedger.run("m", make_call))
+    assert started == [0]
+
+def test_failed_hedge_does_not_win():
+    hedger = hedger_with_history()
+    calls = []
+
+    async def make_call():
+        calls.append(1)
+        if len(calls) == 2:
+            return AgentError("server", "boom")
+        await asyncio.sleep(0.1)
+        return "primary"
+
+    assert asyncio.run(hedger.run("m", make_call)) == "primary"
+    assert hedger.summary()[0]["hedge_wins"] == 0
+
+def pipeline_run(hedger, limiter):
+    return {"hedgers": {"math": hedger}, "rate_limiter": limiter}
+
+def test_hedged_call_settles_the_hedge_quota():
+    limiter = ModelRateLimiter({"m": {"tpm": 2000}})
+    run = pipeline_run(hedger_with_history(), limiter)
+    estimated = asyncio.run(test_async_pipeline.acquire_quota(run, "m", "x" * 400))
+    make_call, started = calls_taking(1, 0.01)
+    result, calls = asyncio.run(test_async_pipeline.hedged_call(run, "math", "m", estimated, make_call))
+    assert (result, calls, started) == (1, 2, [0, 1])
+    test_async_pipeline.settle_quota(run, "m", estimated, {"usage": {"input_tokens": 100, "output_tokens": 10}}, calls)
+    # Both calls are charged the reported usage, not the estimate
+    assert 1779 < limiter.buckets["m"]["tpm"].tokens < 1781
+
+def test_vetoed_hedge_is_not_charged():
+    limiter = ModelRateLimiter({"m": {"rpm": 1}})
+    run = pipeline_run(hedger_with_history(), limiter)
+    asyncio.run(test_async_pipeline.acquire_quota(run, "m", "x"))
+    make_call, started = calls_taking(0.1, 0.01)
+    assert asyncio.run(test_async_pipeline.hedged_call(run, "math", "m", 1, make_call)) == (0, 1)
+    assert started == [0]
+
+@pytest.fixture
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {})
+    monkeypatch.setattr(retry, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(test_async_pipeline, "batch_breakers", {})
+
+def test_batch_breaker_is_not_a_model(fresh_breakers, monkeypatch):
+    async def failing_post(session, url, payload):
+        raise AgentError("server", "boom")
+
+    monkeypatch.setattr(test_async_pipeline, "post_invocation", failing_post)
+    results = asyncio.run(test_async_pipeline.call_agent_batch(None, "http://agent/invocations", [{"model_id": "m"}] * 2))
+    assert [result.kind for result in results] == ["server", "server"]
+    assert test_async_pipeline.batch_breakers["http://agent/invocations"].failures == 1
+    assert circuit_states() == {}
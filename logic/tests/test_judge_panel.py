@@ -0,0 +1,56 @@
+import pytest
+
+from judge_panel import JudgePanel
+
+JUDGES = ["cheap", "middle", "expensive", "extra"]
+
+def scores(value, **overrides):
+    return dict({"factual_correctness": value, "subject_focus": value, "completeness": value, "professionalism": value}, **overrides)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        JudgePanel("everyone")
+
+def test_all_and_panel():
+    assert JudgePanel("all", JUDGES).next_judges("m", {}) == JUDGES
+    panel = JudgePanel("panel", JUDGES, size=2)
+    assert panel.next_judges("m", {}) == ["cheap", "middle"]
+    # A judge is never asked twice, even if its call failed
+    assert panel.next_judges("m", {"cheap": None}) == ["middle"]
+    assert panel.next_judges("m", {"cheap": None, "middle": scores(9)}) == []
+    assert panel.max_judges("m") == 2
+
+def test_exclude_self():
+    panel = JudgePanel("panel", JUDGES, size=2, exclude_self=True)
+    assert panel.next_judges("cheap", {}) == ["middle", "expensive"]
+    assert JudgePanel("all", JUDGES, exclude_self=True).max_judges("cheap") == 3
+
+def test_cascade_stops_on_a_clear_rating():
+    panel = JudgePanel("cascade", JUDGES, size=3)
+    assert panel.next_judges("m", {}) == ["cheap"]
+    assert panel.next_judges("m", {"cheap": scores(9)}) == []
+    assert panel.next_judges("m", {"cheap": scores(2)}) == []
+    assert panel.escalations == {"no ratings": 0, "uncertain band": 0, "disagreement": 0}
+
+def test_cascade_escalates_uncertain_ratings():
+    panel = JudgePanel("cascade", JUDGES, size=3, band=(4, 7), disagreement=2)
+    assert panel.next_judges("m", {"cheap": scores(5)}) == ["middle"]
+    assert panel.next_judges("m", {"cheap": None}) == ["middle"]
+    assert panel.next_judges("m", {"cheap": scores(9), "middle": scores(9, completeness=5)}) == ["expensive"]
+    assert panel.escalations == {"no ratings": 1, "uncertain band": 1, "disagreement": 1}
+    # Never more than size judges
+    assert panel.next_judges("m", {"cheap": scores(5), "middle": scores(5), "expensive": scores(5)}) == []
+
+def test_uncertainty_ignores_missing_criteria():
+    panel = JudgePanel("cascade", JUDGES)
+    assert panel.uncertainty([{"factual_correctness": 9}, {"factual_correctness": 8, "completeness": 9}]) is None
+
+def test_iter_judges_follows_the_ratings():
+    panel = JudgePanel("cascade", JUDGES, size=3)
+    ratings = {"cheap": scores(7), "middle": scores(8)}
+    rated = {}
+    called = []
+    for judge in panel.iter_judges("m", rated):
+        called.append(judge)
+        rated[judge] = ratings.get(judge, scores(9))
+    assert called == ["cheap", "middle"]
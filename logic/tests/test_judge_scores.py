@@ -0,0 +1,25 @@
+from judge_scores import parse_judge_scores
+
+FULL = {"factual_correctness": 8, "subject_focus": 7, "completeness": 9, "professionalism": 6}
+
+def test_bare_json():
+    assert parse_judge_scores('{"factual_correctness": 8, "subject_focus": 7, "completeness": 9, "professionalism": 6}') == FULL
+
+def test_fenced_json_in_prose():
+    text = 'Here is my rating:\n```json\n{"factual_correctness": 8, "subject_focus": 7, "completeness": 9, "professionalism": 6}\n```\nDone.'
+    assert parse_judge_scores(text) == FULL
+
+def test_nested_ratings_and_case():
+    text = '{"analysis": "fine", "ratings": {"Factual_Correctness": "8", "completeness": 9}}'
+    assert parse_judge_scores(text) == {"factual_correctness": 8, "completeness": 9}
+
+def test_cut_off_json():
+    assert parse_judge_scores('{"factual_correctness": 8, "subject_focus": 7, "comple') == {"factual_correctness": 8, "subject_focus": 7}
+
+def test_off_scale_and_non_numeric_ratings_are_dropped():
+    text = '{"factual_correctness": 11, "subject_focus": true, "completeness": "n/a", "professionalism": 0.5}'
+    assert parse_judge_scores(text) == {}
+
+def test_nothing_to_parse():
+    assert parse_judge_scores("No ratings here.") == {}
+    assert parse_judge_scores(None) == {}
@@ -0,0 +1,29 @@
+from test_async_pipeline import LatencySample, add_stream_timing, summarize_stream_timings
+
+def test_sample_stays_bounded_and_mean_stays_exact():
+    sample = LatencySample(size=100)
+    for value in range(10000):
+        sample.add(value)
+    assert len(sample.values) == 100
+    assert sample.count == 10000
+    assert sample.mean() == 4999.5
+    assert 3500 < sample.percentile(0.5) < 6500
+
+def test_small_series_are_exact():
+    sample = LatencySample(size=100)
+    for value in (5, 1, 3):
+        sample.add(value)
+    assert sample.percentile(0.5) == 3
+    assert sample.percentile(0.95) == 5
+    assert LatencySample().mean() is None
+    assert LatencySample().percentile(0.5) is None
+
+def test_stream_timing_summary():
+    run = {"stream_timings": {}}
+    add_stream_timing(run, "math", "m", {"ttft": 0.2, "inter_token": [0.01, 0.03], "total": 1.0})
+    add_stream_timing(run, "math", "m", {"ttft": None, "inter_token": [], "total": 2.0})
+    row, = summarize_stream_timings(run["stream_timings"])
+    assert (row["stage"], row["model_id"], row["requests"]) == ("math", "m", 2)
+    assert row["ttft_mean"] == 0.2
+    assert row["inter_token_mean"] == 0.02
+    assert row["total_mean"] == 1.5
@@ -0,0 +1,36 @@
+import importlib.util
+
+from tools import get_agent
+from tools.get_agent import resolve_prompt_caching
+from tools.system_prompt import SYSTEM_PROMPT
+
+SONNET = "eu.anthropic.claude-3-7-sonnet-20250219-v1:0"
+HAIKU = "eu.anthropic.claude-3-5-haiku-20241022-v1:0"
+LLAMA = "eu.meta.llama3-2-3b-instruct-v1:0"
+
+def test_short_prefix_gets_no_cache_point():
+    # The math system prompt alone is below Claude's 1024-token minimum
+    assert not resolve_prompt_caching(SONNET, True, SYSTEM_PROMPT)
+    assert resolve_prompt_caching(SONNET, True, "x" * 4 * 1024)
+
+def test_minimum_is_per_model():
+    prefix = "x" * 4 * 1500
+    assert resolve_prompt_caching(SONNET, True, prefix)
+    assert not resolve_prompt_caching(HAIKU, True, prefix)
+    assert not resolve_prompt_caching(LLAMA, True, prefix)
+
+def test_setting_decides_when_not_requested(monkeypatch):
+    prefix = "x" * 5000
+    monkeypatch.setenv("PROMPT_CACHING", "true")
+    assert resolve_prompt_caching(SONNET, None, prefix)
+    assert not resolve_prompt_caching(SONNET, False, prefix)
+    monkeypatch.setenv("PROMPT_CACHING", "false")
+    assert not resolve_prompt_caching(SONNET, None, prefix)
+
+def test_compare_runtime_has_the_same_limits():
+    # compare_models/tools/get_agent.py is not synced, so check its copy of the settings
+    spec = importlib.util.spec_from_file_location("compare_get_agent", get_agent.__file__.replace("math_agent2", "compare_models"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.PROMPT_CACHE_MODELS == get_agent.PROMPT_CACHE_MODELS
+    assert not module.resolve_prompt_caching(SONNET, True, SYSTEM_PROMPT)
@@ -0,0 +1,71 @@
+import csv
+import json
+
+import pytest
+
+from prompt_dataset import dataset_size, load_prompts, parse_shard, prompt_id, shuffled
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "math.jsonl"
+    with open(path, "w") as f:
+        for i in range(1, 101):
+            f.write(json.dumps({"question": f"What is {i} + {i}?", "answer": 2 * i}) + "\n")
+    return str(path)
+
+def test_rows():
+    prompts = list(load_prompts([{"question": "Q1", "answer": 2}, "Q2", {"id": 7, "prompt": "Q3", "answer": ""}, {"question": ""}]))
+    assert [prompt["question"] for prompt in prompts] == ["Q1", "Q2", "Q3"]
+    assert [prompt["index"] for prompt in prompts] == [1, 2, 3]
+    assert prompts[0]["id"] == prompt_id("Q1")
+    assert prompts[0]["answer"] == "2"
+    assert (prompts[2]["id"], prompts[2]["answer"]) == ("7", None)
+
+def test_csv(tmp_path):
+    path = tmp_path / "math.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, ["id", "question", "answer"])
+        writer.writeheader()
+        writer.writerow({"id": "q1", "question": "What is 1 + 1?", "answer": "2"})
+    prompt, = load_prompts(str(path))
+    assert (prompt["id"], prompt["answer"]) == ("q1", "2")
+
+def test_shards_split_the_dataset(dataset):
+    shards = [[prompt["index"] for prompt in load_prompts(dataset, shard=f"{i}/3")] for i in range(3)]
+    assert sorted(sum(shards, [])) == list(range(1, 101))
+    assert all(shard for shard in shards)
+    # Indexes are the row numbers of the whole dataset
+    assert shards[1] == sorted(shards[1])
+
+def test_shard_does_not_depend_on_row_order(dataset):
+    rows = [{"question": f"What is {i} + {i}?"} for i in range(1, 101)]
+    ids = lambda prompts: {prompt["id"] for prompt in prompts}
+    assert ids(load_prompts(rows, shard="0/4")) == ids(load_prompts(list(reversed(rows)), shard="0/4"))
+    assert ids(load_prompts(rows, shard="0/4")) == ids(load_prompts(dataset, shard="0/4"))
+
+def test_invalid_shard():
+    assert parse_shard("") is None
+    assert parse_shard("1/4") == (1, 4)
+    with pytest.raises(ValueError):
+        parse_shard("4/4")
+
+def test_sample_and_limit(dataset):
+    sample = list(load_prompts(dataset, sample=0.3, seed=1))
+    assert 15 < len(sample) < 45
+    assert sample == list(load_prompts(dataset, sample=0.3, seed=1))
+    assert sample != list(load_prompts(dataset, sample=0.3, seed=2))
+    assert list(load_prompts(dataset, sample=0.3, seed=1, limit=5)) == sample[:5]
+
+def test_dataset_size(dataset):
+    assert dataset_size(["a", "b", "c"]) == 3
+    assert dataset_size(["a", "b", "c"], limit=2) == 2
+    assert dataset_size(["a", "b"], shard="0/2") is None
+    assert dataset_size(["a", "b"], sample=0.5) is None
+    # Only Parquet files know their row count without being read
+    assert dataset_size(dataset) is None
+
+def test_shuffled_is_a_seeded_permutation():
+    order = list(shuffled(iter(range(50)), 10, seed=3))
+    assert sorted(order) == list(range(50))
+    assert order != list(range(50))
+    assert order == list(shuffled(iter(range(50)), 10, seed=3))
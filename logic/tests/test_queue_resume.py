@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import queue_pipeline
+import results_store
+import retry
+import test_async_pipeline
+import work_queue
+from judge_panel import JUDGE_MODEL_IDS
+from prompt_dataset import dataset_options, load_prompts
+
+MODELS = ["eu.anthropic.claude-3-7-sonnet-20250219-v1:0", "eu.meta.llama3-2-3b-instruct-v1:0"]
+RATINGS = {"factual_correctness": 8, "subject_focus": 8, "completeness": 7, "professionalism": 9}
+
+@pytest.fixture(autouse=True)
+def queue_run(tmp_path, monkeypatch, results_db):
+    (tmp_path / "tools").mkdir()
+    monkeypatch.chdir(tmp_path / "tools")
+    monkeypatch.setattr(work_queue, "WORK_QUEUE_DB", str(tmp_path / "work_queue.db"))
+    monkeypatch.setattr(work_queue, "_connection", None)
+    monkeypatch.setattr(queue_pipeline, "MODEL_IDS", MODELS)
+    monkeypatch.setattr(queue_pipeline, "POLL_SECONDS", 0.05)
+    monkeypatch.setattr(retry, "_breakers", {})
+
+    async def no_stats(session):
+        return {}
+
+    monkeypatch.setattr(queue_pipeline, "fetch_runtime_stats", no_stats)
+    yield
+    if work_queue._connection is not None:
+        work_queue._connection.close()
+
+@pytest.fixture
+def agent_calls(monkeypatch):
+    """Answers the math and judge calls without agents, and records them"""
+    calls = {"math": [], "compare": []}
+
+    def envelope(text):
+        return json.dumps({"text": text, "usage": {"input_tokens": 10, "output_tokens": 5}, "metrics": {}, "cache_hit": False})
+
+    async def math_agent(session, prompt, model_id=None, options=None):
+        calls["math"].append((model_id, prompt))
+        return envelope("The answer is 2")
+
+    async def compare_agent(session, prompt, model_id=None, prompt_prefix=None, options=None):
+        calls["compare"].append(model_id)
+        return envelope(json.dumps(RATINGS))
+
+    monkeypatch.setattr(test_async_pipeline, "call_math_agent", math_agent)
+    monkeypatch.setattr(test_async_pipeline, "call_compare_agent", compare_agent)
+    return calls
+
+def enqueue(tmp_path, questions):
+    path = tmp_path / "math.jsonl"
+    with open(path, "w") as f:
+        f.writelines(json.dumps({"question": question, "answer": "2"}) + "\n" for question in questions)
+    # Every response goes to the judges, so there are judge units to resume
+    return queue_pipeline.enqueue_run(prompt_source=dataset_options(str(path)), rate_limit=False, graded_judge_rate=1)
+
+def work(run_id):
+    return asyncio.run(queue_pipeline.queue_worker(run_id, concurrency=4, lease_seconds=5))
+
+def test_run_completes(tmp_path, agent_calls):
+    run_id = enqueue(tmp_path, ["What is 1 + 1?", "What is 4 / 2?"])
+    summary = work(run_id)
+    assert summary["units"]["math"] == 4
+    assert summary["units"]["judge"] == 4
+    assert len(agent_calls["math"]) == 4
+    assert len(agent_calls["compare"]) == 4 * len(JUDGE_MODEL_IDS)
+    counts = work_queue.queue_counts(run_id)
+    assert not any(stage["pending"] or stage["leased"] for stage in counts.values())
+    assert results_store.result_counts(run_id) == (4, 4 * len(JUDGE_MODEL_IDS))
+
+def test_dead_workers_units_are_resumed_without_calling_again(tmp_path, agent_calls):
+    run_id = enqueue(tmp_path, ["What is 1 + 1?"])
+    prompt, = load_prompts(str(tmp_path / "math.jsonl"))
+    # A worker answered one math unit, stored the response and died before completing the unit
+    unit, = work_queue.claim(run_id, "dead:1", limit=1, lease_seconds=0.2)
+    stored_id, = results_store.add_math_responses(run_id, [{
+        "model_id": unit["model_id"], "prompt_index": prompt["index"], "prompt_id": prompt["id"], "prompt_text": prompt["question"],
+        "correct_answer": "2", "response": "The answer is 2", "grade": None,
+    }])
+    # It also got one judgment in for that response
+    results_store.add_judgments(run_id, [{
+        "math_response_id": stored_id, "analyzed_model_id": unit["model_id"], "answering_model_id": JUDGE_MODEL_IDS[0],
+        "prompt_index": prompt["index"], "prompt_id": prompt["id"], "analysis_response": json.dumps(RATINGS), "scores": RATINGS,
+    }])
+    time.sleep(0.3)
+
+    summary = work(run_id)
+    assert summary["units"]["math"] == 2
+    # Only the other model is asked, and the stored judgment is not repeated
+    assert [model_id for model_id, _ in agent_calls["math"]] == [model for model in MODELS if model != unit["model_id"]]
+    assert len(agent_calls["compare"]) == 2 * len(JUDGE_MODEL_IDS) - 1
+    stored = [row for row in results_store.math_responses(run_id) if row["model_id"] == unit["model_id"]]
+    assert [row["id"] for row in stored] == [stored_id]
+    assert results_store.result_counts(run_id) == (2, 2 * len(JUDGE_MODEL_IDS))
+    assert not any(stage["pending"] or stage["leased"] for stage in work_queue.queue_counts(run_id).values())
@@ -0,0 +1,60 @@
+import asyncio
+
+from rate_limiter import ModelRateLimiter, TokenBucket, estimate_tokens
+
+def test_estimate_tokens():
+    assert estimate_tokens("x" * 400, expected_output_tokens=50) == 150
+
+def test_bucket_starts_full_and_refills():
+    bucket = TokenBucket(60)
+    assert bucket.available(60)
+    bucket.adjust(60)
+    assert not bucket.available(1)
+    # One token a second
+    bucket.updated -= 2
+    assert bucket.available(2)
+    assert not bucket.available(3)
+
+def test_adjust_gives_back_up_to_capacity():
+    bucket = TokenBucket(100)
+    bucket.adjust(-50)
+    assert bucket.tokens == 100
+
+def test_acquire_waits_for_tokens():
+    bucket = TokenBucket(600)
+    bucket.adjust(600)
+
+    async def acquire():
+        started = asyncio.get_running_loop().time()
+        await bucket.acquire(1)
+        return asyncio.get_running_loop().time() - started
+
+    # Ten tokens a second
+    assert 0.05 < asyncio.run(acquire()) < 0.5
+
+def test_try_acquire_takes_both_quotas_or_neither():
+    limiter = ModelRateLimiter({"m": {"rpm": 2, "tpm": 100}})
+    assert limiter.try_acquire("m", 60)
+    assert not limiter.try_acquire("m", 60)
+    # The failed attempt took no request quota
+    assert limiter.try_acquire("m", 40)
+    assert not limiter.try_acquire("m", 0)
+
+def test_default_and_missing_limits():
+    limiter = ModelRateLimiter({"unlimited": {}}, {"rpm": 1})
+    assert all(limiter.try_acquire("unlimited", 10 ** 9) for _ in range(5))
+    assert limiter.try_acquire("other", 1)
+    assert not limiter.try_acquire("other", 1)
+
+def test_settle_charges_actual_usage():
+    limiter = ModelRateLimiter({"m": {"tpm": 1000}})
+    assert limiter.try_acquire("m", 500)
+    limiter.settle("m", 500, {"input_tokens": 700, "output_tokens": 200})
+    assert limiter.buckets["m"]["tpm"].tokens < 101
+
+def test_acquire_records_waits():
+    limiter = ModelRateLimiter({"m": {"rpm": 60}})
+    asyncio.run(limiter.acquire("m", 1))
+    row, = limiter.summary()
+    assert row["model_id"] == "m"
+    assert row["requests"] == 1
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from tools import response_cache
+from tools.response_cache import cache_key, get_cache_stats, get_cached_response, put_cached_response
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(response_cache, "_connection", None)
+    monkeypatch.setattr(response_cache, "_stats", {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+    yield
+    if response_cache._connection is not None:
+        response_cache._connection.close()
+
+def agent(system_prompt="be brief", **config):
+    config = dict({"model_id": "m", "max_tokens": 100, "temperature": 0.3, "top_p": 0.8}, **config)
+    return SimpleNamespace(system_prompt=system_prompt, model=SimpleNamespace(get_config=lambda: config))
+
+def test_key_covers_model_prompts_and_sampling():
+    key = cache_key(agent(), "What is 2 + 2?")
+    assert key == cache_key(agent(), "What is 2 + 2?")
+    assert key != cache_key(agent(), "What is 2 + 3?")
+    assert key != cache_key(agent(system_prompt="be verbose"), "What is 2 + 2?")
+    assert key != cache_key(agent(model_id="other"), "What is 2 + 2?")
+    assert key != cache_key(agent(temperature=0.7), "What is 2 + 2?")
+    # Structured input, as the compare agent sends with a cache point
+    assert cache_key(agent(), [{"text": "a"}, {"text": "b"}]) != cache_key(agent(), "ab")
+
+def test_hits_and_misses():
+    assert get_cached_response("k") is None
+    put_cached_response("k", "m", "4")
+    assert get_cached_response("k") == "4"
+    stats = get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["writes"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+def test_expired_entries_miss(monkeypatch):
+    put_cached_response("k", "m", "4")
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_TTL_SECONDS", -1)
+    assert get_cached_response("k") is None
+
+def test_least_recently_used_entries_are_evicted_over_the_size_limit(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_MAX_BYTES", 10)
+    put_cached_response("old", "m", "aaaa")
+    put_cached_response("used", "m", "bbbb")
+    assert get_cached_response("old") == "aaaa"
+    put_cached_response("new", "m", "cccc")
+    assert get_cached_response("used") is None
+    assert get_cached_response("old") == "aaaa"
+    assert get_cache_stats()["evictions"] == 1
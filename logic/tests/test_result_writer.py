@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+import result_writer
+import results_store
+from result_writer import ResultWriter
+
+@pytest.fixture(autouse=True)
+def fresh_db(results_db):
+    pass
+
+def math_record(prompt_index):
+    return {"model_id": "m", "prompt_index": prompt_index, "prompt_id": f"p{prompt_index}", "prompt_text": "q", "response": "2"}
+
+def test_writes_land_in_order(tmp_path):
+    run_id = results_store.start_run("async", "t")
+    path = str(tmp_path / "out" / "summary.jsonl")
+    exported = []
+
+    async def write():
+        writer = ResultWriter().start()
+        first = await writer.add_math_responses(run_id, [math_record(1), math_record(2)])
+        second = await writer.add_math_responses(run_id, [math_record(3)])
+        await writer.add_judgments(run_id, [{"math_response_id": first[0], "analyzed_model_id": "m", "answering_model_id": "j",
+                                             "prompt_index": 1, "analysis_response": "{}"}])
+        await writer.export(lambda *args: exported.append(args), "a", 1)
+        for n in range(3):
+            await writer.append_jsonl(path, {"n": n})
+        await writer.close()
+        return first, second, writer.stats
+
+    first, second, stats = asyncio.run(write())
+    assert len(first) == 2 and len(second) == 1
+    rows = results_store.math_responses(run_id)
+    assert [row["id"] for row in rows] == first + second
+    judgment, = results_store.judgments(run_id)
+    assert judgment["math_response_id"] == first[0]
+    assert exported == [("a", 1)]
+    with open(path) as f:
+        assert [json.loads(line)["n"] for line in f] == [0, 1, 2]
+    assert stats["writes"] == 7
+
+def test_rows_of_one_batch_share_a_transaction(monkeypatch):
+    run_id = results_store.start_run("async", "t")
+    inserts = []
+    insert = result_writer.add_math_responses
+    monkeypatch.setattr(result_writer, "add_math_responses", lambda run, records: inserts.append(len(records)) or insert(run, records))
+
+    async def write():
+        writer = ResultWriter(max_batch=8)
+        # Queue everything before the drain task starts, so it is taken as one batch
+        futures = [await writer._submit("math", run_id, [math_record(n)]) for n in range(4)]
+        writer.start()
+        ids = [await future for future in futures]
+        await writer.close()
+        return ids, writer.stats
+
+    ids, stats = asyncio.run(write())
+    assert inserts == [4]
+    assert sorted(sum(ids, [])) == [row["id"] for row in results_store.math_responses(run_id)]
+    assert (stats["batches"], stats["largest_batch"]) == (1, 4)
+
+def test_failed_math_write_reaches_the_caller(monkeypatch):
+    def broken(run_id, records):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(result_writer, "add_math_responses", broken)
+
+    async def write():
+        writer = ResultWriter().start()
+        try:
+            with pytest.raises(RuntimeError):
+                await writer.add_math_responses(1, [math_record(1)])
+            # Other writes carry on
+            await writer.flush()
+        finally:
+            await writer.close()
+
+    asyncio.run(write())
+
+def test_full_queue_makes_callers_wait():
+    async def write():
+        writer = ResultWriter(max_queue=1)
+        await writer.export(lambda: None)
+        blocked = asyncio.ensure_future(writer.export(lambda: None))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        writer.start()
+        await blocked
+        await writer.close()
+        return writer.stats
+
+    assert asyncio.run(write())["blocked_seconds"] > 0.04
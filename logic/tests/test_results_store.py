@@ -0,0 +1,99 @@
+import pytest
+
+import results_store
+from results_store import (
+    add_judgments, add_math_responses, finish_run, get_run, judgment_scores, judgments, latest_run, math_responses,
+    prompt_results, response_grades, result_counts, start_run,
+)
+
+@pytest.fixture(autouse=True)
+def fresh_db(results_db):
+    pass
+
+GRADE = {"verdict": "correct", "confident": True, "method": "exact"}
+SCORES = {"factual_correctness": 9, "subject_focus": 8, "completeness": 7, "professionalism": 9}
+
+def math_record(model_id, prompt_index, response="2", error=None):
+    return {
+        "model_id": model_id, "prompt_index": prompt_index, "prompt_id": f"p{prompt_index}", "prompt_text": f"Question {prompt_index}",
+        "correct_answer": "2", "response": None if error else response, "grade": None if error else GRADE,
+        "error": error, "usage": {"input_tokens": 10, "output_tokens": 5}, "metrics": None,
+    }
+
+def judgment_record(math_response_id, judge, prompt_index=1, scores=SCORES, error=None):
+    return {
+        "math_response_id": math_response_id, "analyzed_model_id": "a", "answering_model_id": judge, "prompt_index": prompt_index,
+        "prompt_id": f"p{prompt_index}", "formatted_prompt": "Rate this", "analysis_response": None if error else "{}",
+        "scores": None if error else scores, "error": error,
+    }
+
+def test_run_lifecycle():
+    run_id = start_run("math", "20250101_000000", {"export_text": False})
+    run = get_run(run_id)
+    assert (run["harness"], run["options"], run["finished"]) == ("math", {"export_text": False}, None)
+    finish_run(run_id)
+    assert get_run(run_id)["finished"] is not None
+    assert get_run(run_id + 1) is None
+
+def test_math_responses_round_trip():
+    run_id = start_run("math", "t")
+    ids = add_math_responses(run_id, [math_record("b", 2), math_record("a", 1), math_record("a", 2, error={"kind": "server"})])
+    assert len(set(ids)) == 3
+    rows = math_responses(run_id)
+    assert [(row["model_id"], row["prompt_index"]) for row in rows] == [("a", 1), ("a", 2), ("b", 2)]
+    assert rows[0]["grade"] == GRADE and rows[0]["usage"] == {"input_tokens": 10, "output_tokens": 5}
+    assert rows[0]["response_cache_hit"] is False
+    assert rows[1]["error"] == {"kind": "server"}
+    assert len(math_responses(run_id, include_errors=False)) == 2
+    assert [row["id"] for row in math_responses(run_id, model_id="b")] == [ids[0]]
+
+def test_judgments_join_the_judged_response():
+    math_run = start_run("math", "t")
+    response_id, = add_math_responses(math_run, [math_record("a", 1)])
+    compare_run = start_run("compare", "t", {"math_run_id": math_run})
+    add_judgments(compare_run, [judgment_record(response_id, "j1"), judgment_record(response_id, "j2", error={"kind": "timeout"})])
+    judged, failed = judgments(compare_run)
+    assert (judged["original_question"], judged["original_response"], judged["grade"]) == ("Question 1", "2", GRADE)
+    assert judged["scores"] == SCORES
+    assert failed["error"] == {"kind": "timeout"}
+    assert result_counts(compare_run) == (0, 1)
+    assert result_counts(math_run) == (1, 0)
+
+def test_latest_run():
+    math_run = start_run("math", "t")
+    add_math_responses(math_run, [math_record("a", 1)])
+    compare_run = start_run("compare", "t")
+    add_judgments(compare_run, [judgment_record(1, "j")])
+    # A run without rows is never the latest
+    start_run("math", "t")
+    assert latest_run()["run_id"] == math_run
+    assert latest_run(table="judgments")["run_id"] == compare_run
+    assert latest_run(harnesses=["async"]) is None
+    with pytest.raises(ValueError):
+        latest_run(table="runs")
+
+def test_prompt_results():
+    run_id = start_run("async", "t")
+    first, _, _ = add_math_responses(run_id, [math_record("a", 1), math_record("a", 2), math_record("b", 1, error={"kind": "server"})])
+    add_judgments(run_id, [judgment_record(first, "j"), judgment_record(first, "k", error={"kind": "server"})])
+    math, judged = prompt_results(run_id, "p1")
+    # Only what a resumed run can skip: the rows without errors
+    assert [row["id"] for row in math] == [first]
+    assert [row["answering_model_id"] for row in judged] == ["j"]
+    assert judged[0]["original_response"] == "2"
+    assert prompt_results(run_id, "p3") == ([], [])
+
+def test_scores_and_grades_for_aggregation():
+    math_run = start_run("math", "t")
+    graded, ungraded = add_math_responses(math_run, [math_record("a", 1), dict(math_record("a", 2), grade=None)])
+    compare_run = start_run("compare", "t")
+    add_judgments(compare_run, [judgment_record(graded, "j"), judgment_record(ungraded, "j", 2, scores=None)])
+    assert judgment_scores(compare_run) == [("a", "j", 1, SCORES), ("a", "j", 2, None)]
+    # The compare run reports the grades of the responses it judged
+    assert response_grades(compare_run) == [("a", 1, GRADE), ("a", 2, None)]
+    assert response_grades(math_run) == response_grades(compare_run)
+
+def test_new_database_has_every_index():
+    start_run("math", "t")
+    indexes = {row["name"] for row in results_store._connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"math_responses_prompt_id", "judgments_prompt_id", "judgments_response"} <= indexes
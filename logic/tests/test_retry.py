@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import retry
+from retry import AgentError, CircuitBreaker, call_with_retry, call_with_retry_sync, circuit_states, classify_error
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(retry, "_breakers", {})
+    monkeypatch.setattr(retry, "backoff_delay", lambda attempt: 0)
+
+def failing(kind, calls):
+    def attempt():
+        calls.append(1)
+        raise AgentError(kind, "nope")
+    return attempt
+
+def test_classify_error():
+    assert classify_error(429, "") == "throttled"
+    assert classify_error(500, "ThrottlingException: slow down") == "throttled"
+    assert classify_error(503, "") == "server"
+    assert classify_error(400, "") == "client"
+    assert classify_error(500, "ValidationException: bad input") == "client"
+    assert classify_error(None, "request timed out") == "timeout"
+    assert classify_error(None, "connection reset") == "network"
+
+def test_retries_then_succeeds():
+    calls = []
+
+    def attempt():
+        calls.append(1)
+        if len(calls) < 3:
+            raise AgentError("throttled", "slow down")
+        return "ok"
+
+    assert call_with_retry_sync("m", attempt) == "ok"
+    assert len(calls) == 3
+    assert circuit_states()["m"] == {"failures": 0, "open": False}
+
+def test_exhausted_request_counts_one_failure():
+    calls = []
+    error = call_with_retry_sync("m", failing("server", calls))
+    assert len(calls) == retry.RETRY_MAX_ATTEMPTS
+    assert (error.kind, error.model_id, error.attempts) == ("server", "m", retry.RETRY_MAX_ATTEMPTS)
+    assert circuit_states()["m"]["failures"] == 1
+
+def test_permanent_error_is_not_retried_or_counted():
+    calls = []
+    error = call_with_retry_sync("m", failing("client", calls))
+    assert len(calls) == 1
+    assert error.kind == "client"
+    assert circuit_states()["m"]["failures"] == 0
+
+def test_circuit_opens_after_failed_requests():
+    for _ in range(retry.CIRCUIT_FAILURE_THRESHOLD):
+        call_with_retry_sync("m", failing("server", []))
+    calls = []
+    error = call_with_retry_sync("m", failing("server", calls))
+    assert error.kind == "circuit_open"
+    assert calls == []
+
+def test_async_call_with_retry():
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) == 1:
+            raise AgentError("timeout", "request timed out")
+        return "ok"
+
+    assert asyncio.run(call_with_retry("m", attempt)) == "ok"
+    assert len(calls) == 2
+
+def test_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.opened_at is not None
+    # One trial call at a time
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.opened_at is None
+    assert breaker.allow() and breaker.allow()
+
+def test_failed_trial_reopens_at_once():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    retry._breakers["m"] = breaker
+    calls = []
+    error = call_with_retry_sync("m", failing("server", calls))
+    assert len(calls) == 1
+    assert error.attempts == 1
+    assert breaker.opened_at is not None
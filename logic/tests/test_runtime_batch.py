@@ -0,0 +1,48 @@
+import asyncio
+
+from tools.batch import run_batch
+
+def run(payload, invoke):
+    return asyncio.run(run_batch(payload, invoke))
+
+def test_items_override_shared_fields_and_keep_their_order():
+    async def invoke(payload):
+        await asyncio.sleep(0.01 * (3 - payload["n"]))
+        return {"text": f"{payload['model_id']} {payload['n']} {payload['temperature']}", "stream": payload["stream"],
+                "text_only": payload["text_only"]}
+
+    payload = {"model_id": "shared", "temperature": 0.3, "stream": True, "batch": [{"n": 1}, {"n": 2, "model_id": "own"}]}
+    results = run(payload, invoke)["results"]
+    assert [result["text"] for result in results] == ["shared 1 0.3", "own 2 0.3"]
+    # Items always get the full envelope, never a stream
+    assert all(result["status"] == "ok" and result["stream"] is False and result["text_only"] is False for result in results)
+
+def test_failing_item_does_not_fail_the_batch():
+    async def invoke(payload):
+        if payload["prompt"] == "bad":
+            raise ValueError("no prompt")
+        return {"text": payload["prompt"]}
+
+    results = run({"batch": [{"prompt": "good"}, {"prompt": "bad"}]}, invoke)["results"]
+    assert results[0] == {"text": "good", "status": "ok"}
+    assert results[1] == {"status": "error", "error": "no prompt", "error_type": "ValueError"}
+
+def test_max_parallel():
+    in_flight = []
+    peak = []
+
+    async def invoke(payload):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        return {}
+
+    run({"batch": [{}] * 6, "max_parallel": 2}, invoke)
+    assert max(peak) == 2
+
+def test_empty_batch():
+    async def invoke(payload):
+        raise AssertionError("not called")
+
+    assert run({"batch": []}, invoke) == {"results": []}
@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+import aiohttp
+
+import test_async_pipeline
+from fake_agent_server import start_server
+from retry import AgentError
+
+def test_stats_are_fetched_once_per_runtime(monkeypatch):
+    requests = []
+
+    async def post(session, url, payload):
+        requests.append((url, payload))
+        if ":8081" in url:
+            raise AgentError("network", "connection refused")
+        return json.dumps({"model_pool": {"size": 1}})
+
+    monkeypatch.setattr(test_async_pipeline, "post_invocation", post)
+    stats = asyncio.run(test_async_pipeline.fetch_runtime_stats(None))
+    assert stats == {"math": {"model_pool": {"size": 1}}, "compare": None}
+    assert [payload for _, payload in requests] == [{"stats": True}, {"stats": True}]
+
+def test_fake_server_answers_stats_payloads():
+    server = start_server(0, "math")
+    try:
+        async def fetch():
+            async with aiohttp.ClientSession() as session:
+                url = f"http://127.0.0.1:{server.server_address[1]}/invocations"
+                return json.loads(await test_async_pipeline.post_invocation(session, url, {"stats": True}))
+
+        assert set(asyncio.run(fetch())) == {"model_pool", "concurrency", "response_cache", "startup"}
+    finally:
+        server.shutdown()
@@ -0,0 +1,5 @@
+from sync_runtime_tools import drifted_tools
+
+def test_runtime_tool_copies_match():
+    # Edit math_agent2/tools, then run logic/tools/sync_runtime_tools.py
+    assert drifted_tools() == []
@@ -0,0 +1,70 @@
+import numpy as np
+
+from judge_scores import CRITERIA
+from score_aggregation import ScoreArray
+
+def scores(value, **overrides):
+    return dict(dict.fromkeys(CRITERIA, value), **overrides)
+
+def test_from_judgments_shape_and_missing_ratings():
+    array = ScoreArray.from_judgments([
+        ("a", "j1", 1, scores(8)),
+        ("b", "j2", 2, {"completeness": 5}),
+        ("b", "j1", 3, {}),
+    ])
+    assert array.analyzed_models == ["a", "b"]
+    assert array.judges == ["j1", "j2"]
+    # Judgments without ratings are left out
+    assert array.prompts == [1, 2]
+    assert array.scores.shape == (2, 2, 2, len(CRITERIA))
+    assert np.isnan(array.scores[1, 1, 1, CRITERIA.index("factual_correctness")])
+    assert array.counts()[1].tolist() == [0, 0, 1, 0]
+
+def test_repeated_judgment_overwrites():
+    array = ScoreArray.from_judgments([("a", "j", 1, scores(2)), ("a", "j", 1, scores(9))])
+    assert array.means()[0].tolist() == [9] * len(CRITERIA)
+
+def test_means_ignore_missing_ratings():
+    array = ScoreArray.from_judgments([
+        ("a", "j1", 1, scores(6)),
+        ("a", "j2", 1, scores(8, professionalism=None)),
+        ("a", "j1", 2, {"completeness": 10}),
+    ])
+    means = dict(zip(CRITERIA, array.means()[0]))
+    assert means["factual_correctness"] == 7
+    assert means["professionalism"] == 6
+    assert means["completeness"] == 8
+
+def test_leaderboard_order_and_overall():
+    array = ScoreArray.from_judgments([
+        ("low", "j", 1, scores(3)),
+        ("high", "j", 1, scores(9)),
+        ("mid", "j", 1, scores(5, completeness=7)),
+    ])
+    overall = array.leaderboards()["overall"]
+    assert [row["model_id"] for row in overall] == ["high", "mid", "low"]
+    assert [row["rank"] for row in overall] == [1, 2, 3]
+    assert overall[1]["mean"] == 5.5
+    assert overall[0]["ratings"] == len(CRITERIA)
+
+def test_judge_agreement():
+    agree = [("m", judge, prompt, scores(prompt)) for judge in ("j1", "j2") for prompt in (1, 2, 3)]
+    assert np.allclose(ScoreArray.from_judgments(agree).judge_agreement(), 1)
+    opposed = [("m", "j1", prompt, scores(prompt)) for prompt in (1, 2, 3)]
+    opposed += [("m", "j2", prompt, scores(4 - prompt)) for prompt in (1, 2, 3)]
+    assert np.allclose(ScoreArray.from_judgments(opposed).judge_agreement(), -1)
+    # One judge has nobody to agree with
+    assert np.all(np.isnan(ScoreArray.from_judgments(agree[:3]).judge_agreement()))
+
+def test_summary_is_json_ready():
+    summary = ScoreArray.from_judgments([("a", "j", 1, scores(5))]).summary()
+    assert summary["ratings"] == len(CRITERIA)
+    assert summary["judge_agreement"] == dict.fromkeys(CRITERIA)
+    assert summary["leaderboards"]["factual_correctness"][0]["std_error"] == 0
+    # The overall score has no standard error
+    assert summary["leaderboards"]["overall"][0]["std_error"] is None
+
+def test_empty():
+    array = ScoreArray.from_judgments([])
+    assert array.scores.shape == (0, 0, 0, len(CRITERIA))
+    assert array.leaderboards()["overall"] == []
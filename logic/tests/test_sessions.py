@@ -0,0 +1,52 @@
+import pytest
+
+from tools import sessions
+from tools.sessions import clear_session, load_history, save_history, trim_history
+
+@pytest.fixture(autouse=True)
+def fresh_sessions(monkeypatch):
+    monkeypatch.setattr(sessions, "_sessions", type(sessions._sessions)())
+
+def turn(n, tool=False):
+    messages = [{"role": "user", "content": [{"text": f"question {n}"}]}]
+    if tool:
+        messages += [
+            {"role": "assistant", "content": [{"toolUse": {"name": "calculator"}}]},
+            {"role": "user", "content": [{"toolResult": {"content": [{"text": "4"}]}}]},
+        ]
+    return messages + [{"role": "assistant", "content": [{"text": f"answer {n}"}]}]
+
+def test_history_round_trip_is_a_copy():
+    save_history("s", turn(1))
+    history = load_history("s")
+    assert history == turn(1)
+    history.append({"role": "user", "content": []})
+    assert load_history("s") == turn(1)
+    assert load_history("other") == []
+    clear_session("s")
+    assert load_history("s") == []
+
+def test_trim_keeps_whole_recent_turns(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_MAX_TURNS", 2)
+    messages = turn(1) + turn(2, tool=True) + turn(3)
+    assert trim_history(messages) == turn(2, tool=True) + turn(3)
+
+def test_trim_to_token_budget(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_MAX_TOKENS", 40)
+    assert trim_history(turn(1) + turn(2)) == turn(2)
+    # A single turn over the budget is dropped altogether
+    monkeypatch.setattr(sessions, "SESSION_MAX_TOKENS", 5)
+    assert trim_history(turn(1)) == []
+
+def test_leading_tool_results_are_not_a_turn():
+    orphan = [{"role": "user", "content": [{"toolResult": {}}]}, {"role": "assistant", "content": [{"text": "x"}]}]
+    assert trim_history(orphan + turn(1)) == turn(1)
+
+def test_idle_and_surplus_sessions_are_dropped(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_MAX_COUNT", 2)
+    for session_id in ("a", "b", "c"):
+        save_history(session_id, turn(1))
+    assert load_history("a") == []
+    assert load_history("c") == turn(1)
+    monkeypatch.setattr(sessions, "SESSION_TTL_SECONDS", -1)
+    assert load_history("c") == []
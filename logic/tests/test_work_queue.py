@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+import work_queue
+from work_queue import claim, complete, enqueue, fail, failed_units, queue_counts, renew
+
+@pytest.fixture(autouse=True)
+def queue_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "WORK_QUEUE_DB", str(tmp_path / "work_queue.db"))
+    monkeypatch.setattr(work_queue, "_connection", None)
+    yield
+    if work_queue._connection is not None:
+        work_queue._connection.close()
+
+def math_units(*prompts):
+    return [("math", "m", prompt, {"question": f"q{prompt}"}) for prompt in prompts]
+
+def test_enqueue_is_idempotent():
+    assert enqueue(1, math_units(1, 2)) == 2
+    assert enqueue(1, math_units(2, 3)) == 1
+    assert queue_counts(1)["math"]["pending"] == 3
+
+def test_claim_leases_units_once():
+    enqueue(1, math_units(1, 2, 3))
+    first = claim(1, "w1", limit=2)
+    second = claim(1, "w2", limit=2)
+    assert [unit["subject"] for unit in first] == ["1", "2"]
+    assert [unit["subject"] for unit in second] == ["3"]
+    assert first[0]["payload"] == {"question": "q1"}
+    assert first[0]["attempts"] == 1
+    assert claim(1, "w3") == []
+    assert queue_counts(1)["math"]["leased"] == 3
+
+def test_judge_units_are_claimed_first():
+    enqueue(1, math_units(1))
+    enqueue(1, [("judge", "m", 10, {})])
+    assert claim(1, "w")[0]["stage"] == "judge"
+
+def test_runs_are_separate():
+    enqueue(1, math_units(1))
+    enqueue(2, math_units(1))
+    assert len(claim(1, "w", limit=5)) == 1
+
+def test_complete():
+    enqueue(1, math_units(1))
+    unit, = claim(1, "w")
+    assert not complete(unit["id"], "someone else")
+    assert complete(unit["id"], "w")
+    assert queue_counts(1)["math"]["done"] == 1
+
+def test_fail_requeues_until_attempts_run_out():
+    enqueue(1, math_units(1))
+    for attempt in range(1, 3):
+        unit, = claim(1, "w", max_attempts=2)
+        assert unit["attempts"] == attempt
+        fail(unit["id"], "w", {"type": "boom"}, max_attempts=2)
+    assert claim(1, "w", max_attempts=2) == []
+    failed, = failed_units(1)
+    assert failed["error"] == {"type": "boom"}
+    assert failed["attempts"] == 2
+
+def test_expired_lease_is_claimed_again():
+    enqueue(1, math_units(1))
+    unit, = claim(1, "dead", lease_seconds=-1)
+    assert queue_counts(1)["math"]["pending"] == 1
+    again, = claim(1, "alive")
+    assert again["id"] == unit["id"]
+    assert again["attempts"] == 2
+    # The first worker lost its lease
+    assert not complete(unit["id"], "dead")
+    assert complete(unit["id"], "alive")
+
+def test_expired_lease_without_attempts_left_fails():
+    enqueue(1, math_units(1))
+    claim(1, "dead", lease_seconds=-1, max_attempts=1)
+    assert claim(1, "w", max_attempts=1) == []
+    failed, = failed_units(1)
+    assert failed["error"]["type"] == "lease_expired"
+
+def test_renew_extends_leases():
+    enqueue(1, math_units(1, 2))
+    claim(1, "w", limit=2, lease_seconds=-1)
+    assert renew("w", lease_seconds=60) == 2
+    assert claim(1, "other") == []
+    assert work_queue._connect().execute("SELECT MIN(lease_expires) FROM work_units").fetchone()[0] > time.time()
@@ -0,0 +1,87 @@
+import json
+import os
+
+from tracing import span
+
+# Optional per-result text files (--export-text): one per math response under
+# math_output/prompt_<index>/ and one per judgment under
+# compare_output/prompt_<index>/, next to the results database. Paths are
+# relative to logic/tools, where the harnesses run.
+
+def clean_model_id(model_id):
+    """Model ID as used in output filenames"""
+    return model_id.replace(".", "_").replace(":", "_")
+
+def math_output_path(model_id, timestamp, prompt_index):
+    """Text export path of a math response"""
+    return os.path.join("..", "math_output", f"prompt_{prompt_index}", f"output_{clean_model_id(model_id)}_{timestamp}.txt")
+
+def comparison_output_path(analyzed_model_id, answering_model_id, timestamp, prompt_index):
+    """Text export path of a judgment"""
+    filename = f"comparison_analyzed_{clean_model_id(analyzed_model_id)}_answered_{clean_model_id(answering_model_id)}_{timestamp}.txt"
+    return os.path.join("..", "compare_output", f"prompt_{prompt_index}", filename)
+
+def save_math_output(model_id, prompt_data, response, timestamp, prompt_index, details=None):
+    """Save math agent output, with its token usage and invocation metrics, to file"""
+    with span("save_math_output", model_id=model_id, prompt_index=prompt_index):
+        filepath = math_output_path(model_id, timestamp, prompt_index)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        if isinstance(prompt_data, dict):
+            prompt_text = prompt_data["question"]
+            correct_answer = prompt_data.get("answer")
+        else:
+            prompt_text = prompt_data
+            correct_answer = None
+        
+        with open(filepath, "w") as f:
+            f.write(f"Model ID: {model_id}\n")
+            f.write(f"Timestamp: {timestamp}\n")
+            f.write(f"Prompt Index: {prompt_index}\n")
+            f.write(f"Prompt: {prompt_text}\n")
+            if correct_answer:
+                f.write(f"Correct Answer: {correct_answer}\n")
+            if details:
+                f.write(f"Usage: {json.dumps(details.get('usage'))}\n")
+                f.write(f"Metrics: {json.dumps(details.get('metrics'))}\n")
+            f.write("-" * 50 + "\n")
+            f.write(f"Response: {response}\n\n")
+        
+        return filepath, prompt_text, correct_answer
+
+def save_comparison_output(analyzed_model_id, answering_model_id, original_question, correct_answer, original_response, formatted_prompt, analysis_response, timestamp, prompt_index, details=None):
+    """Save comparison output, with the judge call's token usage and invocation metrics, to file"""
+    with span("save_comparison_output", analyzed_model_id=analyzed_model_id, answering_model_id=answering_model_id):
+        filepath = comparison_output_path(analyzed_model_id, answering_model_id, timestamp, prompt_index)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        
+        with open(filepath, "w") as f:
+            f.write(f"Analyzed Model ID: {analyzed_model_id}\n")
+            f.write(f"Answering Model ID: {answering_model_id}\n")
+            f.write(f"Timestamp: {timestamp}\n")
+            if details:
+                f.write(f"Usage: {json.dumps(details.get('usage'))}\n")
+                f.write(f"Metrics: {json.dumps(details.get('metrics'))}\n")
+            f.write("-" * 70 + "\n")
+            f.write("ORIGINAL QUESTION:\n")
+            f.write("-" * 70 + "\n")
+            f.write(f"{original_question}\n")
+            if correct_answer:
+                f.write("-" * 70 + "\n")
+                f.write("CORRECT ANSWER:\n")
+                f.write("-" * 70 + "\n")
+                f.write(f"{correct_answer}\n")
+            f.write("-" * 70 + "\n")
+            f.write("ORIGINAL RESPONSE (from analyzed model):\n")
+            f.write("-" * 70 + "\n")
+            f.write(f"{original_response}\n")
+            f.write("-" * 70 + "\n")
+            f.write("FORMATTED PROMPT SENT TO COMPARING MODEL:\n")
+            f.write("-" * 70 + "\n")
+            f.write(f"{formatted_prompt}\n")
+            f.write("-" * 70 + "\n")
+            f.write("ANALYSIS RESPONSE:\n")
+            f.write("-" * 70 + "\n")
+            f.write(f"{analysis_response}\n\n")
+        
+        return filepath
@@ -0,0 +1,347 @@
+"""
+Offline Bedrock batch inference for large comparison sweeps
+
+Turns the math and compare stages into Bedrock batch-inference JSONL input
+files (one per model) and stores the returned outputs as "batch" runs in the
+results database, like the other harnesses (text files in math_output/ and
+compare_output/ only with --export-text).
+
+Batch inference calls the model directly, so the math stage runs without the
+agent loop and its calculator tool; the system prompts and sampling
+parameters match the agent runtimes.
+
+Typical flow (run from logic/tools):
+    python batch_inference.py export-math
+    # upload ../batch_jobs/<id>/*.jsonl, run the Bedrock batch jobs, download the *.jsonl.out files
+    python batch_inference.py import-math ../batch_jobs/<id>
+    python batch_inference.py export-compare [--run-id <math run>]
+    python batch_inference.py import-compare ../batch_jobs/<id>
+
+`simulate <job dir>` writes fixture *.jsonl.out files next to the inputs, so
+the import path can be exercised locally without Bedrock.
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+from datetime import datetime
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_grader import grade_answer
+from compare_prompt import format_compare_prompt
+from judge_panel import JudgePanel
+from judge_scores import parse_judge_scores
+from model_ids import MODEL_IDS
+from prompt_dataset import load_prompts
+from results_store import RESULTS_DB, add_judgments, add_math_responses, finish_run, latest_run, math_responses, start_run
+from retry import AgentError, classify_error
+from text_export import clean_model_id, save_comparison_output, save_math_output
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BATCH_DIR = os.path.join("..", "batch_jobs")
+
+# Same inference parameters as the agent runtimes' defaults
+MAX_TOKENS = int(os.getenv("MAX_TOKENS", "4096"))
+TEMPERATURE = float(os.getenv("TEMPERATURE", "0.3"))
+TOP_P = float(os.getenv("TOP_P", "0.8"))
+
+def load_math_system_prompt():
+    """Load SYSTEM_PROMPT from the math agent without importing its package"""
+    path = os.path.join(REPO_ROOT, "math_agent2", "tools", "system_prompt.py")
+    spec = importlib.util.spec_from_file_location("math_system_prompt", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SYSTEM_PROMPT
+
+def load_compare_system_prompt():
+    """Load the compare agent's system prompt"""
+    with open(os.path.join(REPO_ROOT, "compare_models", "system_prompt.txt"), "r") as f:
+        return f.read().strip()
+
+def build_model_input(model_id, system_prompt, user_text):
+    """Build the model-native request body Bedrock batch inference expects"""
+    if "anthropic." in model_id:
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE,
+            "top_p": TOP_P,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": [{"type": "text", "text": user_text}]}],
+        }
+    if "meta.llama3" in model_id:
+        prompt = (
+            "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n"
+            f"{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n"
+            f"{user_text}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
+        )
+        return {"prompt": prompt, "max_gen_len": min(MAX_TOKENS, 2048), "temperature": TEMPERATURE, "top_p": TOP_P}
+    if "amazon.nova" in model_id:
+        return {
+            "schemaVersion": "messages-v1",
+            "system": [{"text": system_prompt}],
+            "messages": [{"role": "user", "content": [{"text": user_text}]}],
+            "inferenceConfig": {"maxTokens": MAX_TOKENS, "temperature": TEMPERATURE, "topP": TOP_P},
+        }
+    if "mistral." in model_id:
+        return {
+            "prompt": f"<s>[INST] {system_prompt}\n\n{user_text} [/INST]",
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE,
+            "top_p": TOP_P,
+        }
+    raise ValueError(f"No batch inference request format for model: {model_id}")
+
+def parse_model_output(model_id, model_output):
+    """Extract (text, usage) from a model-native response body"""
+    if "anthropic." in model_id:
+        text = "".join(block.get("text", "") for block in model_output.get("content", []))
+        usage = model_output.get("usage", {})
+        return text, {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
+    if "meta.llama3" in model_id:
+        return model_output.get("generation", ""), {
+            "input_tokens": model_output.get("prompt_token_count", 0),
+            "output_tokens": model_output.get("generation_token_count", 0),
+        }
+    if "amazon.nova" in model_id:
+        content = model_output.get("output", {}).get("message", {}).get("content", [])
+        usage = model_output.get("usage", {})
+        return "".join(block.get("text", "") for block in content), {
+            "input_tokens": usage.get("inputTokens", 0),
+            "output_tokens": usage.get("outputTokens", 0),
+        }
+    if "mistral." in model_id:
+        outputs = model_output.get("outputs", [])
+        return (outputs[0].get("text", "") if outputs else ""), {}
+    raise ValueError(f"No batch inference response format for model: {model_id}")
+
+def write_job(stage, records_by_model, system_prompt):
+    """Write one input JSONL per model plus a manifest describing every record"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    job_dir = os.path.join(BATCH_DIR, f"{stage}_{timestamp}")
+    os.makedirs(job_dir, exist_ok=True)
+
+    manifest = {"stage": stage, "timestamp": timestamp, "files": {}}
+    for model_id, records in records_by_model.items():
+        filename = f"{stage}_{clean_model_id(model_id)}.jsonl"
+        with open(os.path.join(job_dir, filename), "w") as f:
+            for record_id, user_text, _ in records:
+                f.write(json.dumps({
+                    "recordId": record_id,
+                    "modelInput": build_model_input(model_id, system_prompt, user_text),
+                }) + "\n")
+        manifest["files"][filename] = {
+            "model_id": model_id,
+            "records": {record_id: metadata for record_id, _, metadata in records},
+        }
+
+    with open(os.path.join(job_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    total = sum(len(records) for records in records_by_model.values())
+    print(f"Wrote {total} records for {len(records_by_model)} models to {job_dir}")
+    return job_dir
+
+def export_math(model_ids=None, prompts=None):
+    """Write batch inputs for every (model, prompt) pair of the math stage
+
+    prompts is a dataset path or list for load_prompts; by default the
+    PROMPT_DATASET settings (see logic/prompt_dataset.py).
+    """
+    model_ids = model_ids or MODEL_IDS
+
+    records_by_model = {}
+    for model_id in model_ids:
+        records = []
+        for prompt_data in load_prompts(prompts):
+            i = prompt_data["index"]
+            records.append((f"P{i:08d}", prompt_data["question"], {"prompt_index": i, "prompt_id": prompt_data["id"], "prompt": prompt_data}))
+        records_by_model[model_id] = records
+    return write_job("math", records_by_model, load_math_system_prompt())
+
+def export_compare(math_run_id=None, panel=None):
+    """Write batch inputs that ask the judge panel to rate every math response of a stored run (the latest one by default)
+
+    A batch job cannot wait for one judge before calling the next, so a
+    cascade panel only gets its first (cheapest) judge here.
+    """
+    panel = panel or JudgePanel()
+
+    if math_run_id is None:
+        latest = latest_run()
+        if latest is None:
+            print(f"No math responses found in {RESULTS_DB}, import or run a math stage first")
+            return None
+        math_run_id = latest["run_id"]
+
+    records_by_model = {}
+    # Failed math calls have nothing to judge
+    for math_response in math_responses(math_run_id, include_errors=False):
+        _, formatted_prompt = format_compare_prompt(math_response["prompt"], math_response["response"], math_response["correct_answer"])
+        metadata = {
+            "math_response_id": math_response["id"],
+            "analyzed_model_id": math_response["model_id"],
+            "prompt_index": math_response["prompt_index"],
+            "prompt_id": math_response["prompt_id"],
+            "original_question": math_response["prompt"],
+            "correct_answer": math_response["correct_answer"],
+            "original_response": math_response["response"],
+            "formatted_prompt": formatted_prompt,
+        }
+        for judge in panel.next_judges(math_response["model_id"], {}):
+            records_by_model.setdefault(judge, []).append((f"R{math_response['id']:08d}", formatted_prompt, metadata))
+    return write_job("compare", records_by_model, load_compare_system_prompt())
+
+def read_manifest(job_dir):
+    """The manifest write_job saved in a job directory"""
+    with open(os.path.join(job_dir, "manifest.json"), "r") as f:
+        return json.load(f)
+
+def read_job_outputs(job_dir):
+    """Yield (model_id, metadata, text, usage, error) for every record in a job's output files
+
+    Records Bedrock could not process have no text, and error is the
+    failure as AgentError.to_dict() gives it.
+    """
+    for filename, entry in read_manifest(job_dir)["files"].items():
+        model_id = entry["model_id"]
+        output_files = glob.glob(os.path.join(job_dir, "**", f"{filename}.out"), recursive=True)
+        if not output_files:
+            print(f"  ⚠️  No output for {filename}")
+            continue
+        with open(output_files[0], "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                metadata = entry["records"].get(record.get("recordId"))
+                if metadata is None:
+                    continue
+                if "modelOutput" in record:
+                    text, usage = parse_model_output(model_id, record["modelOutput"])
+                    yield model_id, metadata, text, usage, None
+                else:
+                    failure = record.get("error") or {}
+                    status = failure.get("errorCode") if isinstance(failure, dict) else None
+                    message = failure.get("errorMessage", json.dumps(failure)) if isinstance(failure, dict) else str(failure)
+                    error = AgentError(classify_error(status, message), message, status, model_id=model_id)
+                    yield model_id, metadata, None, None, error.to_dict()
+
+def import_math(job_dir, export_text=False):
+    """Store batch math outputs as a "batch" run (and text files with export_text); returns the run_id"""
+    timestamp = read_manifest(job_dir)["timestamp"]
+    run_id = start_run("batch", timestamp, {"stage": "math", "job_dir": job_dir, "export_text": export_text})
+
+    results = []
+    for model_id, metadata, text, usage, error in read_job_outputs(job_dir):
+        prompt_data = metadata["prompt"]
+        prompt_text, correct_answer = prompt_data["question"], prompt_data.get("answer")
+        filepath = None
+        grade = None
+        if error is None:
+            grade = grade_answer(text, correct_answer, prompt_text)
+            if export_text:
+                filepath, _, _ = save_math_output(model_id, prompt_data, text, timestamp, metadata["prompt_index"])
+        else:
+            print(f"  ❌ Math record failed: {model_id} - Prompt {metadata['prompt_index']}: {error['message']}")
+        results.append({
+            "model_id": model_id,
+            "prompt_index": metadata["prompt_index"],
+            "prompt_id": metadata.get("prompt_id"),
+            "prompt": prompt_data,
+            "prompt_text": prompt_text,
+            "correct_answer": correct_answer,
+            "response": text,
+            "grade": grade,
+            "error": error,
+            "usage": usage,
+            "file": filepath,
+        })
+
+    for record, record_id in zip(results, add_math_responses(run_id, results)):
+        record["id"] = record_id
+    finish_run(run_id)
+    print(f"Imported {len(results)} math responses as run {run_id} in {RESULTS_DB}")
+    return run_id
+
+def import_compare(job_dir, export_text=False):
+    """Store batch judge outputs as a "batch" run (and text files with export_text); returns the run_id"""
+    timestamp = read_manifest(job_dir)["timestamp"]
+    run_id = start_run("batch", timestamp, {"stage": "compare", "job_dir": job_dir, "export_text": export_text})
+
+    results = []
+    for judge, metadata, text, usage, error in read_job_outputs(job_dir):
+        if error is not None:
+            # Nothing was judged; the row only records the failure
+            print(f"  ❌ {judge} could not judge {metadata['analyzed_model_id']} - Prompt {metadata['prompt_index']}: {error['message']}")
+            results.append(dict(metadata, answering_model_id=judge, analysis_response=None, scores=None, error=error, usage=None, output_file=None))
+            continue
+        filepath = None
+        if export_text:
+            filepath = save_comparison_output(
+                metadata["analyzed_model_id"], judge, metadata["original_question"],
+                metadata["correct_answer"], metadata["original_response"], metadata["formatted_prompt"],
+                text, timestamp, metadata["prompt_index"]
+            )
+        results.append(dict(metadata, answering_model_id=judge, analysis_response=text, scores=parse_judge_scores(text),
+                            error=None, usage=usage, output_file=filepath))
+
+    for record, record_id in zip(results, add_judgments(run_id, results)):
+        record["id"] = record_id
+    finish_run(run_id)
+    print(f"Imported {len(results)} judgments as run {run_id} in {RESULTS_DB}")
+    return run_id
+
+def simulated_model_output(model_id, text):
+    """Model-native response body carrying the given text, for local fixtures"""
+    if "anthropic." in model_id:
+        return {"content": [{"type": "text", "text": text}], "usage": {"input_tokens": 100, "output_tokens": 20}}
+    if "meta.llama3" in model_id:
+        return {"generation": text, "prompt_token_count": 100, "generation_token_count": 20}
+    if "amazon.nova" in model_id:
+        return {"output": {"message": {"content": [{"text": text}]}}, "usage": {"inputTokens": 100, "outputTokens": 20}}
+    return {"outputs": [{"text": text}]}
+
+def simulate(job_dir):
+    """Write fixture *.jsonl.out files for a job so imports can run without Bedrock"""
+    manifest = read_manifest(job_dir)
+
+    for filename, entry in manifest["files"].items():
+        model_id = entry["model_id"]
+        with open(os.path.join(job_dir, filename), "r") as f_in, open(os.path.join(job_dir, f"{filename}.out"), "w") as f_out:
+            for line in f_in:
+                record = json.loads(line)
+                if manifest["stage"] == "compare":
+                    text = json.dumps({"factual_correctness": 8, "subject_focus": 8, "completeness": 7, "professionalism": 9})
+                else:
+                    text = f"Simulated answer from {model_id} for record {record['recordId']}"
+                record["modelOutput"] = simulated_model_output(model_id, text)
+                f_out.write(json.dumps(record) + "\n")
+    print(f"Wrote simulated outputs to {job_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bedrock batch inference export/import for the comparison stages")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("export-math", help="write math stage inputs for MODEL_IDS x the prompt dataset")
+    export_compare_parser = commands.add_parser("export-compare", help="write compare stage inputs for the math responses of a stored run")
+    export_compare_parser.add_argument("--run-id", type=int, help="judge the math responses of this run (default: the latest run)")
+    for name in ("import-math", "import-compare", "simulate"):
+        command = commands.add_parser(name)
+        command.add_argument("job_dir", help="job directory containing manifest.json")
+        if name != "simulate":
+            command.add_argument("--export-text", action="store_true", help="also write one text file per result to math_output/ or compare_output/")
+    args = parser.parse_args()
+
+    if args.command == "export-math":
+        export_math()
+    elif args.command == "export-compare":
+        export_compare(args.run_id)
+    elif args.command == "import-math":
+        import_math(args.job_dir, args.export_text)
+    elif args.command == "import-compare":
+        import_compare(args.job_dir, args.export_text)
+    elif args.command == "simulate":
+        simulate(args.job_dir)
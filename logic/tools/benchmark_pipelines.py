@@ -0,0 +1,236 @@
+"""
+Pipeline benchmark suite
+
+Runs the math harness (test_math_agent.py), the compare harness
+(test_compare_models.py) and the async pipeline (test_async_pipeline.py)
+against local stand-in agent servers with simulated per-model latency, sweeps
+model count, prompt count and concurrency, and writes wall time, requests/sec,
+p50/p95/p99 request latency and peak RSS as JSON so runs can be compared.
+
+Every measurement runs in its own subprocess and scratch directory, so peak
+RSS and output files belong to a single harness run.
+
+    python benchmark_pipelines.py --models 1,2,4 --prompts 4,16 --concurrency 8,64
+    python benchmark_pipelines.py --servers external   # e.g. the runtimes with MODEL_PROVIDER=fake
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(TOOLS_DIR))
+sys.path.append(TOOLS_DIR)
+
+from retry import AgentError
+
+HARNESSES = ["math", "compare", "async"]
+
+def bench_model_ids(count):
+    """Synthetic model IDs used for the sweep"""
+    return [f"bench.model-{i}-v1:0" for i in range(count)]
+
+def bench_prompts(count):
+    """Synthetic prompts with verified answers"""
+    return [{"question": f"What is {i} + {i}?", "answer": f"{i} + {i} = {2 * i}"} for i in range(1, count + 1)]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _timed_sync(func, latencies, responses):
+    """Wrap a blocking client call to record its latency and response"""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        responses.append(result)
+        return result
+    return wrapper
+
+def _timed_async(func, latencies, responses):
+    """Wrap an async client call to record its latency and response"""
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = await func(*args, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        responses.append(result)
+        return result
+    return wrapper
+
+def run_one(config):
+    """Run a single harness measurement in this process (child mode)"""
+    # The harnesses read their prompts from PROMPT_DATASET, which is read on import
+    dataset = os.path.abspath(os.path.join("..", "bench_prompts.jsonl"))
+    with open(dataset, "w") as f:
+        for prompt in bench_prompts(config["prompts"]):
+            f.write(json.dumps(prompt) + "\n")
+    os.environ["PROMPT_DATASET"] = dataset
+
+    import test_async_pipeline
+    import test_compare_models
+    import test_math_agent
+
+    import judge_panel
+
+    model_ids = bench_model_ids(config["models"])
+    for module in (test_math_agent, test_compare_models, test_async_pipeline):
+        module.MODEL_IDS = model_ids
+    # The swept models also judge, so the compare fan-out follows the model count.
+    # JudgePanel's default judge list is this same list object, so change it in place.
+    judge_panel.JUDGE_MODEL_IDS[:] = model_ids
+
+    latencies = []
+    responses = []
+    harness = config["harness"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        if harness == "compare":
+            # The compare harness reads math outputs, produce them first (not timed)
+            test_math_agent.test_all_models()
+
+        if harness == "math":
+            test_math_agent.call_agent = _timed_sync(test_math_agent.call_agent, latencies, responses)
+        elif harness == "compare":
+            test_compare_models.call_compare_agent = _timed_sync(test_compare_models.call_compare_agent, latencies, responses)
+        else:
+            for name in ("call_math_agent", "call_compare_agent"):
+                setattr(test_async_pipeline, name, _timed_async(getattr(test_async_pipeline, name), latencies, responses))
+
+        started = time.perf_counter()
+        if harness == "math":
+            test_math_agent.test_all_models()
+        elif harness == "compare":
+            test_compare_models.test_compare_models()
+        else:
+            # Synthetic model IDs have no quotas, measure the pipeline itself
+            asyncio.run(test_async_pipeline.async_pipeline_test(max_connections=config["concurrency"], rate_limit=False))
+        wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "harness": harness,
+        "models": config["models"],
+        "prompts": config["prompts"],
+        "concurrency": config["concurrency"] if harness == "async" else 1,
+        "wall_time_s": wall_time,
+        "requests": len(latencies),
+        "errors": sum(1 for r in responses if isinstance(r, AgentError)),
+        "requests_per_s": len(latencies) / wall_time if wall_time else None,
+        "latency_p50_s": percentile(latencies, 0.50),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "latency_p99_s": percentile(latencies, 0.99),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_in_subprocess(config):
+    """Run one measurement in a fresh interpreter and scratch directory"""
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as workdir:
+        tools_dir = os.path.join(workdir, "tools")
+        os.makedirs(tools_dir)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-one", json.dumps(config)],
+            cwd=tools_dir, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        return dict(config, error=completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def parse_counts(value):
+    """Parse a comma-separated list of integers"""
+    return [int(part) for part in value.split(",") if part.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the math, compare and async pipeline harnesses")
+    parser.add_argument("--harnesses", default=",".join(HARNESSES), help="comma-separated subset of math,compare,async")
+    parser.add_argument("--models", default="1,2,4", help="model counts to sweep")
+    parser.add_argument("--prompts", default="4,16", help="prompt counts to sweep")
+    parser.add_argument("--concurrency", default="8,64", help="async pipeline connection limits to sweep")
+    parser.add_argument("--latency-ms", type=float, default=200, help="mean simulated latency of the fastest model")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="standard deviation of simulated latency")
+    parser.add_argument("--model-skew", type=float, default=0.5, help="each further model is this much slower (0.5 = +50%%)")
+    parser.add_argument("--servers", choices=["stub", "external"], default="stub",
+                        help="start stand-in servers, or use agents already listening on 8080/8081")
+    parser.add_argument("--output", help="result file (default ../benchmarks/pipeline_benchmark_<timestamp>.json)")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+        return
+
+    harnesses = [h for h in args.harnesses.split(",") if h in HARNESSES]
+    model_counts = parse_counts(args.models)
+    prompt_counts = parse_counts(args.prompts)
+    concurrency_levels = parse_counts(args.concurrency)
+
+    servers = []
+    if args.servers == "stub":
+        from fake_agent_server import start_server
+        profiles = {model_id: args.latency_ms * (1 + args.model_skew * i)
+                    for i, model_id in enumerate(bench_model_ids(max(model_counts)))}
+        servers = [
+            start_server(8080, "math", profiles, args.latency_ms, args.jitter_ms),
+            start_server(8081, "compare", profiles, args.latency_ms, args.jitter_ms),
+        ]
+
+    configs = []
+    for harness in harnesses:
+        for models in model_counts:
+            for prompts in prompt_counts:
+                levels = concurrency_levels if harness == "async" else [1]
+                for concurrency in levels:
+                    configs.append({"harness": harness, "models": models, "prompts": prompts, "concurrency": concurrency})
+
+    print(f"🏎️  Running {len(configs)} benchmark configurations")
+    results = []
+    try:
+        for config in configs:
+            result = run_in_subprocess(config)
+            results.append(result)
+            if "error" in result:
+                print(f"  ❌ {config}: {result['error']}")
+            else:
+                print(f"  {result['harness']:>7} models={result['models']} prompts={result['prompts']} "
+                      f"concurrency={result['concurrency']}: {result['wall_time_s']:.2f}s, "
+                      f"{result['requests_per_s']:.1f} req/s, p95 {result['latency_p95_s']:.3f}s, "
+                      f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = args.output or os.path.join("..", "benchmarks", f"pipeline_benchmark_{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "timestamp": timestamp,
+            "python": sys.version.split()[0],
+            "settings": {
+                "servers": args.servers,
+                "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms,
+                "model_skew": args.model_skew,
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"\nBenchmark results saved to: {output}")
+
+if __name__ == "__main__":
+    main()
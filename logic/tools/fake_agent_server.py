@@ -0,0 +1,142 @@
+"""
+Local stand-in for the math (8080) and compare (8081) agent servers
+
+Answers POST /invocations like the AgentCore runtimes do (usage/metrics
+envelope, text_only strings, batch and stats payloads and SSE streaming) after a simulated
+per-model latency, without strands or Bedrock. Used by benchmark_pipelines.py
+and handy for running the harnesses offline:
+
+    python fake_agent_server.py --latency-ms 300 --jitter-ms 50
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JUDGE_RATINGS = {"factual_correctness": 8, "subject_focus": 7, "completeness": 7, "professionalism": 9}
+
+def model_latency(profiles, model_id, default_latency_ms, jitter_ms):
+    """Simulated latency in seconds for one call to a model"""
+    mean_ms = profiles.get(model_id, default_latency_ms)
+    return max(0.0, random.gauss(mean_ms, jitter_ms)) / 1000
+
+def fake_metrics(latency):
+    """Invocation metrics for a simulated call of the given latency in seconds"""
+    return {"cycles": 1, "tool_calls": 0, "model_latency_ms": int(latency * 1000), "server_ms": int(latency * 1000)}
+
+class FakeAgentHandler(BaseHTTPRequestHandler):
+    """Request handler; configuration lives on the server instance"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, payload):
+        """Text and usage for one invocation"""
+        model_id = payload.get("model_id") or "default"
+        if self.server.role == "compare":
+            text = "```json\n" + json.dumps(JUDGE_RATINGS, indent=2) + "\n```"
+        else:
+            digest = int(hashlib.sha256(f"{model_id}|{payload.get('prompt')}".encode("utf-8")).hexdigest(), 16)
+            text = f"Simulated answer from {model_id}. Final answer: {digest % 100}"
+        usage = {"input_tokens": len(str(payload.get("prompt", ""))) // 4, "output_tokens": len(text) // 4,
+                 "cache_read_tokens": 0, "cache_write_tokens": 0}
+        return text, usage
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/ping":
+            self._send(200, json.dumps({"status": "Healthy"}))
+        else:
+            self._send(404, "{}")
+
+    def do_POST(self):
+        if self.path != "/invocations":
+            self._send(404, "{}")
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+
+        if payload.get("stats"):
+            # No model pool, concurrency limits, response cache or warm-up to report
+            self._send(200, json.dumps({"model_pool": {}, "concurrency": {}, "response_cache": {}, "startup": {}}))
+            return
+
+        if "batch" in payload:
+            # Items run in parallel inside the runtime, so the slowest one sets the latency
+            items = payload["batch"]
+            latency = max((model_latency(server.profiles, item.get("model_id"), server.latency_ms, server.jitter_ms)
+                           for item in items), default=0)
+            time.sleep(latency)
+            results = []
+            for item in items:
+                text, usage = self._answer(item)
+                results.append({"text": text, "usage": usage, "metrics": fake_metrics(latency),
+                                "cache_hit": False, "status": "ok"})
+            self._send(200, json.dumps({"results": results}))
+            return
+
+        latency = model_latency(server.profiles, payload.get("model_id"), server.latency_ms, server.jitter_ms)
+        text, usage = self._answer(payload)
+        if payload.get("stream"):
+            # First delta after a fifth of the latency, the rest spread over the remainder
+            words = text.split(" ")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            time.sleep(latency / 5)
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(latency * 4 / 5 / max(1, len(words) - 1))
+                self.wfile.write(f"data: {json.dumps(word if i == 0 else ' ' + word)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            final = {"usage": usage, "metrics": fake_metrics(latency), "cache_hit": False}
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+            self.close_connection = True
+            return
+
+        time.sleep(latency)
+        if payload.get("text_only"):
+            self._send(200, json.dumps(text))
+        else:
+            self._send(200, json.dumps({"text": text, "usage": usage, "metrics": fake_metrics(latency), "cache_hit": False}))
+
+def start_server(port, role, profiles=None, latency_ms=200, jitter_ms=0):
+    """Start a stand-in agent server on a background thread and return it"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeAgentHandler)
+    server.daemon_threads = True
+    server.role = role
+    server.profiles = profiles or {}
+    server.latency_ms = latency_ms
+    server.jitter_ms = jitter_ms
+    threading.Thread(target=server.serve_forever, name=f"fake-{role}-agent", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in math and compare agent servers")
+    parser.add_argument("--latency-ms", type=float, default=200, help="mean simulated latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="standard deviation of the latency")
+    parser.add_argument("--profiles", default="{}", help='JSON mapping model_id to mean latency in ms')
+    args = parser.parse_args()
+
+    profiles = json.loads(args.profiles)
+    start_server(8080, "math", profiles, args.latency_ms, args.jitter_ms)
+    start_server(8081, "compare", profiles, args.latency_ms, args.jitter_ms)
+    print("Fake math agent on http://127.0.0.1:8080, fake compare agent on http://127.0.0.1:8081 (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
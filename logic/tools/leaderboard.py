@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import time
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_grader import grader_summary
+from judge_scores import CRITERIA
+from results_store import RESULTS_DB, judgment_scores, latest_run, response_grades
+from score_aggregation import ScoreArray
+
+def build_leaderboard(run_id):
+    """Aggregate the judge ratings of a stored run into leaderboards and agreement figures, with the local grader's accuracy"""
+    started = time.perf_counter()
+    rated = judgment_scores(run_id)
+    grades = response_grades(run_id)
+    loaded = time.perf_counter()
+    array = ScoreArray.from_judgments(rated)
+    summary = array.summary()
+    summary["run_id"] = run_id
+    summary["judgments"] = len(rated)
+    summary["unparsed_judgments"] = sum(1 for *_, scores in rated if not scores)
+    summary["grader"] = grader_summary((model_id, grade) for model_id, _, grade in grades)
+    summary["load_seconds"] = loaded - started
+    summary["aggregate_seconds"] = time.perf_counter() - loaded
+    return summary
+
+def print_leaderboard(summary, criteria=None):
+    """Print the overall leaderboard (and per-criterion ones, if named) with judge agreement"""
+    print(f"\n🏆 Leaderboard for run {summary['run_id']} ({summary['ratings']} ratings from {summary['judges']} judges "
+          f"over {summary['prompts']} prompts, {summary['unparsed_judgments']} analyses without ratings):")
+    for name in ["overall"] + list(criteria or []):
+        print(f"  {name}:")
+        for row in summary["leaderboards"][name]:
+            mean = f"{row['mean']:.2f}" if row["mean"] is not None else "n/a"
+            error = f" ± {row['std_error']:.2f}" if row["std_error"] is not None else ""
+            print(f"    {row['rank']}. {row['model_id']}: {mean}{error} ({row['ratings']} ratings)")
+    agreement = ", ".join(
+        f"{criterion} {value:.2f}" if value is not None else f"{criterion} n/a"
+        for criterion, value in summary["judge_agreement"].items()
+    )
+    print(f"  Judge agreement (mean pairwise r): {agreement}")
+    graded = [row for row in summary.get("grader", []) if row["graded"]]
+    if graded:
+        print(f"  Local grader (final answer vs verified answer):")
+        for row in graded:
+            accuracy = f"{row['accuracy']:.0%}" if row["accuracy"] is not None else "n/a"
+            print(f"    {row['model_id']}: {accuracy} correct ({row['correct']} correct, {row['incorrect']} incorrect, "
+                  f"{row['unknown']} undecided, {row['confident']} confident)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leaderboards from the judge ratings of a stored run")
+    parser.add_argument("--run-id", type=int, help="run to aggregate (default: the latest run with judgments)")
+    parser.add_argument("--criteria", action="store_true", help="also print the leaderboard of each criterion")
+    args = parser.parse_args()
+
+    run_id = args.run_id
+    if run_id is None:
+        latest = latest_run(table="judgments")
+        if latest is None:
+            print(f"No judgments found in {RESULTS_DB}")
+            sys.exit(1)
+        run_id = latest["run_id"]
+
+    summary = build_leaderboard(run_id)
+    print_leaderboard(summary, CRITERIA if args.criteria else None)
+    print(f"Loaded in {summary['load_seconds'] * 1000:.0f} ms, aggregated in {summary['aggregate_seconds'] * 1000:.0f} ms")
+
+    os.makedirs("../compare_output", exist_ok=True)
+    leaderboard_file = f"../compare_output/leaderboard_run_{run_id}.json"
+    with open(leaderboard_file, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Leaderboard saved to: {leaderboard_file}")
@@ -0,0 +1,362 @@
+"""
+Work-queue pipeline: the async pipeline spread over worker processes
+
+The run's (stage, model, prompt) units go on a durable SQLite queue (see
+logic/work_queue.py) and any number of worker processes claim and run them,
+on this machine or on others that share the logic/ directory. Each worker is
+an async pipeline of its own: it answers math units with the math agent,
+queues a judge unit for every response, and has the judge panel rate those.
+Workers that die leave their units behind once their leases run out, and
+another worker picks them up.
+
+Typical flow (run from logic/tools):
+    python queue_pipeline.py run --processes 4              # enqueue, work with 4 local processes, report
+    python queue_pipeline.py enqueue --dataset ../data/math.jsonl --judges cascade
+    python queue_pipeline.py work <run id> --processes 8    # on every host that should help
+    python queue_pipeline.py status <run id>
+
+Every host calls its own agents on http://127.0.0.1:8080 and :8081. Adaptive
+evaluation and batch/streaming requests need one process to see the whole
+run, so they stay with test_async_pipeline.py.
+"""
+
+import argparse
+import asyncio
+import aiohttp
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answer_grader import GRADER_JUDGE_RATE, should_judge
+from hedging import Hedger
+from judge_panel import JUDGE_EXCLUDE_SELF, JUDGE_PANEL, JUDGE_PANEL_MODES, JudgePanel
+from leaderboard import build_leaderboard, print_leaderboard
+from model_ids import DEFAULT_RATE_LIMITS, MODEL_IDS, MODEL_RATE_LIMITS
+from prompt_dataset import PROMPT_LIMIT, PROMPT_SAMPLE, PROMPT_SHARD, dataset_options, describe_dataset, load_prompts
+from rate_limiter import ModelRateLimiter
+from result_writer import ResultWriter
+from results_store import RESULTS_DB, finish_run, get_run, prompt_results, result_counts, start_run
+from retry import circuit_states
+from test_async_pipeline import (PerModelTotals, fetch_runtime_stats, judge_response, process_math_request, stored_comparison_record,
+                                 stored_math_record, write_math_results)
+from work_queue import WORK_QUEUE_DB, WORK_QUEUE_LEASE_SECONDS, claim, complete, enqueue, fail, failed_units, queue_counts, renew
+
+# Units enqueued per transaction while the dataset is read
+ENQUEUE_CHUNK = int(os.getenv("WORK_QUEUE_ENQUEUE_CHUNK", "1000"))
+# How often an idle worker looks for new units
+POLL_SECONDS = float(os.getenv("WORK_QUEUE_POLL_SECONDS", "2"))
+
+def enqueue_run(judges=JUDGE_PANEL, exclude_self=JUDGE_EXCLUDE_SELF, graded_judge_rate=GRADER_JUDGE_RATE, prompt_source=None,
+                prompt_cache=False, bypass_cache=False, rate_limit=True, hedge=False, export_text=False):
+    """Start a queue run and put a math unit on the queue for every model and prompt; returns the run_id
+
+    The options are stored with the run, so workers only need its run_id.
+    """
+    prompt_source = prompt_source or dataset_options()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_id = start_run("queue", timestamp, {
+        "prompt_cache": prompt_cache, "bypass_cache": bypass_cache, "rate_limit": rate_limit, "hedge": hedge,
+        "export_text": export_text, "judges": judges, "exclude_self": exclude_self, "graded_judge_rate": graded_judge_rate,
+        "prompt_source": prompt_source,
+    })
+    print(f"📥 Run {run_id}: queueing {len(MODEL_IDS)} models x {describe_dataset(**prompt_source)}")
+
+    queued = 0
+    units = []
+    for prompt_data in load_prompts(**prompt_source):
+        units += [("math", model_id, prompt_data["id"], prompt_data) for model_id in MODEL_IDS]
+        if len(units) >= ENQUEUE_CHUNK:
+            queued += enqueue(run_id, units)
+            units = []
+    queued += enqueue(run_id, units)
+    print(f"📥 {queued} math units queued in {WORK_QUEUE_DB} (start workers with: python queue_pipeline.py work {run_id})")
+    return run_id
+
+def new_run(session, run_id, stored_run, worker, rate_share):
+    """The shared state test_async_pipeline's request functions expect, for one worker"""
+    options = stored_run["options"]
+    timestamp = stored_run["timestamp"]
+    payload_options = {}
+    if options.get("prompt_cache"):
+        payload_options["cache_prompt"] = True
+    if options.get("bypass_cache"):
+        payload_options["bypass_cache"] = True
+    rate_limiter = None
+    if options.get("rate_limit", True):
+        # Every worker paces itself to its share of each model's quota
+        share = lambda limits: {key: value * rate_share for key, value in limits.items()}
+        rate_limiter = ModelRateLimiter({model_id: share(limits) for model_id, limits in MODEL_RATE_LIMITS.items()},
+                                        share(DEFAULT_RATE_LIMITS))
+    # One summary file per worker, since workers on other machines cannot share an open file
+    suffix = worker.replace(":", "_")
+    return {
+        "session": session,
+        "run_id": run_id,
+        "timestamp": timestamp,
+        "export_text": options.get("export_text", False),
+        "stream": False,
+        "batch": False,
+        "prompt_cache": options.get("prompt_cache", False),
+        "payload_options": payload_options,
+        "stream_timings": {},
+        "writer": ResultWriter().start(),
+        "math_summary_file": f"../math_output/queue_summary_{timestamp}_{suffix}.jsonl",
+        "comparison_summary_file": f"../compare_output/queue_comparison_summary_{timestamp}_{suffix}.jsonl",
+        "totals": PerModelTotals(),
+        "resumed": True,
+        "adaptive": None,
+        "judge_panel": JudgePanel(options.get("judges", JUDGE_PANEL), exclude_self=options.get("exclude_self", JUDGE_EXCLUDE_SELF)),
+        "graded_judge_rate": options.get("graded_judge_rate", GRADER_JUDGE_RATE),
+        "judging": {"calls": 0, "responses": 0, "skipped": 0},
+        "rate_limiter": rate_limiter,
+        "hedgers": {"math": Hedger(), "compare": Hedger()} if options.get("hedge") else {},
+        "worker": worker,
+        "units": {"math": 0, "judge": 0, "failed": 0, "lost_leases": 0},
+    }
+
+async def run_math_unit(run, unit):
+    """Answer one prompt with one model, then queue the judging of the response
+
+    A unit that is run again (after its worker died) reuses the response
+    stored the first time.
+    """
+    prompt_data = unit["payload"]
+    model_id = unit["model_id"]
+    math_rows, _ = await asyncio.to_thread(prompt_results, run["run_id"], prompt_data["id"])
+    stored = [row for row in math_rows if row["model_id"] == model_id]
+    if stored:
+        math_result = stored_math_record(stored[-1])
+    else:
+        math_result = await process_math_request(run, model_id, prompt_data, prompt_data["index"])
+        await write_math_results(run, [math_result])
+    if math_result["error"]:
+        return math_result["error"]
+
+    if should_judge(math_result["grade"], model_id, math_result["prompt_id"] or math_result["prompt_index"], run["graded_judge_rate"]):
+        await asyncio.to_thread(enqueue, run["run_id"], [("judge", model_id, math_result["id"], {
+            "math_response_id": math_result["id"], "prompt_id": math_result["prompt_id"], "prompt_index": math_result["prompt_index"],
+        })])
+    else:
+        # The local grader is sure of this one
+        run["judging"]["skipped"] += 1
+    return None
+
+async def run_judge_unit(run, unit):
+    """Have the judge panel rate one stored math response
+
+    Judges that already rated it (before its worker died) are not called
+    again, and a cascade goes on from their ratings. When every judge
+    called failed, the unit fails too, so the queue retries it.
+    """
+    payload = unit["payload"]
+    math_rows, judgment_rows = await asyncio.to_thread(prompt_results, run["run_id"], payload["prompt_id"])
+    math_row = next((row for row in math_rows if row["id"] == payload["math_response_id"]), None)
+    if math_row is None:
+        return {"type": "missing_response", "message": f"math response {payload['math_response_id']} is not stored"}
+    rated = {}
+    for row in judgment_rows:
+        if row["math_response_id"] == math_row["id"]:
+            rated[row["answering_model_id"]] = stored_comparison_record(row)["scores"]
+    outcomes = await judge_response(run, stored_math_record(math_row), rated)
+    # The unit only counts as done once its judgments are in the results store
+    await run["writer"].flush()
+    errors = [outcome if isinstance(outcome, Exception) else outcome["error"] for outcome in outcomes
+              if isinstance(outcome, Exception) or outcome["error"]]
+    if outcomes and len(errors) == len(outcomes):
+        # No judge got through; a retry calls them again, since failed judgments do not count as rated
+        last = errors[-1]
+        return last if isinstance(last, dict) else {"type": type(last).__name__, "message": str(last)}
+    return None
+
+async def run_unit(run, unit):
+    """Run one claimed unit and report it back to the queue"""
+    try:
+        error = await (run_math_unit(run, unit) if unit["stage"] == "math" else run_judge_unit(run, unit))
+    except Exception as e:
+        error = {"type": type(e).__name__, "message": str(e)}
+    if error is None:
+        run["units"][unit["stage"]] += 1
+        if not await asyncio.to_thread(complete, unit["id"], run["worker"]):
+            run["units"]["lost_leases"] += 1
+    else:
+        run["units"]["failed"] += 1
+        print(f"  ⚠️  {unit['stage']} unit {unit['id']} ({unit['model_id']}) failed, attempt {unit['attempts']}: {error.get('message', error)}")
+        await asyncio.to_thread(fail, unit["id"], run["worker"], error)
+
+async def keep_leases(run, lease_seconds):
+    """Renew this worker's leases while it works, well before they run out"""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        await asyncio.to_thread(renew, run["worker"], lease_seconds)
+
+async def queue_worker(run_id, concurrency=32, max_connections=100, rate_share=1.0, lease_seconds=WORK_QUEUE_LEASE_SECONDS):
+    """Claim and run a queue run's units, concurrency at a time, until none are left anywhere
+
+    A worker also waits while other workers hold units, since their math
+    units can still queue judging work.
+    """
+    stored_run = get_run(run_id)
+    if stored_run is None or stored_run["harness"] != "queue":
+        print(f"No queue run {run_id} in {RESULTS_DB}")
+        return None
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 Worker {worker} on run {run_id} ({concurrency} units at a time)")
+
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        run = new_run(session, run_id, stored_run, worker, rate_share)
+        heartbeat = asyncio.create_task(keep_leases(run, lease_seconds))
+        tasks = set()
+        try:
+            while True:
+                units = []
+                if len(tasks) < concurrency:
+                    units = await asyncio.to_thread(claim, run_id, worker, concurrency - len(tasks), lease_seconds)
+                tasks |= {asyncio.create_task(run_unit(run, unit)) for unit in units}
+                if not units and not tasks:
+                    counts = await asyncio.to_thread(queue_counts, run_id)
+                    if not any(stage["pending"] or stage["leased"] for stage in counts.values()):
+                        break
+                if tasks:
+                    _, tasks = await asyncio.wait(tasks, timeout=POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+                elif not units:
+                    await asyncio.sleep(POLL_SECONDS)
+        finally:
+            heartbeat.cancel()
+            await run["writer"].close()
+        runtime_stats = await fetch_runtime_stats(session)
+
+    units = run["units"]
+    print(f"👷 Worker {worker} done: {units['math']} math units, {units['judge']} judge units, {units['failed']} failed attempts"
+          + (f", {units['lost_leases']} finished after their lease ran out" if units["lost_leases"] else ""))
+    return {
+        "worker": worker,
+        "units": units,
+        "judging": run["judging"],
+        "per_model": run["totals"].summary(),
+        "rate_limit_waits": run["rate_limiter"].summary() if run["rate_limiter"] else [],
+        "circuits": circuit_states(),
+        "writer": run["writer"].stats,
+        "runtime_stats": runtime_stats,
+    }
+
+def work(run_id, processes=1, concurrency=32, max_connections=100, rate_share=None):
+    """Run processes workers on this machine until the run's queue is drained
+
+    rate_share is each worker's share of the model quotas (default: an
+    equal share for each local process); lower it when other machines
+    work on the same run.
+    """
+    rate_share = rate_share or 1 / processes
+    if processes == 1:
+        return [asyncio.run(queue_worker(run_id, concurrency, max_connections, rate_share))]
+    summaries = []
+    with tempfile.TemporaryDirectory(prefix="queue_workers_") as summary_dir:
+        workers = []
+        for n in range(processes):
+            summary_file = os.path.join(summary_dir, f"worker_{n}.json")
+            command = [sys.executable, os.path.abspath(__file__), "work", str(run_id), "--concurrency", str(concurrency),
+                       "--max-connections", str(max_connections), "--rate-share", str(rate_share), "--summary-file", summary_file]
+            workers.append((subprocess.Popen(command), summary_file))
+        for process, summary_file in workers:
+            process.wait()
+            # A worker that crashed leaves no summary; its units go back to the queue when their leases run out
+            if os.path.exists(summary_file):
+                with open(summary_file, "r") as f:
+                    summaries.append(json.load(f))
+    return summaries
+
+def report(run_id, summaries=None):
+    """Print a queue run's progress and, once its queue is drained, finish it and print its leaderboard"""
+    stored_run = get_run(run_id)
+    counts = queue_counts(run_id)
+    print(f"\n📋 Queue for run {run_id}:")
+    for stage in ("math", "judge"):
+        if stage in counts:
+            print(f"  {stage}: " + ", ".join(f"{count} {status}" for status, count in counts[stage].items()))
+    for unit in failed_units(run_id):
+        print(f"  ❌ {unit['stage']} {unit['model_id']} {unit['subject']}: {(unit['error'] or {}).get('message')}")
+    stored_math, stored_judgments = result_counts(run_id)
+    print(f"Results stored in {RESULTS_DB}: {stored_math} math responses, {stored_judgments} judgments")
+
+    if any(stage["pending"] or stage["leased"] for stage in counts.values()):
+        print("Units are still waiting or being worked on")
+        return
+    if stored_run["finished"] is None:
+        finish_run(run_id)
+
+    summaries = summaries or []
+    if summaries:
+        os.makedirs("../math_output", exist_ok=True)
+        run_summary_file = f"../math_output/queue_run_summary_{stored_run['timestamp']}.json"
+        with open(run_summary_file, "w") as f:
+            json.dump({"run_id": run_id, "timestamp": stored_run["timestamp"], "queue": counts, "workers": summaries,
+                       "leaderboard": build_leaderboard(run_id)}, f, indent=2)
+        calls = sum(summary["judging"]["calls"] for summary in summaries)
+        skipped = sum(summary["judging"]["skipped"] for summary in summaries)
+        print(f"⚖️  {calls} judge calls from {len(summaries)} workers" + (f", {skipped} graded responses left to the local grader" if skipped else ""))
+        print(f"Run summary saved to: {run_summary_file}")
+
+    leaderboard = build_leaderboard(run_id)
+    if leaderboard["ratings"] or leaderboard["grader"]:
+        print_leaderboard(leaderboard)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async pipeline spread over worker processes through a work queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="start a run and queue its math units")
+    run_parser = commands.add_parser("run", help="enqueue, work with local processes until the queue is drained, and report")
+    for command in (enqueue_parser, run_parser):
+        command.add_argument("--dataset", help="JSONL, CSV or Parquet prompt file, directory or glob (default: PROMPT_DATASET, else test_prompts.py)")
+        command.add_argument("--shard", default=PROMPT_SHARD, metavar="I/N", help="only queue shard I of N of the dataset (split by prompt ID)")
+        command.add_argument("--sample", type=float, default=PROMPT_SAMPLE, help="share of the dataset's prompts to queue")
+        command.add_argument("--limit", type=int, default=PROMPT_LIMIT, help="queue at most this many prompts (0: no limit)")
+        command.add_argument("--judges", choices=JUDGE_PANEL_MODES, default=JUDGE_PANEL, help="which judges rate each response (see logic/judge_panel.py)")
+        command.add_argument("--exclude-self", action="store_true", default=JUDGE_EXCLUDE_SELF, help="never let a model judge its own responses")
+        command.add_argument("--graded-judge-rate", type=float, default=GRADER_JUDGE_RATE, help="share of confidently graded responses still sent to the judges")
+        command.add_argument("--prompt-cache", action="store_true", help="mark system prompts and the verified-answer prefix as Bedrock cache points")
+        command.add_argument("--no-cache", action="store_true", help="bypass the runtimes' response cache for this run")
+        command.add_argument("--no-rate-limit", action="store_true", help="send requests without pacing them to the RPM/TPM limits in model_ids.py")
+        command.add_argument("--hedge", action="store_true", help="duplicate slow calls after their model's p95 latency (see logic/hedging.py)")
+        command.add_argument("--export-text", action="store_true", help="also write one text file per response and judgment")
+
+    work_parser = commands.add_parser("work", help="claim and run a queued run's units until its queue is drained")
+    work_parser.add_argument("run_id", type=int)
+    work_parser.add_argument("--summary-file", help=argparse.SUPPRESS)
+    for command in (work_parser, run_parser):
+        command.add_argument("--processes", type=int, default=1, help="worker processes to start on this machine")
+        command.add_argument("--concurrency", type=int, default=32, help="units each worker runs at a time")
+        command.add_argument("--max-connections", type=int, default=100, help="concurrent HTTP connections per worker")
+        command.add_argument("--rate-share", type=float, help="share of each model's quota per worker (default: 1 / processes)")
+
+    status_parser = commands.add_parser("status", help="show a run's queue, and its leaderboard once it is drained")
+    status_parser.add_argument("run_id", type=int)
+    args = parser.parse_args()
+
+    if args.command in ("enqueue", "run"):
+        run_id = enqueue_run(judges=args.judges, exclude_self=args.exclude_self, graded_judge_rate=args.graded_judge_rate,
+                             prompt_source=dataset_options(args.dataset, args.shard, args.sample, args.limit),
+                             prompt_cache=args.prompt_cache, bypass_cache=args.no_cache, rate_limit=not args.no_rate_limit,
+                             hedge=args.hedge, export_text=args.export_text)
+    else:
+        run_id = args.run_id
+
+    if args.command == "work" and args.summary_file:
+        # A worker started by another work command, which collects the summaries
+        summary = asyncio.run(queue_worker(run_id, args.concurrency, args.max_connections, args.rate_share or 1.0))
+        with open(args.summary_file, "w") as f:
+            json.dump(summary, f)
+    elif args.command in ("work", "run"):
+        started = time.perf_counter()
+        summaries = [s for s in work(run_id, args.processes, args.concurrency, args.max_connections, args.rate_share) if s]
+        print(f"\n🏁 {len(summaries)} workers finished in {time.perf_counter() - started:.1f}s")
+        report(run_id, summaries)
+    elif args.command == "status":
+        report(run_id)
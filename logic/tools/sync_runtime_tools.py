@@ -0,0 +1,67 @@
+"""
+Keep the tool modules the two agent runtimes share in step
+
+math_agent2/ and compare_models/ are deployed as separate AgentCore runtimes,
+and each deployment only packages its own directory, so modules both of them
+use have to exist in both tools/ folders. math_agent2/tools/ holds the copy
+to edit; this script copies those modules over to compare_models/tools/, or
+with --check reports copies that drifted apart (exit status 1).
+
+get_agent.py and system_prompt.py differ on purpose and are not synced.
+
+    python sync_runtime_tools.py            # after editing a shared module in math_agent2/tools
+    python sync_runtime_tools.py --check
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SOURCE_DIR = os.path.join(ROOT_DIR, "math_agent2", "tools")
+TARGET_DIRS = [os.path.join(ROOT_DIR, "compare_models", "tools")]
+
+SHARED_TOOLS = [
+    "batch.py",
+    "concurrency.py",
+    "fake_model.py",
+    "metrics.py",
+    "response_cache.py",
+    "sessions.py",
+    "tracing.py",
+    "warmup.py",
+]
+
+def drifted_tools():
+    """(module, target directory) pairs whose copy differs from math_agent2/tools"""
+    drifted = []
+    for target_dir in TARGET_DIRS:
+        for name in SHARED_TOOLS:
+            target = os.path.join(target_dir, name)
+            if not os.path.exists(target) or not filecmp.cmp(os.path.join(SOURCE_DIR, name), target, shallow=False):
+                drifted.append((name, target_dir))
+    return drifted
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the shared runtime tool modules from math_agent2/tools to compare_models/tools")
+    parser.add_argument("--check", action="store_true", help="only report copies that differ")
+    args = parser.parse_args()
+
+    drifted = drifted_tools()
+    if not drifted:
+        print("✅ Shared runtime tools are in sync")
+        return
+    for name, target_dir in drifted:
+        target = os.path.relpath(os.path.join(target_dir, name), ROOT_DIR)
+        if args.check:
+            print(f"❌ {target} differs from math_agent2/tools/{name}")
+        else:
+            shutil.copyfile(os.path.join(SOURCE_DIR, name), os.path.join(target_dir, name))
+            print(f"🔁 Updated {target}")
+    if args.check:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
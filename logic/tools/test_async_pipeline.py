@@ -1,267 +1,995 @@
+import argparse
 import asyncio
 import aiohttp
 import json
 import os
+import random
+import time
 from datetime import datetime
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model_ids import MODEL_IDS
-from test_prompts import TEST_PROMPTS
+from adaptive import ADAPTIVE_SEED, ADAPTIVE_SHUFFLE_BUFFER, ADAPTIVE_WINDOW, AdaptiveStopper
+from agent_response import parse_agent_response, parse_batch_result
+from answer_grader import GRADER_JUDGE_RATE, grade_answer, should_judge
+from compare_prompt import format_compare_prompt
+from hedging import Hedger
+from judge_panel import JUDGE_EXCLUDE_SELF, JUDGE_PANEL, JUDGE_PANEL_MODES, JudgePanel
+from judge_scores import parse_judge_scores
+from leaderboard import build_leaderboard, print_leaderboard
+from model_ids import DEFAULT_RATE_LIMITS, MODEL_IDS, MODEL_RATE_LIMITS
+from prompt_dataset import PROMPT_LIMIT, PROMPT_SAMPLE, PROMPT_SHARD, dataset_options, dataset_size, describe_dataset, load_prompts, shuffled
+from rate_limiter import ModelRateLimiter, estimate_tokens
+from result_writer import ResultWriter
+from results_store import RESULTS_DB, finish_run, get_run, prompt_results, result_counts, start_run
+from retry import AgentError, CircuitBreaker, call_with_retry, circuit_states, classify_error, get_breaker, record_outcome
+from text_export import comparison_output_path, math_output_path, save_comparison_output, save_math_output
+from tracing import inject_trace_context, setup_tracing, shutdown_tracing, span
 
-async def call_math_agent(session, prompt, model_id=None):
-    """Call the math agent asynchronously"""
-    url = "http://127.0.0.1:8080/invocations"
+async def post_invocation(session, url, payload):
+    """POST one payload to an agent and return the response body, raising AgentError on failure"""
     headers = {"Content-Type": "application/json"}
-    
+    try:
+        async with session.post(url, headers=headers, json=payload) as response:
+            body = await response.text()
+            if response.status != 200:
+                raise AgentError(classify_error(response.status, body), f"{response.status} - {body}", response.status)
+            return body
+    except asyncio.TimeoutError:
+        raise AgentError("timeout", "request timed out")
+    except aiohttp.ClientError as e:
+        raise AgentError(classify_error(None, e), str(e))
+
+async def fetch_runtime_stats(session):
+    """Model pool, concurrency, response cache and startup counters of each agent runtime (None if it did not answer)"""
+    stats = {}
+    for stage, url in (("math", "http://127.0.0.1:8080/invocations"), ("compare", "http://127.0.0.1:8081/invocations")):
+        try:
+            stats[stage] = json.loads(await post_invocation(session, url, {"stats": True}))
+        except (AgentError, json.JSONDecodeError) as e:
+            print(f"⚠️  No runtime stats from the {stage} agent: {e}")
+            stats[stage] = None
+    return stats
+
+async def call_math_agent(session, prompt, model_id=None, options=None):
+    """Call the math agent asynchronously; returns the response body or an AgentError"""
+    with span("call_math_agent", model_id=model_id):
+        url = "http://127.0.0.1:8080/invocations"
+        
+        payload = {"prompt": prompt}
+        if model_id:
+            payload["model_id"] = model_id
+        if options:
+            # Extra payload flags such as cache_prompt or bypass_cache
+            payload.update(options)
+        inject_trace_context(payload)
+        
+        return await call_with_retry(model_id, lambda: post_invocation(session, url, payload))
+
+async def call_compare_agent(session, prompt, model_id=None, prompt_prefix=None, options=None):
+    """Call the compare agent asynchronously; returns the response body or an AgentError"""
+    with span("call_compare_agent", model_id=model_id):
+        url = "http://127.0.0.1:8081/invocations"
+        
+        payload = {"prompt": prompt}
+        if model_id:
+            payload["model_id"] = model_id
+        if prompt_prefix:
+            payload["prompt_prefix"] = prompt_prefix
+        if options:
+            # Extra payload flags such as cache_prompt or bypass_cache
+            payload.update(options)
+        inject_trace_context(payload)
+        
+        return await call_with_retry(model_id, lambda: post_invocation(session, url, payload))
+
+# Breakers for whole batch requests, per URL; the models in a batch are tracked on their own breakers
+batch_breakers = {}
+
+async def call_agent_batch(session, url, items, options=None):
+    """Send several invocations as one batch request and return one result per item"""
+    with span("call_agent_batch", url=url, batch_size=len(items)):
+        payload = {"batch": items}
+        if options:
+            payload.update(options)
+        inject_trace_context(payload)
+        
+        # Retries of the whole request are tracked on the URL's breaker; items report per model
+        breaker = batch_breakers.setdefault(url, CircuitBreaker())
+        body = await call_with_retry(f"batch {url}", lambda: post_invocation(session, url, payload), breaker)
+        if isinstance(body, AgentError):
+            return [body] * len(items)
+        return json.loads(body)["results"]
+
+async def stream_agent(session, url, payload):
+    """Call an agent in streaming mode and time each text delta as it arrives
+
+    Returns (text, timing, details); details is the usage and metrics event
+    the runtime sends after the last delta. A failed call returns
+    (AgentError, None, {}) once retries are used up.
+    """
+    with span("stream_agent", url=url, model_id=payload.get("model_id")):
+        headers = {"Content-Type": "application/json"}
+        payload = inject_trace_context(dict(payload, stream=True))
+        
+        async def attempt():
+            start = time.perf_counter()
+            chunks = []
+            arrivals = []
+            details = {}
+            try:
+                async with session.post(url, headers=headers, json=payload) as response:
+                    if response.status != 200:
+                        body = await response.text()
+                        raise AgentError(classify_error(response.status, body), f"{response.status} - {body}", response.status)
+                    # Server-sent events: one "data: <json>" line per text delta
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line.startswith("data: "):
+                            continue
+                        try:
+                            chunk = json.loads(line[6:])
+                        except json.JSONDecodeError:
+                            chunk = line[6:]
+                        if isinstance(chunk, dict) and "error" in chunk:
+                            # The runtime reports failures inside the stream with status 200
+                            raise AgentError(classify_error(500, chunk["error"]), chunk["error"], 500)
+                        if isinstance(chunk, dict):
+                            details = chunk
+                            continue
+                        if not isinstance(chunk, str):
+                            continue
+                        chunks.append(chunk)
+                        arrivals.append(time.perf_counter())
+            except asyncio.TimeoutError:
+                raise AgentError("timeout", "request timed out")
+            except aiohttp.ClientError as e:
+                raise AgentError(classify_error(None, e), str(e))
+            
+            timing = {
+                "ttft": arrivals[0] - start if arrivals else None,
+                "inter_token": [later - earlier for earlier, later in zip(arrivals, arrivals[1:])],
+                "total": time.perf_counter() - start,
+                "chunks": len(arrivals),
+            }
+            return "".join(chunks), timing, details
+        
+        result = await call_with_retry(payload.get("model_id"), attempt)
+        if isinstance(result, AgentError):
+            return result, None, {}
+        return result
+
+async def call_math_agent_stream(session, prompt, model_id=None, options=None):
+    """Call the math agent with streaming and return (response, timing, details)"""
     payload = {"prompt": prompt}
     if model_id:
         payload["model_id"] = model_id
-    
-    try:
-        async with session.post(url, headers=headers, json=payload) as response:
-            if response.status == 200:
-                return await response.text()
-            else:
-                return f"Error: {response.status} - {await response.text()}"
-    except Exception as e:
-        return f"Error: {str(e)}"
+    if options:
+        # Extra payload flags such as cache_prompt or bypass_cache
+        payload.update(options)
+    return await stream_agent(session, "http://127.0.0.1:8080/invocations", payload)
 
-async def call_compare_agent(session, prompt, model_id=None):
-    """Call the compare agent asynchronously"""
-    url = "http://127.0.0.1:8081/invocations"
-    headers = {"Content-Type": "application/json"}
-    
+async def call_compare_agent_stream(session, prompt, model_id=None, prompt_prefix=None, options=None):
+    """Call the compare agent with streaming and return (response, timing, details)"""
     payload = {"prompt": prompt}
     if model_id:
         payload["model_id"] = model_id
-    
-    try:
-        async with session.post(url, headers=headers, json=payload) as response:
-            if response.status == 200:
-                return await response.text()
-            else:
-                return f"Error: {response.status} - {await response.text()}"
-    except Exception as e:
-        return f"Error: {str(e)}"
+    if prompt_prefix:
+        payload["prompt_prefix"] = prompt_prefix
+    if options:
+        # Extra payload flags such as cache_prompt or bypass_cache
+        payload.update(options)
+    return await stream_agent(session, "http://127.0.0.1:8081/invocations", payload)
 
-def save_math_output(model_id, prompt_data, response, timestamp, prompt_index):
-    """Save math agent output to file"""
-    clean_model_id = model_id.replace(".", "_").replace(":", "_")
-    filename = f"output_{clean_model_id}_{timestamp}.txt"
-    
-    prompt_dir = os.path.join("..", "math_output", f"prompt_{prompt_index}")
-    os.makedirs(prompt_dir, exist_ok=True)
-    
-    if isinstance(prompt_data, dict):
-        prompt_text = prompt_data["question"]
-        correct_answer = prompt_data.get("answer")
-    else:
-        prompt_text = prompt_data
-        correct_answer = None
-    
-    filepath = os.path.join(prompt_dir, filename)
-    with open(filepath, "w") as f:
-        f.write(f"Model ID: {model_id}\n")
-        f.write(f"Timestamp: {timestamp}\n")
-        f.write(f"Prompt Index: {prompt_index}\n")
-        f.write(f"Prompt: {prompt_text}\n")
-        if correct_answer:
-            f.write(f"Correct Answer: {correct_answer}\n")
-        f.write("-" * 50 + "\n")
-        f.write(f"Response: {response}\n\n")
-    
-    return filepath, prompt_text, correct_answer
+# Latency percentiles come from a uniform sample of at most LATENCY_SAMPLE_SIZE
+# values per series, so long runs do not keep every call's timings
+LATENCY_SAMPLE_SIZE = int(os.getenv("LATENCY_SAMPLE_SIZE", "1000"))
 
-def save_comparison_output(analyzed_model_id, answering_model_id, original_question, correct_answer, original_response, formatted_prompt, analysis_response, timestamp, prompt_index):
-    """Save comparison output to file"""
-    clean_analyzed = analyzed_model_id.replace(".", "_").replace(":", "_")
-    clean_answering = answering_model_id.replace(".", "_").replace(":", "_")
-    
-    filename = f"comparison_analyzed_{clean_analyzed}_answered_{clean_answering}_{timestamp}.txt"
-    
-    prompt_dir = os.path.join("..", "compare_output", f"prompt_{prompt_index}")
-    os.makedirs(prompt_dir, exist_ok=True)
-    
-    filepath = os.path.join(prompt_dir, filename)
-    with open(filepath, "w") as f:
-        f.write(f"Analyzed Model ID: {analyzed_model_id}\n")
-        f.write(f"Answering Model ID: {answering_model_id}\n")
-        f.write(f"Timestamp: {timestamp}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ORIGINAL QUESTION:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{original_question}\n")
-        if correct_answer:
-            f.write("-" * 70 + "\n")
-            f.write("CORRECT ANSWER:\n")
-            f.write("-" * 70 + "\n")
-            f.write(f"{correct_answer}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ORIGINAL RESPONSE (from analyzed model):\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{original_response}\n")
-        f.write("-" * 70 + "\n")
-        f.write("FORMATTED PROMPT SENT TO COMPARING MODEL:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{formatted_prompt}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ANALYSIS RESPONSE:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{analysis_response}\n\n")
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class LatencySample:
+    """Count and mean of a latency series, with a fixed-size reservoir sample for its percentiles"""
+
+    def __init__(self, size=LATENCY_SAMPLE_SIZE, seed=0):
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.values = []
+        self.rng = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            # Every value seen so far stays in the sample with the same probability
+            slot = self.rng.randrange(self.count)
+            if slot < self.size:
+                self.values[slot] = value
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, fraction):
+        return _percentile(sorted(self.values), fraction)
+
+def add_stream_timing(run, stage, model_id, timing):
+    """Fold one streamed call's timing into the run's per stage and model latency samples"""
+    series = run["stream_timings"].setdefault((stage, model_id), {
+        "requests": 0, "ttft": LatencySample(), "inter_token": LatencySample(), "total": LatencySample(),
+    })
+    series["requests"] += 1
+    if timing["ttft"] is not None:
+        series["ttft"].add(timing["ttft"])
+    for gap in timing["inter_token"]:
+        series["inter_token"].add(gap)
+    series["total"].add(timing["total"])
+
+def summarize_stream_timings(stream_timings):
+    """Aggregate time-to-first-token and inter-token latency per stage and model"""
+    summary = []
+    for (stage, model_id), series in sorted(stream_timings.items()):
+        summary.append({
+            "stage": stage,
+            "model_id": model_id,
+            "requests": series["requests"],
+            "ttft_mean": series["ttft"].mean(),
+            "ttft_p50": series["ttft"].percentile(0.5),
+            "ttft_p95": series["ttft"].percentile(0.95),
+            "inter_token_mean": series["inter_token"].mean(),
+            "inter_token_p95": series["inter_token"].percentile(0.95),
+            "total_mean": series["total"].mean(),
+        })
+    return summary
+
+class PerModelTotals:
+    """Running token usage, agent cycles, tool calls, latency and failed calls per stage and model
+
+    Results are added as they are written, so a run's summary does not need
+    its records kept in memory.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.server_times = {}
+        self.counts = {"math": 0, "compare": 0}
+
+    def add(self, stage, record):
+        model_id = record["model_id"] if stage == "math" else record["answering_model_id"]
+        self.counts[stage] += 1
+        row = self.totals.setdefault((stage, model_id), {
+            "stage": stage,
+            "model_id": model_id,
+            "requests": 0,
+            "errors": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "response_cache_hits": 0,
+            "cycles": 0,
+            "tool_calls": 0,
+            "model_latency_ms": 0,
+            "server_ms": 0,
+        })
+        if record.get("error"):
+            row["errors"] += 1
+            return
+        usage = record.get("usage")
+        if not usage:
+            return
+        metrics = record.get("metrics") or {}
+        row["requests"] += 1
+        row["response_cache_hits"] += 1 if record.get("response_cache_hit") else 0
+        for key in ("input_tokens", "output_tokens", "cache_read_tokens", "cache_write_tokens"):
+            row[key] += usage.get(key, 0)
+        for key in ("cycles", "tool_calls", "model_latency_ms", "server_ms"):
+            row[key] += metrics.get(key, 0)
+        if "server_ms" in metrics:
+            self.server_times.setdefault((stage, model_id), LatencySample()).add(metrics["server_ms"])
+
+    def summary(self):
+        summary = []
+        for key in sorted(self.totals):
+            row = dict(self.totals[key])
+            times = self.server_times.get(key, LatencySample())
+            row["model_latency_ms_mean"] = row["model_latency_ms"] / row["requests"] if row["requests"] else None
+            row["server_ms_p50"] = times.percentile(0.50)
+            row["server_ms_p95"] = times.percentile(0.95)
+            row["output_tokens_per_s"] = row["output_tokens"] / (row["model_latency_ms"] / 1000) if row["model_latency_ms"] else None
+            summary.append(row)
+        return summary
+
+async def acquire_quota(run, model_id, prompt):
+    """Wait for the model's RPM/TPM budget and return the tokens charged for the call"""
+    if run["rate_limiter"] is None:
+        return 0
+    estimated = estimate_tokens(prompt)
+    with span("rate_limit_wait", model_id=model_id):
+        await run["rate_limiter"].acquire(model_id, estimated)
+    return estimated
+
+def settle_quota(run, model_id, estimated, details, calls=1):
+    """Replace the estimated tokens of a call, and of each hedge sent for it, with the usage it reported"""
+    if run["rate_limiter"] is not None:
+        for _ in range(calls):
+            run["rate_limiter"].settle(model_id, estimated, details.get("usage"))
+
+async def hedged_call(run, stage, model_id, estimated, make_call):
+    """Await make_call(), hedged against the stage's latency history when hedging is on
+
+    Returns (result, calls): calls counts the hedge if one took quota, so
+    settle_quota can charge it. A losing call is cancelled before it
+    reports usage, so it is charged what the winner used.
+    """
+    hedger = run["hedgers"].get(stage)
+    if hedger is None:
+        return await make_call(), 1
+    # A hedge is only sent if the model's quota has room for it right now
+    admit = None
+    hedges = []
+    if run["rate_limiter"] is not None:
+        def admit():
+            admitted = run["rate_limiter"].try_acquire(model_id, estimated)
+            if admitted:
+                hedges.append(model_id)
+            return admitted
+    result = await hedger.run(model_id, make_call, admit)
+    return result, 1 + len(hedges)
+
+async def send_batch(run, url, model_ids, items, prompt):
+    """Send the items of models whose circuit is closed as one batch; returns (response, details) per model"""
+    sendable = [(model_id, item) for model_id, item in zip(model_ids, items) if get_breaker(model_id).allow()]
+    estimates = await asyncio.gather(*(acquire_quota(run, model_id, prompt) for model_id, _ in sendable))
+    batch_results = []
+    if sendable:
+        batch_results = await call_agent_batch(run["session"], url, [item for _, item in sendable], run["payload_options"])
     
-    return filepath
+    outcomes = {}
+    for (model_id, _), estimated, result in zip(sendable, estimates, batch_results):
+        response, details = parse_batch_result(result)
+        record_outcome(model_id, response if isinstance(response, AgentError) else None)
+        settle_quota(run, model_id, estimated, details)
+        outcomes[model_id] = (response, details)
+    return [
+        outcomes.get(model_id) or (AgentError("circuit_open", f"circuit open for {model_id}", model_id=model_id, attempts=0), {})
+        for model_id in model_ids
+    ]
 
-async def process_comparison_for_response(session, math_result, timestamp, compare_models):
+async def process_comparison_for_response(run, math_result, compare_models):
     """Process all comparison models for a single math response"""
-    analyzed_model_id, prompt_index, prompt_data, original_response, filepath, prompt_text, correct_answer = math_result
-    
-    print(f"  Starting comparisons for {analyzed_model_id} - Prompt {prompt_index}")
-    
-    # Format the prompt for comparison
-    formatted_prompt = f"User requested answer for following problem: {prompt_text}. AI-Agent responded like this: {original_response}"
-    if correct_answer:
-        formatted_prompt += f". This is the answer we know is correct: {correct_answer}. Please compare the given answer to the verified one and make sure to adjust your ratings accordingly."
-    
-    comparison_tasks = []
-    for answering_model_id in compare_models:
-        task = process_single_comparison(
-            session, analyzed_model_id, answering_model_id, prompt_text, 
-            correct_answer, original_response, formatted_prompt, timestamp, prompt_index
+    with span("process_comparison_for_response", analyzed_model_id=math_result["model_id"], prompt_index=math_result["prompt_index"]):
+        analyzed_model_id = math_result["model_id"]
+        prompt_index = math_result["prompt_index"]
+        
+        print(f"  Starting comparisons for {analyzed_model_id} - Prompt {prompt_index}")
+        
+        # Format the prompt for comparison; with prompt caching the question and verified
+        # answer form a shared prefix that every judge can read from cache
+        prompt_prefix, prompt_remainder = format_compare_prompt(
+            math_result["prompt_text"], math_result["response"], math_result["correct_answer"],
+            cache_split=run["prompt_cache"]
         )
-        comparison_tasks.append(task)
-    
-    # Run all comparisons for this response in parallel
-    comparison_results = await asyncio.gather(*comparison_tasks, return_exceptions=True)
-    
-    print(f"  ✅ Completed all comparisons for {analyzed_model_id} - Prompt {prompt_index}")
-    return comparison_results
+        
+        if run["batch"]:
+            # One request carries every judge for this response
+            items = []
+            for answering_model_id in compare_models:
+                item = {"prompt": prompt_remainder, "model_id": answering_model_id}
+                if prompt_prefix:
+                    item["prompt_prefix"] = prompt_prefix
+                items.append(item)
+            outcomes = await send_batch(
+                run, "http://127.0.0.1:8081/invocations", compare_models, items, prompt_prefix + prompt_remainder
+            )
+            comparison_results = []
+            for answering_model_id, (analysis_response, details) in zip(compare_models, outcomes):
+                comparison_results.append(record_comparison(
+                    run, math_result, answering_model_id, prompt_prefix + prompt_remainder, analysis_response, details
+                ))
+            # The judgments of one batch request go to the results store together
+            await write_comparison_results(run, comparison_results)
+        else:
+            comparison_tasks = []
+            for answering_model_id in compare_models:
+                task = process_single_comparison(run, math_result, answering_model_id, prompt_prefix, prompt_remainder)
+                comparison_tasks.append(task)
+            
+            # Run all comparisons for this response in parallel
+            comparison_results = await asyncio.gather(*comparison_tasks, return_exceptions=True)
+        
+        print(f"  ✅ Completed all comparisons for {analyzed_model_id} - Prompt {prompt_index}")
+        return comparison_results
 
-async def process_single_comparison(session, analyzed_model_id, answering_model_id, prompt_text, correct_answer, original_response, formatted_prompt, timestamp, prompt_index):
+async def process_single_comparison(run, math_result, answering_model_id, prompt_prefix, prompt_remainder):
     """Process a single comparison"""
     print(f"    Analyzing with {answering_model_id}...")
     
-    analysis_response = await call_compare_agent(session, formatted_prompt, answering_model_id)
-    filepath = save_comparison_output(
-        analyzed_model_id, answering_model_id, prompt_text,
-        correct_answer, original_response, formatted_prompt, 
-        analysis_response, timestamp, prompt_index
+    session = run["session"]
+    details = {}
+    calls = 1
+    estimated = await acquire_quota(run, answering_model_id, prompt_prefix + prompt_remainder)
+    if run["stream"]:
+        analysis_response, timing, details = await call_compare_agent_stream(
+            session, prompt_remainder, answering_model_id, prompt_prefix, run["payload_options"]
+        )
+        if timing is not None:
+            add_stream_timing(run, "compare", answering_model_id, timing)
+    else:
+        raw_response, calls = await hedged_call(run, "compare", answering_model_id, estimated, lambda: call_compare_agent(
+            session, prompt_remainder, answering_model_id, prompt_prefix, run["payload_options"]
+        ))
+        analysis_response, details = parse_agent_response(raw_response)
+    settle_quota(run, answering_model_id, estimated, details, calls)
+    
+    record = record_comparison(
+        run, math_result, answering_model_id, prompt_prefix + prompt_remainder, analysis_response, details
     )
+    # Written as soon as it finishes, so an interrupted run can resume without redoing it
+    await write_comparison_results(run, [record])
+    return record
+
+async def judge_response(run, math_result, rated):
+    """Have the run's judge panel rate one math response, one cascade step at a time
+
+    rated maps judges that already rated the response (before a resume) to
+    their scores; it is updated with every new judgment.
+    """
+    panel = run["judge_panel"]
+    if not rated and not should_judge(math_result["grade"], math_result["model_id"], math_result.get("prompt_id") or math_result["prompt_index"],
+                                      run["graded_judge_rate"]):
+        # The local grader is sure of this one
+        run["judging"]["skipped"] += 1
+        return []
+    comparison_results = []
+    judges = panel.next_judges(math_result["model_id"], rated)
+    if judges:
+        run["judging"]["responses"] += 1
+    while judges:
+        outcomes = await process_comparison_for_response(run, math_result, judges)
+        for answering_model_id, outcome in zip(judges, outcomes):
+            rated[answering_model_id] = outcome["scores"] if isinstance(outcome, dict) else None
+        run["judging"]["calls"] += len(judges)
+        comparison_results += outcomes
+        judges = panel.next_judges(math_result["model_id"], rated)
+    return comparison_results
+
+def record_comparison(run, math_result, answering_model_id, formatted_prompt, analysis_response, details):
+    """Build a judge's result record; failed calls get no text export"""
+    error = None
+    filepath = None
+    if isinstance(analysis_response, AgentError):
+        error = analysis_response
+        analysis_response = None
+        print(f"    ❌ {answering_model_id} could not judge {math_result['model_id']} - Prompt {math_result['prompt_index']}: {error}")
+    elif run["export_text"]:
+        filepath = comparison_output_path(math_result["model_id"], answering_model_id, run["timestamp"], math_result["prompt_index"])
     
     return {
-        "analyzed_model_id": analyzed_model_id,
+        "math_response_id": math_result.get("id"),
+        "analyzed_model_id": math_result["model_id"],
         "answering_model_id": answering_model_id,
-        "prompt_index": prompt_index,
-        "original_question": prompt_text,
-        "correct_answer": correct_answer,
-        "original_response": original_response,
+        "prompt_index": math_result["prompt_index"],
+        "prompt_id": math_result.get("prompt_id"),
+        "original_question": math_result["prompt_text"],
+        "correct_answer": math_result["correct_answer"],
+        "original_response": math_result["response"],
         "formatted_prompt": formatted_prompt,
         "analysis_response": analysis_response,
+        "scores": parse_judge_scores(analysis_response) if error is None else None,
+        "error": error.to_dict() if error else None,
+        "usage": details.get("usage"),
+        "metrics": details.get("metrics"),
+        "response_cache_hit": details.get("cache_hit", False),
         "output_file": filepath
     }
 
-async def process_math_request(session, model_id, prompt_data, prompt_index, timestamp):
+async def process_math_request(run, model_id, prompt_data, prompt_index):
     """Process a single math request"""
-    if isinstance(prompt_data, dict):
-        prompt_text = prompt_data["question"]
-    else:
-        prompt_text = prompt_data
-    
-    print(f"🔢 Processing: {model_id} - Prompt {prompt_index}")
+    with span("process_math_request", model_id=model_id, prompt_index=prompt_index):
+        if isinstance(prompt_data, dict):
+            prompt_text = prompt_data["question"]
+        else:
+            prompt_text = prompt_data
+        
+        print(f"🔢 Processing: {model_id} - Prompt {prompt_index}")
+        
+        details = {}
+        calls = 1
+        estimated = await acquire_quota(run, model_id, prompt_text)
+        if run["stream"]:
+            response, timing, details = await call_math_agent_stream(run["session"], prompt_text, model_id, run["payload_options"])
+            if timing is not None:
+                add_stream_timing(run, "math", model_id, timing)
+        else:
+            raw_response, calls = await hedged_call(run, "math", model_id, estimated, lambda: call_math_agent(
+                run["session"], prompt_text, model_id, run["payload_options"]
+            ))
+            response, details = parse_agent_response(raw_response)
+        settle_quota(run, model_id, estimated, details, calls)
+        
+        return record_math_response(run, model_id, prompt_data, prompt_index, response, details)
+
+async def process_math_batch(run, model_ids, prompt_data, prompt_index):
+    """Process one prompt for every model with a single batch request"""
+    prompt_text = prompt_data["question"] if isinstance(prompt_data, dict) else prompt_data
     
-    response = await call_math_agent(session, prompt_text, model_id)
-    filepath, prompt_text, correct_answer = save_math_output(model_id, prompt_data, response, timestamp, prompt_index)
+    print(f"🔢 Processing batch: {len(model_ids)} models - Prompt {prompt_index}")
     
-    print(f"  ✅ Math response saved: {filepath}")
+    items = [{"prompt": prompt_text, "model_id": model_id} for model_id in model_ids]
+    outcomes = await send_batch(run, "http://127.0.0.1:8080/invocations", model_ids, items, prompt_text)
+    math_results = []
+    for model_id, (response, details) in zip(model_ids, outcomes):
+        math_results.append(record_math_response(run, model_id, prompt_data, prompt_index, response, details))
+    return math_results
+
+def record_math_response(run, model_id, prompt_data, prompt_index, response, details):
+    """Build a math result record; failed calls get no text export"""
+    error = None
+    filepath = None
+    grade = None
+    prompt_text = prompt_data["question"] if isinstance(prompt_data, dict) else prompt_data
+    correct_answer = prompt_data.get("answer") if isinstance(prompt_data, dict) else None
+    if isinstance(response, AgentError):
+        error = response
+        response = None
+        print(f"  ❌ Math request failed: {model_id} - Prompt {prompt_index}: {error}")
+    else:
+        if run["export_text"]:
+            filepath = math_output_path(model_id, run["timestamp"], prompt_index)
+        grade = grade_answer(response, correct_answer, prompt_text)
+        print(f"  ✅ Math response: {model_id} - Prompt {prompt_index}" + (f" (graded {grade['verdict']})" if grade else ""))
     
-    return (model_id, prompt_index, prompt_data, response, filepath, prompt_text, correct_answer)
+    return {
+        "model_id": model_id,
+        "prompt_index": prompt_index,
+        "prompt_id": prompt_data.get("id") if isinstance(prompt_data, dict) else None,
+        "prompt": prompt_data,
+        "prompt_text": prompt_text,
+        "correct_answer": correct_answer,
+        "response": response,
+        "grade": grade,
+        "error": error.to_dict() if error else None,
+        "usage": details.get("usage"),
+        "metrics": details.get("metrics"),
+        "response_cache_hit": details.get("cache_hit", False),
+        "file": filepath
+    }
+
+async def write_math_results(run, math_results):
+    """Store math results, queue their text exports and summary lines, and set each record's id
+
+    Waits for the store, since the judgments of these responses refer to
+    their ids.
+    """
+    writer = run["writer"]
+    ids = await writer.add_math_responses(run["run_id"], math_results)
+    for math_result, record_id in zip(math_results, ids):
+        math_result["id"] = record_id
+        if math_result["file"]:
+            details = {"usage": math_result["usage"], "metrics": math_result["metrics"]}
+            await writer.export(save_math_output, math_result["model_id"], math_result["prompt"], math_result["response"],
+                                run["timestamp"], math_result["prompt_index"], details)
+        await writer.append_jsonl(run["math_summary_file"], {
+            key: math_result[key] for key in (
+                "id", "model_id", "prompt_index", "prompt_id", "prompt", "response", "grade", "error", "usage", "metrics", "response_cache_hit", "file"
+            )
+        })
+        run["totals"].add("math", math_result)
+
+async def write_comparison_results(run, comparison_results):
+    """Queue judgments for the results store, with their text exports and summary lines"""
+    writer = run["writer"]
+    await writer.add_judgments(run["run_id"], comparison_results)
+    for record in comparison_results:
+        if record["output_file"]:
+            details = {"usage": record["usage"], "metrics": record["metrics"]}
+            await writer.export(save_comparison_output, record["analyzed_model_id"], record["answering_model_id"],
+                                record["original_question"], record["correct_answer"], record["original_response"],
+                                record["formatted_prompt"], record["analysis_response"], run["timestamp"],
+                                record["prompt_index"], details)
+        await writer.append_jsonl(run["comparison_summary_file"], record)
+        run["totals"].add("compare", record)
+        if run["adaptive"] is not None:
+            run["adaptive"].add(record["analyzed_model_id"], record["prompt_index"], record["scores"])
+
+async def load_stored_results(run, prompt_data):
+    """What a resumed run already stored for a prompt: {model_id: math record} and {response id: {judge: scores}}
+
+    The stored results count towards the run's totals and adaptive ratings
+    as they are read back.
+    """
+    if not run["resumed"]:
+        return {}, {}
+    math_rows, judgment_rows = await asyncio.to_thread(prompt_results, run["run_id"], prompt_data["id"])
+    stored_math = {}
+    for row in math_rows:
+        record = stored_math_record(row)
+        stored_math[record["model_id"]] = record
+        run["totals"].add("math", record)
+    judged = {}
+    for row in judgment_rows:
+        record = stored_comparison_record(row)
+        judged.setdefault(record["math_response_id"], {})[record["answering_model_id"]] = record["scores"]
+        run["totals"].add("compare", record)
+        if run["adaptive"] is not None:
+            run["adaptive"].add(record["analyzed_model_id"], record["prompt_index"], record["scores"])
+    return stored_math, judged
+
+async def prompt_worker(run, prompts):
+    """Evaluate prompts from a shared iterator one at a time: each model's math call, then the judges of its response
+
+    The run's workers share the iterator, so only as many prompts as there
+    are workers are in flight, however large the dataset. Models the
+    adaptive stopper has settled are left out, and so are calls a resumed
+    run already stored.
+    """
+    stopper = run["adaptive"]
+    for prompt_data in prompts:
+        prompt_index = prompt_data["index"]
+        run["prompts_seen"] += 1
+        active = [model_id for model_id in MODEL_IDS if stopper is None or not stopper.is_stopped(model_id)]
+        if not active:
+            return
+        stored_math, judged = await load_stored_results(run, prompt_data)
+        for model_id in active:
+            run["prompts_evaluated"][model_id] = run["prompts_evaluated"].get(model_id, 0) + 1
+        
+        fresh = [model_id for model_id in active if model_id not in stored_math]
+        if run["batch"] and fresh:
+            new_results = await process_math_batch(run, fresh, prompt_data, prompt_index)
+            await write_math_results(run, new_results)
+            stored_math.update((math_result["model_id"], math_result) for math_result in new_results)
+        
+        async def answer_and_judge(model_id):
+            math_result = stored_math.get(model_id)
+            if math_result is None:
+                math_result = await process_math_request(run, model_id, prompt_data, prompt_index)
+                # Stored before judging so every judgment can point at its response
+                await write_math_results(run, [math_result])
+            if math_result["error"]:
+                # Nothing to judge, don't spend judge calls on it
+                return
+            print(f"🔀 Math complete → Starting comparisons for {model_id} - Prompt {prompt_index}")
+            await judge_response(run, math_result, judged.setdefault(math_result["id"], {}))
+        
+        outcomes = await asyncio.gather(*(answer_and_judge(model_id) for model_id in active), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                print(f"Error processing prompt {prompt_index}: {outcome}")
+        
+        if stopper is not None:
+            for model_id in active:
+                if not stopper.is_stopped(model_id) and stopper.check(model_id):
+                    print(f"🎯 {model_id} settled after {stopper.stopped[model_id]['prompts']} prompts ({stopper.stopped[model_id]['reason']})")
 
-async def async_pipeline_test():
-    """Run async pipeline test with immediate comparison processing"""
+def stored_math_record(row):
+    """Result record for a math response read back from the results store"""
+    prompt = {"id": row["prompt_id"], "index": row["prompt_index"], "question": row["prompt"], "answer": row["correct_answer"]}
+    return {
+        "id": row["id"],
+        "model_id": row["model_id"],
+        "prompt_index": row["prompt_index"],
+        "prompt_id": row["prompt_id"],
+        "prompt": prompt,
+        "prompt_text": row["prompt"],
+        "correct_answer": row["correct_answer"],
+        "response": row["response"],
+        "grade": row["grade"],
+        "error": row["error"],
+        "usage": row["usage"],
+        "metrics": row["metrics"],
+        "response_cache_hit": row["response_cache_hit"],
+        "file": None
+    }
+
+def stored_comparison_record(row):
+    """Result record for a judgment read back from the results store"""
+    record = {key: row[key] for key in (
+        "id", "math_response_id", "analyzed_model_id", "answering_model_id", "prompt_index", "prompt_id", "original_question",
+        "correct_answer", "original_response", "formatted_prompt", "analysis_response", "scores", "error", "usage", "metrics",
+        "response_cache_hit"
+    )}
+    record["output_file"] = None
+    return record
+
+async def async_pipeline_test(stream=False, prompt_cache=False, bypass_cache=False, batch=False, max_connections=100, rate_limit=True, hedge=False, export_text=False, resume=None, adaptive=False, judges=JUDGE_PANEL, exclude_self=JUDGE_EXCLUDE_SELF, graded_judge_rate=GRADER_JUDGE_RATE, prompt_source=None, prompt_window=32):
+    """Run async pipeline test with immediate comparison processing
+
+    Prompts are streamed from the dataset prompt_source describes (the
+    load_prompts arguments, see logic/prompt_dataset.py), with prompt_window
+    prompts in flight at a time.
+
+    With resume set to the run_id of an interrupted run, only the math calls
+    and judgments that run has not stored successfully are made, and the
+    results are added to that run. With adaptive, prompts are evaluated in a
+    shuffled order and each analyzed model stops once its rating intervals
+    are settled (see logic/adaptive.py). judges and exclude_self choose
+    which judges rate each response (see logic/judge_panel.py); of the
+    responses the local grader is sure of, only a graded_judge_rate share is
+    judged (see logic/answer_grader.py).
+    """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    prompt_source = prompt_source or dataset_options()
+    if resume is not None:
+        stored_run = get_run(resume)
+        if stored_run is None or stored_run["harness"] != "async":
+            print(f"No async pipeline run {resume} in {RESULTS_DB}")
+            return
+        timestamp = stored_run["timestamp"]
     
     print("🚀 Starting Async Pipeline Test")
     print(f"Available math models: {len(MODEL_IDS)}")
-    print(f"Available compare models: {len(MODEL_IDS)}")
-    print(f"Test prompts: {len(TEST_PROMPTS)}")
+    panel = JudgePanel(judges, exclude_self=exclude_self)
+    print(f"Judges: {panel.describe()}")
+    if graded_judge_rate < 1:
+        print(f"Confidently graded responses judged: {graded_judge_rate:.0%}")
+    print(f"Prompts: {describe_dataset(**prompt_source)}")
+    if stream:
+        print("Streaming: on (recording time-to-first-token)")
+    if prompt_cache:
+        print("Prompt caching: on (system prompt and verified-answer prefix)")
+    if bypass_cache:
+        print("Response cache: bypassed")
+    if batch:
+        print("Batch mode: one request per prompt (math) and per response (compare)")
+    if not rate_limit:
+        print("Rate limiting: off")
+    if hedge:
+        print("Hedging: on (duplicate calls that run past their model's latency percentile)")
+    if adaptive:
+        print("Adaptive: on (models stop once their rating confidence intervals are settled)")
     print("-" * 60)
     
-    all_results = []
-    all_comparison_results = []
+    # Results are written as they arrive; the run only keeps running totals of them
+    totals = PerModelTotals()
     
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
-        # Create all math processing tasks
-        math_tasks = []
-        for model_id in MODEL_IDS:
-            for i, prompt_data in enumerate(TEST_PROMPTS, 1):
-                task = process_math_request(session, model_id, prompt_data, i, timestamp)
-                math_tasks.append(task)
-        
-        # Process math requests and immediately start comparisons as they complete
-        async def process_pipeline():
-            comparison_tasks = []
-            
-            # Process math requests as they complete
-            for completed_task in asyncio.as_completed(math_tasks):
-                try:
-                    # Get the completed math result
-                    math_result = await completed_task
-                    all_results.append(math_result)
-                    
-                    # IMMEDIATELY start comparison processing for this result
-                    comparison_task = process_comparison_for_response(session, math_result, timestamp, MODEL_IDS)
-                    comparison_tasks.append(comparison_task)
-                    
-                    print(f"🔀 Math complete → Starting comparisons for {math_result[0]} - Prompt {math_result[1]}")
-                    
-                except Exception as e:
-                    print(f"Error in math processing: {e}")
-            
-            # Wait for all comparison tasks to complete
-            print(f"\n⏳ Waiting for all {len(comparison_tasks)} comparison batches to complete...")
-            comparison_results = await asyncio.gather(*comparison_tasks, return_exceptions=True)
+    # One JSON record per line, appended as results come in (a resumed run adds to its files)
+    summary_file = f"../math_output/async_summary_{timestamp}.jsonl"
+    comparison_summary_file = f"../compare_output/async_comparison_summary_{timestamp}.jsonl"
+    
+    # Only send flags that are switched on so the runtimes keep their own defaults otherwise
+    payload_options = {}
+    if prompt_cache:
+        payload_options["cache_prompt"] = True
+    if bypass_cache:
+        payload_options["bypass_cache"] = True
+    
+    # One limiter for both stages, so a model's math and judge calls share its quota
+    rate_limiter = ModelRateLimiter(MODEL_RATE_LIMITS, DEFAULT_RATE_LIMITS) if rate_limit else None
+    
+    if resume is not None:
+        run_id = resume
+        stored_math_count, stored_judgment_count = result_counts(run_id)
+        print(f"📒 Resuming run {run_id}: {stored_math_count} math responses and "
+              f"{stored_judgment_count} judgments already stored")
+    else:
+        run_id = start_run("async", timestamp, {
+            "stream": stream, "batch": batch, "prompt_cache": prompt_cache, "bypass_cache": bypass_cache,
+            "rate_limit": rate_limit, "hedge": hedge, "export_text": export_text, "adaptive": adaptive,
+            "judges": judges, "exclude_self": exclude_self, "graded_judge_rate": graded_judge_rate,
+            "prompt_source": prompt_source,
+        })
+        print(f"📒 Run {run_id} (if interrupted, continue it with --resume {run_id})")
+    
+    # A resumed run reads back what it stored prompt by prompt, so its adaptive ratings build up again in the same order
+    stopper = AdaptiveStopper(MODEL_IDS) if adaptive else None
+    
+    setup_tracing("async_pipeline")
+    with span("async_pipeline_test", stream=stream, batch=batch, prompt_cache=prompt_cache, resume=resume):
+        connector = aiohttp.TCPConnector(limit=max_connections)
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+            # Shared state for every request in this run
+            run = {
+                "session": session,
+                "run_id": run_id,
+                "timestamp": timestamp,
+                "export_text": export_text,
+                "stream": stream,
+                "batch": batch,
+                "prompt_cache": prompt_cache,
+                "payload_options": payload_options,
+                "stream_timings": {},
+                "writer": ResultWriter().start(),
+                "math_summary_file": summary_file,
+                "comparison_summary_file": comparison_summary_file,
+                "totals": totals,
+                "resumed": resume is not None,
+                "adaptive": stopper,
+                "judge_panel": panel,
+                "graded_judge_rate": graded_judge_rate,
+                # Judge calls made in this session, the responses they rated and those left to the local grader
+                "judging": {"calls": 0, "responses": 0, "skipped": 0},
+                # Prompts taken from the dataset, and those each model answered (including before a resume)
+                "prompts_seen": 0,
+                "prompts_evaluated": {},
+                "rate_limiter": rate_limiter,
+                # Math and judge calls have different latencies, so each stage tracks its own
+                "hedgers": {"math": Hedger(), "compare": Hedger()} if hedge else {},
+            }
             
-            # Flatten results
-            for batch in comparison_results:
-                if not isinstance(batch, Exception):
-                    all_comparison_results.extend([r for r in batch if not isinstance(r, Exception)])
+            prompts = load_prompts(**prompt_source)
+            if adaptive:
+                # A seeded shuffle, so the prompts seen so far are a fair sample and a resumed run keeps the order
+                prompts = shuffled(prompts, ADAPTIVE_SHUFFLE_BUFFER, ADAPTIVE_SEED)
             
-            return all_comparison_results
-        
-        # Run the pipeline
-        await process_pipeline()
+            # Run the pipeline; whatever is still queued is written even if it is interrupted
+            try:
+                await asyncio.gather(*(prompt_worker(run, prompts) for _ in range(ADAPTIVE_WINDOW if adaptive else prompt_window)))
+            finally:
+                await run["writer"].close()
+            runtime_stats = await fetch_runtime_stats(session)
     
-    # Save summary
-    summary_file = f"../math_output/async_summary_{timestamp}.json"
-    with open(summary_file, "w") as f:
-        json.dump([{
-            "model_id": r[0],
-            "prompt_index": r[1],
-            "prompt": r[2],
-            "response": r[3],
-            "file": r[4]
-        } for r in all_results], f, indent=2)
+    finish_run(run_id)
     
-    comparison_summary_file = f"../compare_output/async_comparison_summary_{timestamp}.json"
-    with open(comparison_summary_file, "w") as f:
-        json.dump(all_comparison_results, f, indent=2)
+    # The output folders may not exist yet if every call failed
+    os.makedirs("../math_output", exist_ok=True)
+    os.makedirs("../compare_output", exist_ok=True)
     
+    writes = run["writer"].stats
     print(f"\n🏁 Async Pipeline completed!")
-    print(f"Math responses processed: {len(all_results)}")
-    print(f"Comparison responses processed: {len(all_comparison_results)}")
+    print(f"Math responses processed: {totals.counts['math']}")
+    print(f"Comparison responses processed: {totals.counts['compare']}")
+    print(f"Results stored as run {run_id} in {RESULTS_DB}")
+    print(f"💾 {writes['writes']} writes in {writes['batches']} batches (largest {writes['largest_batch']}), "
+          f"{writes['write_seconds']:.2f}s writing, {writes['blocked_seconds']:.2f}s waiting for the writer")
     print(f"Math summary saved to: {summary_file}")
     print(f"Comparison summary saved to: {comparison_summary_file}")
-    print(f"Results organized by prompt in math_output/ and compare_output/ folders")
+    if export_text:
+        print(f"Text exports organized by prompt in math_output/ and compare_output/ folders")
+    
+    per_model = totals.summary()
+    leaderboard = build_leaderboard(run_id)
+    adaptive_summary = []
+    if adaptive:
+        # Settled models leave prompts untaken; the rest of the dataset is only counted when that is cheap
+        total_prompts = dataset_size(**prompt_source)
+        evaluated = run["prompts_evaluated"]
+        rows = {row["model_id"]: row for row in stopper.summary()}
+        for model_id in MODEL_IDS:
+            row = rows.get(model_id, {"model_id": model_id, "prompts_rated": 0, "stopped": False, "stop_reason": None,
+                                      "stopped_after_prompts": None, "intervals": None})
+            done = evaluated.get(model_id, 0)
+            row["prompts_evaluated"] = done
+            row["prompts_seen"] = run["prompts_seen"]
+            row["prompts_total"] = total_prompts
+            row["math_calls_saved"] = total_prompts - done if total_prompts is not None else None
+            row["judge_calls_saved"] = (total_prompts - done) * panel.max_judges(model_id) if total_prompts is not None else None
+            adaptive_summary.append(row)
+    judging = dict(run["judging"], mode=panel.mode, exclude_self=panel.exclude_self, escalations=panel.escalations)
+    # What the same responses would have cost with every judge rating each one
+    judging["all_judges_calls"] = (judging["responses"] + judging["skipped"]) * len(panel.judge_ids)
+    judging["calls_per_response"] = judging["calls"] / judging["responses"] if judging["responses"] else None
+    run_summary_file = f"../math_output/async_run_summary_{timestamp}.json"
+    with open(run_summary_file, "w") as f:
+        json.dump({
+            "run_id": run_id,
+            "timestamp": timestamp,
+            "math_summary": summary_file,
+            "comparison_summary": comparison_summary_file,
+            "per_model": per_model,
+            "rate_limit_waits": rate_limiter.summary() if rate_limiter else [],
+            "circuits": circuit_states(),
+            "hedging": [dict(row, stage=stage) for stage, hedger in run["hedgers"].items() for row in hedger.summary()],
+            "runtime_stats": runtime_stats,
+            "writer": writes,
+            "leaderboard": leaderboard,
+            "judging": judging,
+            "adaptive": adaptive_summary,
+        }, f, indent=2)
+    
+    if per_model:
+        print(f"\n🧮 Per model (input / output / cache read / cache write tokens, server time):")
+        for row in per_model:
+            server_p50 = f"{row['server_ms_p50']} ms" if row["server_ms_p50"] is not None else "n/a"
+            print(f"  [{row['stage']}] {row['model_id']}: {row['input_tokens']} / {row['output_tokens']} / "
+                  f"{row['cache_read_tokens']} / {row['cache_write_tokens']}, server p50 {server_p50} "
+                  f"({row['requests']} requests, {row['errors']} failed, {row['cycles']} cycles, {row['tool_calls']} tool calls, "
+                  f"{row['response_cache_hits']} served from response cache)")
+        requests = sum(row["requests"] for row in per_model)
+        hits = sum(row["response_cache_hits"] for row in per_model)
+        if requests:
+            print(f"Response cache hit rate: {hits}/{requests} ({hits / requests:.0%})")
+        failed = sum(row["errors"] for row in per_model)
+        if failed:
+            open_circuits = [model_id for model_id, state in circuit_states().items() if state["open"]]
+            print(f"⚠️  {failed} calls failed after retries" + (f", open circuits: {', '.join(open_circuits)}" if open_circuits else ""))
+        print(f"Run summary saved to: {run_summary_file}")
+    
+    if leaderboard["ratings"] or leaderboard["grader"]:
+        print_leaderboard(leaderboard)
+    
+    if judging["responses"] or judging["skipped"]:
+        calls_per_response = f"{judging['calls_per_response']:.2f}" if judging["calls_per_response"] is not None else "n/a"
+        print(f"\n⚖️  Judging ({panel.mode}): {judging['calls']} judge calls for {judging['responses']} responses "
+              f"({calls_per_response} per response, {judging['all_judges_calls']} with every judge on every response)")
+        if judging["skipped"]:
+            print(f"  {judging['skipped']} confidently graded responses were left to the local grader")
+        if panel.mode == "cascade":
+            print(f"  Escalations: " + ", ".join(f"{count} for {reason}" for reason, count in panel.escalations.items()))
+    
+    if adaptive:
+        print(f"\n🎯 Adaptive evaluation (each math call saved also saves up to {max(map(panel.max_judges, MODEL_IDS), default=0)} judge calls):")
+        for row in adaptive_summary:
+            status = f"settled after {row['stopped_after_prompts']} prompts by {row['stop_reason']}" if row["stopped"] else "not settled"
+            if row["prompts_total"] is not None:
+                print(f"  {row['model_id']}: {status}, {row['prompts_evaluated']}/{row['prompts_total']} prompts evaluated, "
+                      f"{row['math_calls_saved']} math calls saved")
+            else:
+                print(f"  {row['model_id']}: {status}, {row['prompts_evaluated']} of the {row['prompts_seen']} prompts read evaluated")
+    
+    if hedge:
+        print(f"\n🪃 Hedged calls per model:")
+        for stage, hedger in run["hedgers"].items():
+            for row in hedger.summary():
+                print(f"  [{stage}] {row['model_id']}: {row['hedged']}/{row['calls']} hedged ({row['hedge_rate']:.0%}), "
+                      f"{row['hedge_wins']} won by the hedge")
+    
+    if rate_limiter:
+        print(f"\n🚦 Time spent waiting for model quota:")
+        for row in rate_limiter.summary():
+            print(f"  {row['model_id']}: {row['wait_seconds']:.1f}s total, {row['max_wait_seconds']:.1f}s max ({row['requests']} requests)")
+    
+    if stream:
+        latency_summary = summarize_stream_timings(run["stream_timings"])
+        latency_file = f"../math_output/async_latency_{timestamp}.json"
+        with open(latency_file, "w") as f:
+            json.dump(latency_summary, f, indent=2)
+        
+        print(f"\n⏱️  Streaming latency per model:")
+        for row in latency_summary:
+            ttft = f"{row['ttft_p50']:.2f}s" if row["ttft_p50"] is not None else "n/a"
+            itl = f"{row['inter_token_mean'] * 1000:.0f}ms" if row["inter_token_mean"] is not None else "n/a"
+            print(f"  [{row['stage']}] {row['model_id']}: TTFT p50 {ttft}, inter-token {itl} ({row['requests']} requests)")
+        print(f"Latency summary saved to: {latency_file}")
+    
+    shutdown_tracing()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async math/compare pipeline")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true", help="stream responses and report time-to-first-token per model")
+    mode.add_argument("--batch", action="store_true", help="send one batch request per prompt and per response to judge")
+    parser.add_argument("--prompt-cache", action="store_true", help="mark system prompts and the verified-answer prefix as Bedrock cache points")
+    parser.add_argument("--max-connections", type=int, default=100, help="concurrent HTTP connections to the agents")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the runtimes' response cache for this run")
+    parser.add_argument("--adaptive", action="store_true", help="stop evaluating a model once its rating confidence intervals are settled (see logic/adaptive.py)")
+    parser.add_argument("--judges", choices=JUDGE_PANEL_MODES, default=JUDGE_PANEL, help="which judges rate each response: all of them, a fixed panel, or a cheap-first cascade (see logic/judge_panel.py)")
+    parser.add_argument("--graded-judge-rate", type=float, default=GRADER_JUDGE_RATE, help="share of confidently graded responses still sent to the judges (0 judges none of them)")
+    parser.add_argument("--exclude-self", action="store_true", default=JUDGE_EXCLUDE_SELF, help="never let a model judge its own responses")
+    parser.add_argument("--hedge", action="store_true", help="duplicate slow single calls after their model's p95 latency (see logic/hedging.py)")
+    parser.add_argument("--dataset", help="JSONL, CSV or Parquet prompt file, directory or glob (default: PROMPT_DATASET, else test_prompts.py)")
+    parser.add_argument("--shard", default=PROMPT_SHARD, metavar="I/N", help="only evaluate shard I of N of the dataset (split by prompt ID)")
+    parser.add_argument("--sample", type=float, default=PROMPT_SAMPLE, help="share of the dataset's prompts to evaluate")
+    parser.add_argument("--limit", type=int, default=PROMPT_LIMIT, help="stop after this many prompts (0: no limit)")
+    parser.add_argument("--prompt-window", type=int, default=32, help="prompts in flight at a time (--adaptive uses ADAPTIVE_WINDOW)")
+    parser.add_argument("--resume", type=int, metavar="RUN_ID", help="finish an interrupted run, skipping the calls it already stored (uses that run's options)")
+    parser.add_argument("--export-text", action="store_true", help="also write one text file per response and judgment to math_output/ and compare_output/")
+    parser.add_argument("--no-rate-limit", action="store_true", help="send requests without pacing them to the RPM/TPM limits in model_ids.py")
+    args = parser.parse_args()
+    
     print("Async Pipeline Test")
     print("Make sure both agents are running:")
     print("- Math agent on http://127.0.0.1:8080")
     print("- Compare models agent on http://127.0.0.1:8081")
     
+    options = dict(stream=args.stream, prompt_cache=args.prompt_cache, bypass_cache=args.no_cache, batch=args.batch, rate_limit=not args.no_rate_limit, hedge=args.hedge, export_text=args.export_text, adaptive=args.adaptive, judges=args.judges, exclude_self=args.exclude_self, graded_judge_rate=args.graded_judge_rate,
+                   prompt_source=dataset_options(args.dataset, args.shard, args.sample, args.limit))
+    if args.resume is not None:
+        # A resumed run keeps the options it was started with
+        stored_run = get_run(args.resume)
+        if stored_run is not None:
+            options.update(stored_run["options"])
+    
     try:
-        asyncio.run(async_pipeline_test())
+        asyncio.run(async_pipeline_test(max_connections=args.max_connections, prompt_window=args.prompt_window, resume=args.resume, **options))
     except KeyboardInterrupt:
         print("\nTest interrupted by user.")
     except Exception as e:
@@ -1,16 +1,24 @@
+import argparse
 import requests
 import json
 import os
-import glob
 from datetime import datetime
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model_ids import MODEL_IDS
+from agent_response import parse_agent_response
+from answer_grader import GRADER_JUDGE_RATE, should_judge
+from compare_prompt import format_compare_prompt
+from judge_panel import JUDGE_EXCLUDE_SELF, JUDGE_PANEL, JUDGE_PANEL_MODES, JudgePanel
+from judge_scores import parse_judge_scores
+from leaderboard import build_leaderboard, print_leaderboard
+from results_store import RESULTS_DB, add_judgments, finish_run, latest_run, math_responses, start_run
+from retry import AgentError, call_with_retry_sync, classify_error
+from text_export import save_comparison_output
 
 def call_compare_agent(prompt, model_id=None, system_prompt=None):
-    """Call the compare models agent with given parameters"""
+    """Call the compare models agent with given parameters; returns the response body or an AgentError"""
     url = "http://127.0.0.1:8081/invocations"  # Different port for compare_models
     headers = {"Content-Type": "application/json"}
     
@@ -20,160 +28,169 @@ def call_compare_agent(prompt, model_id=None, system_prompt=None):
     if system_prompt:
         payload["system_prompt"] = system_prompt
     
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+    def attempt():
+        try:
+            response = requests.post(url, headers=headers, json=payload, timeout=300)
+        except requests.exceptions.RequestException as e:
+            raise AgentError(classify_error(None, e), str(e))
+        if response.status_code != 200:
+            raise AgentError(classify_error(response.status_code, response.text),
+                             f"{response.status_code} - {response.text}", response.status_code)
         return response.text
-    except requests.exceptions.RequestException as e:
-        return f"Error: {str(e)}"
-
-def parse_output_file(file_path):
-    """Parse output file to extract original prompt, correct answer, and response"""
-    with open(file_path, 'r') as f:
-        content = f.read()
-    
-    lines = content.strip().split('\n')
-    original_prompt = ""
-    correct_answer = None
-    prompt_index = None
-    response = ""
-    
-    # Parse the structured format
-    for i, line in enumerate(lines):
-        if line.startswith("Prompt Index: "):
-            prompt_index = line[14:]  # Remove "Prompt Index: " prefix
-        elif line.startswith("Prompt: "):
-            original_prompt = line[8:]  # Remove "Prompt: " prefix
-        elif line.startswith("Correct Answer: "):
-            correct_answer = line[16:]  # Remove "Correct Answer: " prefix
-        elif line.startswith("Response: "):
-            # Get all lines after "Response: "
-            response = '\n'.join(lines[i:]).replace("Response: ", "", 1)
-            break
     
-    return original_prompt, correct_answer, response, prompt_index
+    return call_with_retry_sync(model_id, attempt)
 
-def save_comparison_output(analyzed_model_id, answering_model_id, original_question, correct_answer, original_response, formatted_prompt, analysis_response, timestamp, prompt_index):
-    """Save comparison output with both model identifications"""
-    # Clean model_ids for filename
-    clean_analyzed = analyzed_model_id.replace(".", "_").replace(":", "_")
-    clean_answering = answering_model_id.replace(".", "_").replace(":", "_")
-    
-    filename = f"comparison_analyzed_{clean_analyzed}_answered_{clean_answering}_{timestamp}.txt"
-    
-    # Create prompt-specific directory in compare_output folder
-    prompt_dir = os.path.join("..", "compare_output", f"prompt_{prompt_index}")
-    os.makedirs(prompt_dir, exist_ok=True)
-    
-    filepath = os.path.join(prompt_dir, filename)
-    with open(filepath, "w") as f:
-        f.write(f"Analyzed Model ID: {analyzed_model_id}\n")
-        f.write(f"Answering Model ID: {answering_model_id}\n")
-        f.write(f"Timestamp: {timestamp}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ORIGINAL QUESTION:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{original_question}\n")
-        if correct_answer:
-            f.write("-" * 70 + "\n")
-            f.write("CORRECT ANSWER:\n")
-            f.write("-" * 70 + "\n")
-            f.write(f"{correct_answer}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ORIGINAL RESPONSE (from analyzed model):\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{original_response}\n")
-        f.write("-" * 70 + "\n")
-        f.write("FORMATTED PROMPT SENT TO COMPARING MODEL:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{formatted_prompt}\n")
-        f.write("-" * 70 + "\n")
-        f.write("ANALYSIS RESPONSE:\n")
-        f.write("-" * 70 + "\n")
-        f.write(f"{analysis_response}\n\n")
-    
-    return filepath
+def test_compare_models(math_run_id=None, export_text=False, judges=JUDGE_PANEL, exclude_self=JUDGE_EXCLUDE_SELF, graded_judge_rate=GRADER_JUDGE_RATE):
+    """Have the judge panel rate the math responses of a stored run (the latest one by default)
 
-def test_compare_models():
-    """Test compare models by analyzing outputs from logic/outputs/ folder"""
+    Of the responses the local grader graded confidently, only a
+    graded_judge_rate share is judged (see logic/answer_grader.py).
+    """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # Get all output files from ../math_output/ prompt folders
-    output_files = glob.glob("../math_output/prompt_*/output_*.txt")
-    
-    if not output_files:
-        print("No output files found in ../math_output/ prompt folders")
+    if math_run_id is None:
+        latest = latest_run()
+        if latest is None:
+            print(f"No math responses found in {RESULTS_DB}, run test_math_agent.py first")
+            return []
+        math_run_id = latest["run_id"]
+    
+    # Failed math calls have nothing to judge
+    responses = math_responses(math_run_id, include_errors=False)
+    if not responses:
+        print(f"No math responses to analyze in run {math_run_id}")
         return []
     
     print("Testing compare models...")
-    print(f"Available models for analysis: {len(MODEL_IDS)}")
-    print(f"Output files to analyze: {len(output_files)}")
+    panel = JudgePanel(judges, exclude_self=exclude_self)
+    print(f"Judges: {panel.describe()}")
+    if graded_judge_rate < 1:
+        print(f"Confidently graded responses judged: {graded_judge_rate:.0%}")
+    print(f"Math responses to analyze: {len(responses)} (run {math_run_id})")
     print("-" * 50)
     
+    run_id = start_run("compare", timestamp, {
+        "math_run_id": math_run_id, "export_text": export_text, "judges": judges, "exclude_self": exclude_self,
+        "graded_judge_rate": graded_judge_rate,
+    })
     results = []
-    
-    for output_file in output_files:
-        # Extract the original model ID from filename
-        filename = os.path.basename(output_file)
-        # Parse filename like: output_eu_anthropic_claude-3-7-sonnet-20250219-v1_0_20250820_112823.txt
-        parts = filename.replace("output_", "").replace(".txt", "").split("_")
-        # Reconstruct the original model ID
-        analyzed_model_id = ".".join(parts[:-2]) + ":" + parts[-2]
+    skipped = 0
+    
+    for math_response in responses:
+        analyzed_model_id = math_response["model_id"]
+        original_question = math_response["prompt"]
+        correct_answer = math_response["correct_answer"]
+        original_response = math_response["response"]
+        prompt_index = math_response["prompt_index"]
         
-        print(f"\nAnalyzing output from model: {analyzed_model_id}")
-        print(f"File: {output_file}")
+        print(f"\nAnalyzing output from model: {analyzed_model_id} - Prompt {prompt_index}")
         
-        # Parse the original output file to extract question, correct answer, and response
-        original_question, correct_answer, original_response, prompt_index = parse_output_file(output_file)
+        grade = math_response["grade"]
+        if grade:
+            print(f"  Local grade: {grade['verdict']}" + (" (confident)" if grade["confident"] else ""))
+        if not should_judge(grade, analyzed_model_id, math_response["prompt_id"] or prompt_index, graded_judge_rate):
+            print("  Skipping the judges, the local grade is confident")
+            skipped += 1
+            continue
         
         # Format the prompt exactly as specified in the workflow
-        formatted_prompt = f"User requested answer for following problem: {original_question}. AI-Agent responded like this: {original_response}"
+        _, formatted_prompt = format_compare_prompt(original_question, original_response, correct_answer)
         
-        # Add correct answer information if available
-        if correct_answer:
-            formatted_prompt += f". This is the answer we know is correct: {correct_answer}. Please compare the given answer to the verified one and make sure to adjust your ratings accordingly."
-        
-        # Test with each model for comparison
-        for answering_model_id in MODEL_IDS:
+        # Judge with the panel; a cascade picks each next judge from the ratings so far
+        response_results = []
+        rated = {}
+        for answering_model_id in panel.iter_judges(analyzed_model_id, rated):
             print(f"  Using {answering_model_id} for analysis...")
             print(f"  Original question: {original_question}")
             if correct_answer:
                 print(f"  Correct answer available: {correct_answer}")
             
-            analysis_response = call_compare_agent(formatted_prompt, answering_model_id)
-            filepath = save_comparison_output(
-                analyzed_model_id, answering_model_id, original_question, 
-                correct_answer, original_response, formatted_prompt, analysis_response, timestamp, prompt_index
-            )
+            raw_response = call_compare_agent(formatted_prompt, answering_model_id)
+            if isinstance(raw_response, AgentError):
+                print(f"    ❌ {raw_response}")
+                rated[answering_model_id] = None
+                response_results.append({
+                    "math_response_id": math_response["id"],
+                    "analyzed_model_id": analyzed_model_id,
+                    "answering_model_id": answering_model_id,
+                    "prompt_index": prompt_index,
+                    "prompt_id": math_response["prompt_id"],
+                    "original_question": original_question,
+                    "formatted_prompt": formatted_prompt,
+                    "error": raw_response.to_dict(),
+                    "output_file": None
+                })
+                continue
+            analysis_response, details = parse_agent_response(raw_response)
+            scores = parse_judge_scores(analysis_response)
+            rated[answering_model_id] = scores
+            filepath = None
+            if export_text:
+                filepath = save_comparison_output(
+                    analyzed_model_id, answering_model_id, original_question, 
+                    correct_answer, original_response, formatted_prompt, analysis_response, timestamp, prompt_index, details
+                )
             
-            results.append({
+            response_results.append({
+                "math_response_id": math_response["id"],
                 "analyzed_model_id": analyzed_model_id,
                 "answering_model_id": answering_model_id,
                 "prompt_index": prompt_index,
+                "prompt_id": math_response["prompt_id"],
                 "original_question": original_question,
                 "correct_answer": correct_answer,
                 "original_response": original_response,
                 "formatted_prompt": formatted_prompt,
                 "analysis_response": analysis_response,
-                "original_file": output_file,
+                "scores": scores,
+                "usage": details.get("usage"),
+                "metrics": details.get("metrics"),
                 "output_file": filepath
             })
-            print(f"    Saved to: {filepath}")
+            print(f"    Saved to: {filepath}" if filepath else "    Stored")
+        
+        # One transaction per judged response
+        for record, record_id in zip(response_results, add_judgments(run_id, response_results)):
+            record["id"] = record_id
+        results.extend(response_results)
+    
+    finish_run(run_id)
+    
+    judged_responses = len(responses) - skipped
+    if results:
+        print(f"\n⚖️  {len(results)} judge calls for {judged_responses} responses ({len(results) / judged_responses:.2f} per response, "
+              f"{len(responses) * len(panel.judge_ids)} with every judge on every response)")
+    if skipped:
+        print(f"⏭️  {skipped} confidently graded responses were not sent to the judges")
     
     # Save summary
+    os.makedirs("../compare_output", exist_ok=True)
     summary_file = f"../compare_output/comparison_summary_{timestamp}.json"
     with open(summary_file, "w") as f:
         json.dump(results, f, indent=2)
     
-    print(f"\nCompleted! Summary saved to: {summary_file}")
+    print(f"\nCompleted! Results stored as run {run_id} in {RESULTS_DB}")
+    print(f"Summary saved to: {summary_file}")
+    
+    leaderboard = build_leaderboard(run_id)
+    if leaderboard["ratings"] or leaderboard["grader"]:
+        print_leaderboard(leaderboard)
     return results
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare models harness")
+    parser.add_argument("--run-id", type=int, help="judge the math responses of this run (default: the latest run)")
+    parser.add_argument("--export-text", action="store_true", help="also write one text file per judgment to compare_output/")
+    parser.add_argument("--judges", choices=JUDGE_PANEL_MODES, default=JUDGE_PANEL, help="which judges rate each response: all of them, a fixed panel, or a cheap-first cascade (see logic/judge_panel.py)")
+    parser.add_argument("--graded-judge-rate", type=float, default=GRADER_JUDGE_RATE, help="share of confidently graded responses still sent to the judges (0 judges none of them)")
+    parser.add_argument("--exclude-self", action="store_true", default=JUDGE_EXCLUDE_SELF, help="never let a model judge its own responses")
+    args = parser.parse_args()
+    
     print("Compare Models Test")
     print("Make sure your compare_models agent is running on http://127.0.0.1:8081")
     
     try:
-        results = test_compare_models()
+        results = test_compare_models(math_run_id=args.run_id, export_text=args.export_text, judges=args.judges, exclude_self=args.exclude_self, graded_judge_rate=args.graded_judge_rate)
         print(f"\nTested {len(results)} combinations successfully!")
     except KeyboardInterrupt:
         print("\nTest interrupted by user.")
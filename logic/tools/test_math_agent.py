@@ -1,3 +1,4 @@
+import argparse
 import requests
 import json
 import os
@@ -7,11 +8,16 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from agent_response import parse_agent_response
+from answer_grader import grade_answer
 from model_ids import MODEL_IDS
-from test_prompts import TEST_PROMPTS
+from results_store import RESULTS_DB, add_math_responses, finish_run, start_run
+from retry import AgentError, call_with_retry_sync, classify_error
+from prompt_dataset import PROMPT_LIMIT, PROMPT_SAMPLE, PROMPT_SHARD, dataset_options, describe_dataset, load_prompts
+from text_export import save_math_output
 
 def call_agent(prompt, model_id=None):
-    """Call the local agent with given parameters"""
+    """Call the local agent with given parameters; returns the response body or an AgentError"""
     url = "http://127.0.0.1:8080/invocations"
     headers = {"Content-Type": "application/json"}
     
@@ -19,92 +25,112 @@ def call_agent(prompt, model_id=None):
     if model_id:
         payload["model_id"] = model_id
     
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+    def attempt():
+        try:
+            response = requests.post(url, headers=headers, json=payload, timeout=300)
+        except requests.exceptions.RequestException as e:
+            raise AgentError(classify_error(None, e), str(e))
+        if response.status_code != 200:
+            raise AgentError(classify_error(response.status_code, response.text),
+                             f"{response.status_code} - {response.text}", response.status_code)
         return response.text
-    except requests.exceptions.RequestException as e:
-        return f"Error: {str(e)}"
-
-def save_output(model_id, prompt_data, response, timestamp, prompt_index):
-    """Save output to a file with model ID identification"""
-    # Clean model_id for filename (replace dots and colons)
-    clean_model_id = model_id.replace(".", "_").replace(":", "_")
-    filename = f"output_{clean_model_id}_{timestamp}.txt"
-    
-    # Create prompt-specific directory in math_output folder
-    prompt_dir = os.path.join("..", "math_output", f"prompt_{prompt_index}")
-    os.makedirs(prompt_dir, exist_ok=True)
-    
-    # Handle both string and dict prompt formats
-    if isinstance(prompt_data, dict):
-        prompt_text = prompt_data["question"]
-        correct_answer = prompt_data.get("answer")
-    else:
-        prompt_text = prompt_data
-        correct_answer = None
     
-    filepath = os.path.join(prompt_dir, filename)
-    with open(filepath, "w") as f:
-        f.write(f"Model ID: {model_id}\n")
-        f.write(f"Timestamp: {timestamp}\n")
-        f.write(f"Prompt Index: {prompt_index}\n")
-        f.write(f"Prompt: {prompt_text}\n")
-        if correct_answer:
-            f.write(f"Correct Answer: {correct_answer}\n")
-        f.write("-" * 50 + "\n")
-        f.write(f"Response: {response}\n\n")
-    
-    return filepath
+    return call_with_retry_sync(model_id, attempt)
+
+def test_all_models(export_text=False, prompt_source=None):
+    """Test all models with all prompts and store the responses (and text files with export_text)
 
-def test_all_models():
-    """Test all models with all prompts and save outputs"""
+    prompt_source holds the load_prompts arguments (see
+    logic/prompt_dataset.py); the dataset is read again for each model.
+    """
+    prompt_source = prompt_source or dataset_options()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     print("Testing models...")
     print(f"Available models: {len(MODEL_IDS)}")
-    print(f"Test prompts: {len(TEST_PROMPTS)}")
+    print(f"Prompts: {describe_dataset(**prompt_source)}")
     print("-" * 50)
     
+    run_id = start_run("math", timestamp, {"export_text": export_text, "prompt_source": prompt_source})
     results = []
     
     for model_id in MODEL_IDS:
         print(f"\nTesting model: {model_id}")
-        for i, prompt_data in enumerate(TEST_PROMPTS, 1):
-            # Handle both string and dict prompt formats
-            if isinstance(prompt_data, dict):
-                prompt_text = prompt_data["question"]
-                display_prompt = prompt_text
-            else:
-                prompt_text = prompt_data
-                display_prompt = prompt_text
+        model_results = []
+        for prompt_data in load_prompts(**prompt_source):
+            # Prompts keep their dataset row number, so shards of a dataset never reuse an index
+            i = prompt_data["index"]
+            prompt_text = prompt_data["question"]
+            correct_answer = prompt_data["answer"]
             
-            print(f"  Prompt {i}: {display_prompt}")
-            response = call_agent(prompt_text, model_id)
-            filepath = save_output(model_id, prompt_data, response, timestamp, i)
-            results.append({
+            print(f"  Prompt {i}: {prompt_text}")
+            raw_response = call_agent(prompt_text, model_id)
+            if isinstance(raw_response, AgentError):
+                # Failed calls are not written to math_output, so they are never sent to the judges
+                print(f"    ❌ {raw_response}")
+                model_results.append({
+                    "model_id": model_id,
+                    "prompt_index": i,
+                    "prompt_id": prompt_data["id"],
+                    "prompt": prompt_data,
+                    "prompt_text": prompt_text,
+                    "correct_answer": correct_answer,
+                    "response": None,
+                    "error": raw_response.to_dict(),
+                    "file": None
+                })
+                continue
+            response, details = parse_agent_response(raw_response)
+            grade = grade_answer(response, correct_answer, prompt_text)
+            filepath = save_math_output(model_id, prompt_data, response, timestamp, i, details)[0] if export_text else None
+            model_results.append({
                 "model_id": model_id,
                 "prompt_index": i,
+                "prompt_id": prompt_data["id"],
                 "prompt": prompt_data,
+                "prompt_text": prompt_text,
+                "correct_answer": correct_answer,
                 "response": response,
+                "grade": grade,
+                "usage": details.get("usage"),
+                "metrics": details.get("metrics"),
                 "file": filepath
             })
-            print(f"    Saved to: {filepath}")
+            if grade:
+                print(f"    Local grade: {grade['verdict']}" + (" (confident)" if grade["confident"] else ""))
+            print(f"    Saved to: {filepath}" if filepath else "    Stored")
+        
+        # One transaction per model
+        for record, record_id in zip(model_results, add_math_responses(run_id, model_results)):
+            record["id"] = record_id
+        results.extend(model_results)
+    
+    finish_run(run_id)
     
     # Save summary
+    os.makedirs("../math_output", exist_ok=True)
     summary_file = f"../math_output/summary_{timestamp}.json"
     with open(summary_file, "w") as f:
         json.dump(results, f, indent=2)
     
-    print(f"\nCompleted! Summary saved to: {summary_file}")
+    print(f"\nCompleted! Results stored as run {run_id} in {RESULTS_DB}")
+    print(f"Summary saved to: {summary_file}")
     return results
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Math agent harness")
+    parser.add_argument("--export-text", action="store_true", help="also write one text file per response to math_output/")
+    parser.add_argument("--dataset", help="JSONL, CSV or Parquet prompt file, directory or glob (default: PROMPT_DATASET, else test_prompts.py)")
+    parser.add_argument("--shard", default=PROMPT_SHARD, metavar="I/N", help="only evaluate shard I of N of the dataset (split by prompt ID)")
+    parser.add_argument("--sample", type=float, default=PROMPT_SAMPLE, help="share of the dataset's prompts to evaluate")
+    parser.add_argument("--limit", type=int, default=PROMPT_LIMIT, help="stop after this many prompts (0: no limit)")
+    args = parser.parse_args()
+    
     print("Model Comparison Test")
     print("Make sure your agent is running on http://127.0.0.1:8080")
     
     try:
-        results = test_all_models()
+        results = test_all_models(export_text=args.export_text, prompt_source=dataset_options(args.dataset, args.shard, args.sample, args.limit))
         print(f"\nTested {len(results)} combinations successfully!")
     except KeyboardInterrupt:
         print("\nTest interrupted by user.")
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+
+# Client-side spans for the harnesses. TRACING=json appends finished spans to
+# TRACE_FILE as JSON lines, TRACING=otlp sends them to the collector at
+# OTEL_EXPORTER_OTLP_ENDPOINT. OpenTelemetry is optional here: without it (or
+# with TRACING unset) every span is a no-op and no trace context is sent.
+TRACING = os.getenv("TRACING", "off").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "../traces.jsonl")
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+except ImportError:
+    trace = None
+    SpanExporter = object
+
+_provider = None
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Span exporter that appends one JSON object per finished span to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        with self._lock, open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(json.loads(span.to_json())) + "\n")
+        return SpanExportResult.SUCCESS
+
+def setup_tracing(service_name):
+    """Install a tracer provider for the configured exporter, if any"""
+    global _provider
+    if trace is None or TRACING not in ("json", "otlp") or _provider is not None:
+        return _provider is not None
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if TRACING == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("TRACING=otlp needs opentelemetry-exporter-otlp-proto-http, tracing disabled")
+            return False
+        exporter = OTLPSpanExporter()
+    else:
+        exporter = JsonLinesSpanExporter(TRACE_FILE)
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    return True
+
+def shutdown_tracing():
+    """Flush spans that are still buffered"""
+    if _provider is not None:
+        _provider.force_flush()
+
+@contextmanager
+def span(name, **attributes):
+    """Span around a block, or nothing when tracing is unavailable"""
+    if trace is None:
+        yield None
+        return
+    with trace.get_tracer("model-comparison").start_as_current_span(name) as current:
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, value)
+        yield current
+
+def inject_trace_context(payload):
+    """Add the current trace context to a runtime payload so its spans join this trace"""
+    if trace is None or _provider is None:
+        return payload
+    carrier = {}
+    propagate.inject(carrier)
+    if carrier:
+        payload["trace_context"] = carrier
+    return payload
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Durable work queue for spreading a run over several worker processes, on one
+# machine or on several that share a filesystem. A unit is one stage of one
+# model on one prompt: "math" units ask a model a prompt, "judge" units have
+# the judge panel rate one stored math response. Workers claim pending units
+# with a lease of WORK_QUEUE_LEASE_SECONDS that they renew while working, so a
+# worker that dies leaves units whose lease runs out and that any other worker
+# can claim again. A unit is given up after WORK_QUEUE_MAX_ATTEMPTS claims.
+#
+# The queue has its own SQLite file, so claiming units does not wait for
+# result writes. It uses a rollback journal rather than WAL, which SQLite
+# cannot share between machines; WORK_QUEUE_JOURNAL=WAL is faster when every
+# worker runs on one machine.
+WORK_QUEUE_DB = os.getenv("WORK_QUEUE_DB", "../work_queue.db")
+WORK_QUEUE_JOURNAL = os.getenv("WORK_QUEUE_JOURNAL", "DELETE")
+WORK_QUEUE_LEASE_SECONDS = float(os.getenv("WORK_QUEUE_LEASE_SECONDS", "300"))
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+# How long a write waits for another process to release the database
+WORK_QUEUE_BUSY_SECONDS = float(os.getenv("WORK_QUEUE_BUSY_SECONDS", "60"))
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS work_units ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " run_id INTEGER,"
+    " stage TEXT,"
+    " model_id TEXT,"
+    " subject TEXT,"
+    " payload TEXT,"
+    " status TEXT,"
+    " worker TEXT,"
+    " lease_expires REAL,"
+    " attempts INTEGER,"
+    " error TEXT,"
+    " created REAL,"
+    " updated REAL,"
+    " UNIQUE (run_id, stage, model_id, subject))",
+    "CREATE INDEX IF NOT EXISTS work_units_status ON work_units (run_id, status, stage, id)",
+    "CREATE INDEX IF NOT EXISTS work_units_worker ON work_units (worker, status)",
+)
+
+# Unit states; "leased" units whose lease ran out count as pending
+UNIT_STATUSES = ("pending", "leased", "done", "failed")
+
+_connection = None
+_lock = threading.Lock()
+
+def _connect():
+    """Open the queue database on first use (caller holds the lock)"""
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(os.path.abspath(WORK_QUEUE_DB)), exist_ok=True)
+        # Transactions are opened explicitly, so claims can lock the database before reading
+        _connection = sqlite3.connect(WORK_QUEUE_DB, timeout=WORK_QUEUE_BUSY_SECONDS, check_same_thread=False, isolation_level=None)
+        _connection.row_factory = sqlite3.Row
+        _connection.execute(f"PRAGMA journal_mode={WORK_QUEUE_JOURNAL}")
+        for statement in SCHEMA:
+            _connection.execute(statement)
+    return _connection
+
+def _unit(row):
+    unit = dict(row)
+    unit["payload"] = json.loads(unit["payload"]) if unit["payload"] is not None else None
+    return unit
+
+def enqueue(run_id, units):
+    """Add (stage, model_id, subject, payload) units to a run's queue; returns how many were new
+
+    subject identifies what the unit works on (a prompt ID for math units,
+    a math response ID for judge units). A unit the run already has is
+    left as it is, so enqueueing twice is harmless.
+    """
+    now = time.time()
+    rows = [(run_id, stage, model_id, str(subject), json.dumps(payload), now, now) for stage, model_id, subject, payload in units]
+    with _lock:
+        connection = _connect()
+        before = connection.total_changes
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR IGNORE INTO work_units (run_id, stage, model_id, subject, payload, status, attempts, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?)",
+                rows,
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return connection.total_changes - before
+
+def claim(run_id, worker, limit=1, lease_seconds=WORK_QUEUE_LEASE_SECONDS, max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+    """Lease up to limit units of a run to worker, judge units first; returns them as dicts
+
+    Units whose lease ran out are claimed again, unless they already used
+    up their attempts, in which case they are marked failed.
+    """
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        # Locks the database up front, so two workers never read the same pending units
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE work_units SET status = 'failed', error = ?, updated = ?"
+                " WHERE run_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (json.dumps({"type": "lease_expired", "message": f"lease expired after {max_attempts} attempts"}), now, run_id, now, max_attempts),
+            )
+            # Judging what is already answered first keeps the run from piling up unjudged responses
+            rows = connection.execute(
+                "SELECT * FROM work_units WHERE run_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))"
+                " ORDER BY stage = 'math', id LIMIT ?",
+                (run_id, now, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE work_units SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                [(worker, now + lease_seconds, now, row["id"]) for row in rows],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+    units = [_unit(row) for row in rows]
+    for unit in units:
+        unit.update(status="leased", worker=worker, attempts=unit["attempts"] + 1)
+    return units
+
+def renew(worker, lease_seconds=WORK_QUEUE_LEASE_SECONDS):
+    """Extend the leases of every unit worker holds; returns how many it still holds"""
+    now = time.time()
+    with _lock:
+        cursor = _connect().execute(
+            "UPDATE work_units SET lease_expires = ?, updated = ? WHERE worker = ? AND status = 'leased'",
+            (now + lease_seconds, now, worker),
+        )
+        return cursor.rowcount
+
+def complete(unit_id, worker):
+    """Mark a unit done; False if worker had lost its lease (the unit may then run twice)"""
+    with _lock:
+        cursor = _connect().execute(
+            "UPDATE work_units SET status = 'done', error = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time(), unit_id, worker),
+        )
+        return cursor.rowcount == 1
+
+def fail(unit_id, worker, error, max_attempts=WORK_QUEUE_MAX_ATTEMPTS):
+    """Give a failed unit back to the queue, or mark it failed once it used up its attempts"""
+    with _lock:
+        _connect().execute(
+            "UPDATE work_units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+            " worker = NULL, lease_expires = NULL, error = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (max_attempts, json.dumps(error), time.time(), unit_id, worker),
+        )
+
+def queue_counts(run_id):
+    """{stage: {status: units}} of a run; leased units whose lease ran out count as pending"""
+    now = time.time()
+    with _lock:
+        rows = _connect().execute(
+            "SELECT stage, CASE WHEN status = 'leased' AND lease_expires < ? THEN 'pending' ELSE status END AS state, COUNT(*)"
+            " FROM work_units WHERE run_id = ? GROUP BY stage, state",
+            (now, run_id),
+        ).fetchall()
+    counts = {}
+    for stage, state, count in rows:
+        counts.setdefault(stage, dict.fromkeys(UNIT_STATUSES, 0))[state] = count
+    return counts
+
+def failed_units(run_id):
+    """Units of a run that were given up, with their last error"""
+    with _lock:
+        rows = _connect().execute("SELECT * FROM work_units WHERE run_id = ? AND status = 'failed' ORDER BY id", (run_id,)).fetchall()
+    units = [_unit(row) for row in rows]
+    for unit in units:
+        unit["error"] = json.loads(unit["error"]) if unit["error"] is not None else None
+    return units
@@ -1,22 +1,130 @@
+import time
+
+_import_started = time.perf_counter()
+
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
+from bedrock_agentcore.runtime.models import PingStatus
+import asyncio
 
 app = BedrockAgentCoreApp()
 
-from tools.get_agent import get_agent
+from tools.batch import run_batch
+from tools.get_agent import get_agent, get_pool_stats, warm_model
+from tools.concurrency import get_concurrency_stats, request_slot
+from tools.metrics import invocation_metrics, usage_summary
+from tools.response_cache import RESPONSE_CACHE_ENABLED, cache_key, get_cache_stats, get_cached_response, put_cached_response
+from tools.sessions import load_history, save_history
+from tools.tracing import current_context, entrypoint_span, setup_tracing, tracer
+from tools.warmup import get_startup_metrics, is_ready, record_startup_metric, start_warmup
 
-agent = None
+# strands and boto3 are imported lazily, by the warm-up thread or the first request
+record_startup_metric("runtime_import_seconds", time.perf_counter() - _import_started)
+# Before warm-up, so strands picks up the tracer provider when it creates its tracer
+setup_tracing("math_agent2")
+start_warmup(warm_model)
 
-@app.entrypoint
-def strands_agent_bedrock(payload):
-    """
-    Invoke the agent with a payload
-    """
+@app.ping
+def ping():
+    """Report busy until the configured models have been warmed up"""
+    return PingStatus.HEALTHY if is_ready() else PingStatus.HEALTHY_BUSY
+
+def runtime_stats():
+    """Model pool, concurrency, response cache and startup counters of this runtime"""
+    return {
+        "model_pool": get_pool_stats(),
+        "concurrency": get_concurrency_stats(),
+        "response_cache": get_cache_stats(),
+        "startup": get_startup_metrics(),
+    }
+
+async def stream_response(agent, user_input, session_id=None, response_key=None, cached_text=None, started=None, trace_context=None):
+    """Yield text deltas from the agent as they are generated, then one event with usage and metrics"""
+    started = started or time.perf_counter()
+    # The entrypoint span has ended by the time the runtime drains the stream
+    with tracer.start_as_current_span("stream_response", context=trace_context):
+        if cached_text is not None:
+            yield cached_text
+            yield {"usage": usage_summary(None), "metrics": invocation_metrics(None, time.perf_counter() - started), "cache_hit": True}
+            return
+        model_id = agent.model.get_config()["model_id"]
+        result = None
+        async with request_slot(model_id):
+            async for event in agent.stream_async(user_input):
+                if "data" in event:
+                    yield event["data"]
+                if "result" in event:
+                    result = event["result"]
+        if session_id:
+            save_history(session_id, agent.messages)
+        if response_key and result is not None:
+            await asyncio.to_thread(put_cached_response, response_key, model_id, result.message['content'][0]['text'])
+        yield {"usage": usage_summary(result), "metrics": invocation_metrics(result, time.perf_counter() - started), "cache_hit": False}
+
+async def invoke(payload):
+    """Run a single invocation and return its envelope (or plain text, or a stream)"""
+    started = time.perf_counter()
     model_id = payload.get("model_id")
-    agent = get_agent(model_id)
+    # Every invocation starts a clean conversation unless it names a session
+    session_id = payload.get("session_id")
+    # Building the agent may create a boto3 client, keep that off the event loop
+    agent = await asyncio.to_thread(
+        get_agent,
+        model_id,
+        max_tokens=payload.get("max_tokens"),
+        temperature=payload.get("temperature"),
+        top_p=payload.get("top_p"),
+        messages=load_history(session_id) if session_id else None,
+        cache_prompt=payload.get("cache_prompt"),
+    )
     user_input = payload.get("prompt")
     print("User input:", user_input)
-    response = agent(user_input)
-    return response.message['content'][0]['text']
+    
+    # Only stateless calls are cached, session history changes the answer
+    response_key = None
+    cached_text = None
+    if RESPONSE_CACHE_ENABLED and not session_id and not payload.get("bypass_cache"):
+        response_key = cache_key(agent, user_input)
+        cached_text = await asyncio.to_thread(get_cached_response, response_key)
+    
+    if payload.get("stream"):
+        # Returning an async generator makes the runtime answer with server-sent events
+        return stream_response(agent, user_input, session_id, response_key, cached_text, started, current_context())
+    
+    response = None
+    if cached_text is not None:
+        text = cached_text
+    else:
+        model_id = agent.model.get_config()["model_id"]
+        async with request_slot(model_id):
+            response = await agent.invoke_async(user_input)
+        text = response.message['content'][0]['text']
+        if session_id:
+            save_history(session_id, agent.messages)
+        if response_key:
+            await asyncio.to_thread(put_cached_response, response_key, model_id, text)
+    
+    if payload.get("text_only"):
+        return text
+    return {
+        "text": text,
+        "usage": usage_summary(response),
+        "metrics": invocation_metrics(response, time.perf_counter() - started),
+        "cache_hit": cached_text is not None,
+    }
+
+@app.entrypoint
+async def strands_agent_bedrock(payload):
+    """
+    Invoke the agent with a payload, or with a list of items under "batch";
+    {"stats": true} returns the runtime's counters instead
+    """
+    if payload.get("stats"):
+        return runtime_stats()
+    with entrypoint_span("strands_agent_bedrock", payload) as span:
+        if "batch" in payload:
+            span.set_attribute("batch_size", len(payload["batch"]))
+            return await run_batch(payload, invoke)
+        return await invoke(payload)
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
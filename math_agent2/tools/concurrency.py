@@ -0,0 +1,61 @@
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+
+# In-flight limits for model calls. Requests above a limit wait for a free slot
+# instead of being rejected. MODEL_CONCURRENCY_LIMITS overrides the per-model
+# default, e.g. '{"eu.meta.llama3-2-3b-instruct-v1:0": 2}'.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+MAX_CONCURRENT_PER_MODEL = int(os.getenv("MAX_CONCURRENT_PER_MODEL", "8"))
+MODEL_CONCURRENCY_LIMITS = json.loads(os.getenv("MODEL_CONCURRENCY_LIMITS", "{}"))
+
+_global_slots = None
+_model_slots = {}
+_stats = {}
+
+def _global_semaphore():
+    """Return the process-wide semaphore, creating it on first use"""
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return _global_slots
+
+def _model_semaphore(model_id):
+    """Return the semaphore for one model, creating it on first use"""
+    if model_id not in _model_slots:
+        limit = int(MODEL_CONCURRENCY_LIMITS.get(model_id, MAX_CONCURRENT_PER_MODEL))
+        _model_slots[model_id] = asyncio.Semaphore(limit)
+        _stats[model_id] = {"in_flight": 0, "queued": 0, "completed": 0}
+    return _model_slots[model_id]
+
+@asynccontextmanager
+async def request_slot(model_id):
+    """Hold a per-model and a global slot for the duration of a model call"""
+    model_slots = _model_semaphore(model_id)
+    stats = _stats[model_id]
+    stats["queued"] += 1
+    try:
+        # Take the model slot first so a request waiting on a busy model does
+        # not hold a global slot that another model could use
+        await model_slots.acquire()
+        try:
+            await _global_semaphore().acquire()
+        except BaseException:
+            model_slots.release()
+            raise
+    finally:
+        stats["queued"] -= 1
+
+    stats["in_flight"] += 1
+    try:
+        yield
+    finally:
+        stats["in_flight"] -= 1
+        stats["completed"] += 1
+        _global_semaphore().release()
+        model_slots.release()
+
+def get_concurrency_stats():
+    """Return in-flight, queued and completed counts per model"""
+    return {model_id: dict(stats) for model_id, stats in _stats.items()}
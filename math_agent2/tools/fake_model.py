@@ -0,0 +1,146 @@
+"""
+In-process stand-in for BedrockModel, for offline load testing
+
+Selected with MODEL_PROVIDER=fake. Response text, timing and token counts
+are deterministic for a given FAKE_MODEL_SEED, model and conversation, while
+throttling and errors are drawn per attempt. All of them follow per-model
+profiles read from FAKE_MODEL_PROFILES (a JSON string or a path to a JSON
+file), e.g.
+
+    {
+      "default": {"ttft_ms": [400, 100], "inter_token_ms": [20, 5], "output_tokens": [250, 60]},
+      "eu.meta.llama3-2-3b-instruct-v1:0": {"ttft_ms": [150, 30], "throttle_rate": 0.05, "error_rate": 0.01}
+    }
+
+Profile keys: ttft_ms and inter_token_ms as [mean, stddev] in milliseconds,
+output_tokens as [mean, stddev], throttle_rate and error_rate as probabilities,
+and response, a template for answers using {model_id} and {prompt}.
+Structured output is filled in field by field from the same seeded draw.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+
+from strands.models import Model
+from strands.types.exceptions import ModelThrottledException
+
+DEFAULT_PROFILE = {
+    "ttft_ms": [300, 50],
+    "inter_token_ms": [15, 3],
+    "output_tokens": [200, 50],
+    "throttle_rate": 0.0,
+    "error_rate": 0.0,
+    "response": "Simulated answer from {model_id}.",
+}
+
+JUDGE_CRITERIA = ["factual_correctness", "subject_focus", "completeness", "professionalism"]
+
+def load_profiles():
+    """Read per-model profiles from FAKE_MODEL_PROFILES"""
+    raw = os.getenv("FAKE_MODEL_PROFILES", "").strip()
+    if not raw:
+        return {}
+    if not raw.startswith("{"):
+        with open(raw, "r") as f:
+            return json.load(f)
+    return json.loads(raw)
+
+def _sample(rng, spec, minimum=0.0):
+    """Draw from a normal [mean, stddev] spec (or return a fixed number)"""
+    if isinstance(spec, (int, float)):
+        return max(minimum, float(spec))
+    mean, stddev = spec
+    return max(minimum, rng.gauss(mean, stddev))
+
+def _last_user_text(messages):
+    """Text of the latest user message"""
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return " ".join(block["text"] for block in message.get("content", []) if "text" in block)
+    return ""
+
+class FakeBedrockModel(Model):
+    """Model that streams synthetic Bedrock-style events without calling AWS"""
+
+    def __init__(self, response_style="answer", **model_config):
+        self.response_style = response_style
+        self.config = dict(model_config)
+        profiles = load_profiles()
+        self.profile = dict(DEFAULT_PROFILE, **profiles.get("default", {}))
+        self.profile.update(profiles.get(self.config.get("model_id"), {}))
+        # Failures are drawn per attempt so a retried request can succeed
+        self._failure_rng = random.Random(f"{os.getenv('FAKE_MODEL_SEED', '0')}:{self.config.get('model_id')}")
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs):
+        """Yield a deterministic output_model instance: judge-style ratings for int fields, the canned answer for text"""
+        rng = self._rng(prompt, system_prompt)
+        text = self._response_text(rng, _last_user_text(prompt))
+        values = {}
+        for name, field in output_model.model_fields.items():
+            if not field.is_required():
+                values[name] = field.get_default(call_default_factory=True)
+            elif field.annotation is int:
+                values[name] = rng.randint(4, 10)
+            elif field.annotation is float:
+                values[name] = round(rng.uniform(4, 10), 1)
+            elif field.annotation is bool:
+                values[name] = rng.random() < 0.5
+            elif field.annotation is str:
+                values[name] = text
+        # Required fields of other types are left unset rather than guessed
+        yield {"output": output_model.model_construct(**values)}
+
+    def _rng(self, messages, system_prompt):
+        """Random generator seeded by the seed, model and conversation"""
+        material = json.dumps([os.getenv("FAKE_MODEL_SEED", "0"), self.config.get("model_id"), system_prompt, messages], default=str)
+        return random.Random(hashlib.sha256(material.encode("utf-8")).hexdigest())
+
+    def _response_text(self, rng, prompt):
+        """Templated answer or judge-style JSON ratings"""
+        output_tokens = int(_sample(rng, self.profile["output_tokens"], minimum=1))
+        if self.response_style == "judge":
+            ratings = {criterion: rng.randint(4, 10) for criterion in JUDGE_CRITERIA}
+            return "```json\n" + json.dumps(ratings, indent=2) + "\n```"
+        text = self.profile["response"].format(model_id=self.config.get("model_id"), prompt=prompt[:200])
+        filler = " ".join(f"step{i}" for i in range(max(0, output_tokens - len(text.split()) - 3)))
+        return f"{text} {filler} Final answer: {rng.randint(1, 100)}".replace("  ", " ")
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        rng = self._rng(messages, system_prompt)
+        prompt = _last_user_text(messages)
+        input_tokens = (len(system_prompt or "") + len(json.dumps(messages, default=str))) // 4
+
+        ttft_ms = _sample(rng, self.profile["ttft_ms"])
+        await asyncio.sleep(ttft_ms / 1000)
+        if self._failure_rng.random() < self.profile["throttle_rate"]:
+            raise ModelThrottledException("Simulated throttling from FakeBedrockModel")
+        if self._failure_rng.random() < self.profile["error_rate"]:
+            raise RuntimeError("Simulated model error from FakeBedrockModel")
+
+        tokens = self._response_text(rng, prompt).split(" ")
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        elapsed_ms = ttft_ms
+        for i, token in enumerate(tokens):
+            if i:
+                delay_ms = _sample(rng, self.profile["inter_token_ms"])
+                elapsed_ms += delay_ms
+                await asyncio.sleep(delay_ms / 1000)
+            yield {"contentBlockDelta": {"delta": {"text": token if i == 0 else " " + token}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {
+            "metadata": {
+                "usage": {"inputTokens": input_tokens, "outputTokens": len(tokens), "totalTokens": input_tokens + len(tokens)},
+                "metrics": {"latencyMs": int(elapsed_ms)},
+            }
+        }
@@ -0,0 +1,25 @@
+def usage_summary(result):
+    """Token usage of an agent result, including prompt cache reads and writes"""
+    if result is None:
+        # Served from the response cache, no model call was made
+        return {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
+    usage = result.metrics.accumulated_usage
+    return {
+        "input_tokens": usage.get("inputTokens", 0),
+        "output_tokens": usage.get("outputTokens", 0),
+        "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+        "cache_write_tokens": usage.get("cacheWriteInputTokens", 0),
+    }
+
+def invocation_metrics(result, server_seconds):
+    """Agent cycles, tool calls and model latency of an agent result, plus total server-side time"""
+    server_ms = int(server_seconds * 1000)
+    if result is None:
+        return {"cycles": 0, "tool_calls": 0, "model_latency_ms": 0, "server_ms": server_ms}
+    metrics = result.metrics
+    return {
+        "cycles": metrics.cycle_count,
+        "tool_calls": sum(tool.call_count for tool in metrics.tool_metrics.values()),
+        "model_latency_ms": metrics.accumulated_metrics.get("latencyMs", 0),
+        "server_ms": server_ms,
+    }
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Content-addressed cache of final responses, stored in a local SQLite file.
+# Entries expire after RESPONSE_CACHE_TTL_SECONDS and the least recently used
+# ones are dropped once the stored text exceeds RESPONSE_CACHE_MAX_BYTES.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_connection = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+def _connect():
+    """Open the cache database on first use (caller holds the lock)"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(RESPONSE_CACHE_PATH, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model_id TEXT,"
+            " text TEXT,"
+            " size INTEGER,"
+            " created REAL,"
+            " last_used REAL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        _connection.commit()
+    return _connection
+
+def cache_key(agent, user_input):
+    """Hash of model, system prompt, prompt and sampling parameters for an agent call"""
+    config = agent.model.get_config()
+    system_prompt = agent.system_prompt or ""
+    material = json.dumps([
+        config.get("model_id"),
+        hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+        user_input,
+        config.get("max_tokens"),
+        config.get("temperature"),
+        config.get("top_p"),
+    ], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def get_cached_response(key):
+    """Return the cached text for a key, or None when missing or expired"""
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        row = connection.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or now - row[1] > RESPONSE_CACHE_TTL_SECONDS:
+            _stats["misses"] += 1
+            return None
+        connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        connection.commit()
+        _stats["hits"] += 1
+        return row[0]
+
+def put_cached_response(key, model_id, text):
+    """Store a response and apply age- and size-based eviction"""
+    now = time.time()
+    size = len(text.encode("utf-8"))
+    with _lock:
+        connection = _connect()
+        connection.execute(
+            "INSERT OR REPLACE INTO responses (key, model_id, text, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model_id, text, size, now, now),
+        )
+        _stats["writes"] += 1
+
+        expired = connection.execute(
+            "DELETE FROM responses WHERE created < ?", (now - RESPONSE_CACHE_TTL_SECONDS,)
+        ).rowcount
+        _stats["evictions"] += expired
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > RESPONSE_CACHE_MAX_BYTES:
+            for old_key, old_size in connection.execute(
+                "SELECT key, size FROM responses ORDER BY last_used"
+            ).fetchall():
+                if total <= RESPONSE_CACHE_MAX_BYTES:
+                    break
+                connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                total -= old_size
+                _stats["evictions"] += 1
+        connection.commit()
+
+def get_cache_stats():
+    """Return hit/miss/write/eviction counters and the hit rate"""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return dict(_stats, hit_rate=_stats["hits"] / lookups if lookups else None)
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import copy
+import json
+import os
+import threading
+import time
+
+# Conversation history is only kept for invocations that pass a session_id.
+# Each session is capped by turns and by an approximate token budget, and
+# sessions idle for longer than SESSION_TTL_SECONDS are dropped.
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+SESSION_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "8000"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+def _estimate_tokens(messages):
+    """Rough token count for a list of messages (about four characters per token)"""
+    return len(json.dumps(messages, default=str)) // 4
+
+def _turn_starts(messages):
+    """Indices of user messages that open a new turn (not tool results)"""
+    starts = []
+    for i, message in enumerate(messages):
+        if message.get("role") != "user":
+            continue
+        if any("toolResult" in block for block in message.get("content", [])):
+            continue
+        starts.append(i)
+    return starts
+
+def trim_history(messages):
+    """Drop the oldest whole turns until the turn and token caps are met"""
+    starts = _turn_starts(messages)
+    if not starts:
+        return []
+    messages = messages[starts[0]:]
+    starts = [i - starts[0] for i in starts]
+
+    while len(starts) > max(SESSION_MAX_TURNS, 1) or (
+        len(starts) > 1 and _estimate_tokens(messages) > SESSION_MAX_TOKENS
+    ):
+        messages = messages[starts[1]:]
+        starts = [i - starts[1] for i in starts[1:]]
+
+    if _estimate_tokens(messages) > SESSION_MAX_TOKENS:
+        # A single turn larger than the budget is not worth carrying forward
+        return []
+    return messages
+
+def _evict_expired(now):
+    """Remove sessions that have been idle past the TTL (caller holds the lock)"""
+    while _sessions:
+        session_id, (last_used, _) = next(iter(_sessions.items()))
+        if now - last_used <= SESSION_TTL_SECONDS:
+            break
+        del _sessions[session_id]
+
+def load_history(session_id):
+    """Return a copy of the stored history for a session, or an empty list"""
+    now = time.monotonic()
+    with _sessions_lock:
+        _evict_expired(now)
+        entry = _sessions.get(session_id)
+        if entry is None:
+            return []
+        _sessions.move_to_end(session_id)
+        _sessions[session_id] = (now, entry[1])
+        return copy.deepcopy(entry[1])
+
+def save_history(session_id, messages):
+    """Store the trimmed conversation history for a session"""
+    trimmed = copy.deepcopy(trim_history(list(messages)))
+    now = time.monotonic()
+    with _sessions_lock:
+        _evict_expired(now)
+        _sessions[session_id] = (now, trimmed)
+        _sessions.move_to_end(session_id)
+        while len(_sessions) > SESSION_MAX_COUNT:
+            _sessions.popitem(last=False)
+
+def clear_session(session_id):
+    """Forget the history for a session"""
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+import json
+import os
+import threading
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+# TRACING=json appends finished spans to TRACE_FILE as JSON lines, TRACING=otlp
+# sends them to the collector at OTEL_EXPORTER_OTLP_ENDPOINT (needs the
+# opentelemetry-exporter-otlp-proto-http package). strands records agent, cycle,
+# model and tool spans under the entrypoint span once a provider is set.
+TRACING = os.getenv("TRACING", "off").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+tracer = trace.get_tracer(__name__)
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Span exporter that appends one JSON object per finished span to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        with self._lock, open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(json.loads(span.to_json())) + "\n")
+        return SpanExportResult.SUCCESS
+
+def setup_tracing(service_name):
+    """Install a tracer provider for the configured exporter, if any"""
+    if TRACING not in ("json", "otlp"):
+        return False
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if TRACING == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("TRACING=otlp needs opentelemetry-exporter-otlp-proto-http, tracing disabled")
+            return False
+        exporter = OTLPSpanExporter()
+    else:
+        exporter = JsonLinesSpanExporter(TRACE_FILE)
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return True
+
+@contextmanager
+def entrypoint_span(name, payload):
+    """Span for one invocation, continuing the trace carried in payload["trace_context"]"""
+    parent = propagate.extract(payload.get("trace_context") or {})
+    with tracer.start_as_current_span(name, context=parent) as span:
+        span.set_attribute("model_id", payload.get("model_id") or "default")
+        yield span
+
+def current_context():
+    """Context to hand to work that outlives the entrypoint span, such as a response stream"""
+    return context.get_current()